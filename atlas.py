@@ -0,0 +1,491 @@
+import argparse
+import os
+import xml.etree.ElementTree as ET
+from copy import deepcopy
+from urllib.parse import unquote
+import numpy as np
+
+colladaNamespace = "http://www.collada.org/2005/11/COLLADASchema"
+# Margen con el que se aceptan UV fuera de [0, 1] por errores de redondeo
+uvTolerance = 1e-3
+
+
+def _tag(name):
+    return f"{{{colladaNamespace}}}{name}"
+
+
+def _roundUp(value, multiple = 4):
+    return -(-value // multiple) * multiple
+
+
+def packRectangles(sizes, atlasSize = 4096, padding = 8):
+    """Reparte rectángulos en atlas con un empaquetado por estantes de altura decreciente.
+
+    Los rectángulos se ordenan por altura y se colocan en el primer estante donde
+    caben; si no cabe en ningún estante, se abre uno nuevo debajo o un atlas nuevo.
+    Con tiles del mismo tamaño el resultado es una rejilla completa.
+
+    Args:
+        sizes (list[tuple]): Ancho y alto de cada rectángulo en píxeles.
+        atlasSize (int): Lado máximo de cada atlas.
+        padding (int): Margen alrededor de cada rectángulo.
+
+    Returns:
+        tuple: Posición (atlas, x, y) de cada rectángulo, o None si no cabe en un
+            atlas, y tamaño (ancho, alto) de cada atlas, múltiplo de 4.
+    """
+    placements = [None] * len(sizes)
+    atlases = []
+    order = sorted(range(len(sizes)), key = lambda i: (-sizes[i][1], -sizes[i][0]))
+    for i in order:
+        width = sizes[i][0] + 2 * padding
+        height = sizes[i][1] + 2 * padding
+        if width > atlasSize or height > atlasSize:
+            continue
+
+        placed = None
+        for atlasIndex, atlas in enumerate(atlases):
+            for shelf in atlas["shelves"]:
+                if height <= shelf["height"] and shelf["x"] + width <= atlasSize:
+                    placed = (atlasIndex, shelf["x"], shelf["y"])
+                    shelf["x"] += width
+                    break
+            if placed is None and atlas["height"] + height <= atlasSize:
+                atlas["shelves"].append({"y": atlas["height"], "height": height, "x": width})
+                placed = (atlasIndex, 0, atlas["height"])
+                atlas["height"] += height
+            if placed is not None:
+                break
+        if placed is None:
+            atlases.append({"shelves": [{"y": 0, "height": height, "x": width}], "height": height})
+            placed = (len(atlases) - 1, 0, 0)
+        placements[i] = (placed[0], placed[1] + padding, placed[2] + padding)
+
+    atlasSizes = []
+    for atlas in atlases:
+        usedWidth = max(shelf["x"] for shelf in atlas["shelves"])
+        atlasSizes.append((_roundUp(usedWidth), _roundUp(atlas["height"])))
+    return placements, atlasSizes
+
+
+def uvTransform(x, y, width, height, atlasWidth, atlasHeight):
+    """Obtiene la transformación de las UV de una textura a su región del atlas.
+
+    Las UV de Collada y Blender tienen el origen abajo a la izquierda, mientras que
+    la posición en el atlas se mide desde la esquina superior.
+
+    Returns:
+        tuple: Desplazamiento (s, t) y escala (s, t) tales que uv' = desplazamiento + uv * escala.
+    """
+    return (
+        x / atlasWidth,
+        (atlasHeight - y - height) / atlasHeight,
+        width / atlasWidth,
+        height / atlasHeight,
+    )
+
+
+def applyTransform(uvs, transform):
+    """Aplica a un array de UV (N, 2) la transformación de uvTransform, recortando al rango [0, 1]."""
+    offsetS, offsetT, scaleS, scaleT = transform
+    clipped = np.clip(uvs, 0.0, 1.0)
+    return np.column_stack([offsetS + clipped[:, 0] * scaleS, offsetT + clipped[:, 1] * scaleT])
+
+
+def composeAtlas(atlasWidth, atlasHeight, tiles, padding):
+    """Compone un atlas repitiendo el borde de cada textura en su margen para evitar sangrado.
+
+    Args:
+        atlasWidth (int): Ancho del atlas.
+        atlasHeight (int): Alto del atlas.
+        tiles (list[tuple]): Imagen (alto, ancho, canales) uint8 de arriba abajo y su posición x, y.
+        padding (int): Margen alrededor de cada textura.
+
+    Returns:
+        np.ndarray: Atlas (alto, ancho, canales) uint8.
+    """
+    channels = max(tile.shape[2] for tile, _, _ in tiles)
+    atlas = np.zeros((atlasHeight, atlasWidth, channels), dtype = np.uint8)
+    if channels == 4:
+        atlas[..., 3] = 255
+    for tile, x, y in tiles:
+        if tile.shape[2] < channels:
+            tile = np.concatenate([tile, np.full(tile.shape[:2] + (channels - tile.shape[2],), 255, dtype = np.uint8)], axis = 2)
+        padded = np.pad(tile, ((padding, padding), (padding, padding), (0, 0)), mode = "edge")
+        atlas[y - padding : y + tile.shape[0] + padding, x - padding : x + tile.shape[1] + padding] = padded
+    return atlas
+
+
+def _readImage(imagePath):
+    from PIL import Image
+
+    with Image.open(imagePath) as img:
+        hasAlpha = "A" in img.getbands() or "transparency" in img.info
+        return np.array(img.convert("RGBA" if hasAlpha else "RGB"))
+
+
+def _imageSize(imagePath):
+    from PIL import Image
+
+    with Image.open(imagePath) as img:
+        return img.size
+
+
+def _writeImage(imagePath, array):
+    from PIL import Image
+
+    tempPath = f"{imagePath}.tmp"
+    with open(tempPath, "wb") as f:
+        Image.fromarray(array).save(f, format = "PNG")
+    os.replace(tempPath, imagePath)
+
+
+def _imagePath(initFrom, daeDir):
+    path = unquote(initFrom.strip())
+    if path.startswith("file://"):
+        path = path[len("file://") :]
+        # file:///C:/... en Windows
+        if len(path) > 2 and path[0] == "/" and path[2] == ":":
+            path = path[1:]
+    return path if os.path.isabs(path) else os.path.join(daeDir, path)
+
+
+def _effectImage(effect, imageIds):
+    """Obtiene la imagen de la textura difusa de un efecto, siguiendo sampler y surface."""
+    texture = effect.find(f".//{_tag('diffuse')}/{_tag('texture')}")
+    if texture is None:
+        return None
+    params = {param.get("sid"): param for param in effect.iter(_tag("newparam"))}
+    reference = texture.get("texture")
+    sampler = params.get(reference)
+    if sampler is not None:
+        source = sampler.find(f"{_tag('sampler2D')}/{_tag('source')}")
+        surface = params.get(source.text) if source is not None else None
+        initFrom = surface.find(f"{_tag('surface')}/{_tag('init_from')}") if surface is not None else None
+        reference = initFrom.text if initFrom is not None else None
+    return reference if reference in imageIds else None
+
+
+def _readPrimitives(root):
+    """Lee las UV y los índices de cada primitiva con material de las geometrías.
+
+    Returns:
+        list[dict]: Por geometría, el elemento de la fuente de UV, sus valores (N, 2)
+            y las primitivas con su elemento <p>, índices (K, stride), offset de
+            TEXCOORD y símbolo de material.
+    """
+    geometries = []
+    for mesh in root.iter(_tag("mesh")):
+        sources = {source.get("id"): source for source in mesh.findall(_tag("source"))}
+        primitives = []
+        uvSource = None
+        for primitive in list(mesh.findall(_tag("triangles"))) + list(mesh.findall(_tag("polylist"))):
+            inputs = primitive.findall(_tag("input"))
+            texcoords = [i for i in inputs if i.get("semantic") == "TEXCOORD"]
+            p = primitive.find(_tag("p"))
+            if not texcoords or p is None or not p.text:
+                continue
+            source = sources.get(texcoords[0].get("source", "")[1:])
+            if source is None or (uvSource is not None and source is not uvSource):
+                continue
+            uvSource = source
+            stride = max(int(i.get("offset", 0)) for i in inputs) + 1
+            primitives.append({
+                "element": primitive,
+                "p": p,
+                "indices": np.array(p.text.split(), dtype = np.int64).reshape(-1, stride),
+                "offset": int(texcoords[0].get("offset", 0)),
+                "symbol": primitive.get("material"),
+            })
+        if uvSource is None:
+            continue
+        accessor = uvSource.find(f"{_tag('technique_common')}/{_tag('accessor')}")
+        floatArray = uvSource.find(_tag("float_array"))
+        stride = int(accessor.get("stride", 2))
+        values = np.array(floatArray.text.split(), dtype = np.float64).reshape(-1, stride)[:, :2]
+        geometries.append({"source": uvSource, "floatArray": floatArray, "accessor": accessor, "uvs": values, "primitives": primitives})
+    return geometries
+
+
+def _readDocument(daePath):
+    """Lee los materiales, imágenes y primitivas de un Collada para agruparlo en atlas.
+
+    Returns:
+        dict: Árbol XML, bibliotecas y relaciones material -> imagen, o None si el
+            archivo no tiene imágenes, efectos o materiales.
+    """
+    tree = ET.parse(daePath)
+    root = tree.getroot()
+    document = {
+        "path": daePath,
+        "tree": tree,
+        "root": root,
+        "daeDir": os.path.dirname(os.path.abspath(daePath)),
+        "libraryImages": root.find(_tag("library_images")),
+        "libraryEffects": root.find(_tag("library_effects")),
+        "libraryMaterials": root.find(_tag("library_materials")),
+    }
+    if document["libraryImages"] is None or document["libraryEffects"] is None or document["libraryMaterials"] is None:
+        return None
+
+    imagePaths = {}
+    for image in document["libraryImages"].findall(_tag("image")):
+        initFrom = image.find(_tag("init_from"))
+        if initFrom is not None and initFrom.text:
+            imagePaths[image.get("id")] = os.path.abspath(_imagePath(initFrom.text, document["daeDir"]))
+    effects = {effect.get("id"): effect for effect in document["libraryEffects"].findall(_tag("effect"))}
+    materialImages = {}
+    materialEffects = {}
+    for material in document["libraryMaterials"].findall(_tag("material")):
+        instanceEffect = material.find(_tag("instance_effect"))
+        effect = effects.get(instanceEffect.get("url", "")[1:]) if instanceEffect is not None else None
+        if effect is None:
+            continue
+        materialEffects[material.get("id")] = effect
+        imageId = _effectImage(effect, imagePaths)
+        if imageId is not None:
+            materialImages[material.get("id")] = imageId
+
+    symbols = {}
+    for instance in root.iter(_tag("instance_material")):
+        symbols.setdefault(instance.get("symbol"), instance.get("target", "")[1:])
+
+    # Las texturas con UV fuera de [0, 1] se repiten y no pueden ir en un atlas
+    geometries = _readPrimitives(root)
+    excluded = set()
+    for geometry in geometries:
+        for primitive in geometry["primitives"]:
+            materialId = symbols.get(primitive["symbol"], primitive["symbol"])
+            primitive["material"] = materialId
+            if materialId not in materialImages:
+                continue
+            uvs = geometry["uvs"][primitive["indices"][:, primitive["offset"]]]
+            if len(uvs) and (uvs.min() < -uvTolerance or uvs.max() > 1 + uvTolerance):
+                excluded.add(imagePaths[materialImages[materialId]])
+
+    document.update(
+        imagePaths = imagePaths,
+        materialImages = materialImages,
+        materialEffects = materialEffects,
+        geometries = geometries,
+        excluded = excluded,
+    )
+    return document
+
+
+def _rewriteDocument(document, transforms, atlasPaths):
+    """Sustituye en un Collada los materiales agrupados por los de sus atlas y reescribe las UV.
+
+    Args:
+        document (dict): Resultado de _readDocument.
+        transforms (dict): Ruta de cada textura agrupada -> (atlas, transformación de UV).
+        atlasPaths (dict): Índice de atlas -> ruta de su imagen.
+
+    Returns:
+        tuple: Materiales antes y después de agrupar.
+    """
+    libraryImages = document["libraryImages"]
+    libraryEffects = document["libraryEffects"]
+    libraryMaterials = document["libraryMaterials"]
+    materialEffects = document["materialEffects"]
+    imagePaths = document["imagePaths"]
+    materialImages = {materialId: imageId for materialId, imageId in document["materialImages"].items() if imagePaths[imageId] in transforms}
+    if not materialImages:
+        return len(materialEffects), len(materialEffects)
+
+    # Material del atlas: copia del efecto del primer material agrupado apuntando a la nueva imagen
+    atlasMaterialIds = {}
+    for materialId, imageId in sorted(materialImages.items()):
+        atlasIndex = transforms[imagePaths[imageId]][0]
+        if atlasIndex in atlasMaterialIds:
+            continue
+        atlasPath = atlasPaths[atlasIndex]
+        atlasId = os.path.splitext(os.path.basename(atlasPath))[0]
+        effect = deepcopy(materialEffects[materialId])
+        effect.set("id", f"{atlasId}-effect")
+        if effect.get("name") is not None:
+            effect.set("name", atlasId)
+        for param in effect.iter(_tag("newparam")):
+            surfaceInit = param.find(f"{_tag('surface')}/{_tag('init_from')}")
+            if surfaceInit is not None:
+                surfaceInit.text = atlasId
+        texture = effect.find(f".//{_tag('diffuse')}/{_tag('texture')}")
+        if texture.get("texture") == imageId:
+            texture.set("texture", atlasId)
+        libraryEffects.append(effect)
+
+        image = ET.SubElement(libraryImages, _tag("image"), {"id": atlasId, "name": atlasId})
+        ET.SubElement(image, _tag("init_from")).text = os.path.relpath(atlasPath, document["daeDir"]).replace(os.sep, "/")
+        material = ET.SubElement(libraryMaterials, _tag("material"), {"id": f"{atlasId}-material", "name": atlasId})
+        ET.SubElement(material, _tag("instance_effect"), {"url": f"#{atlasId}-effect"})
+        atlasMaterialIds[atlasIndex] = f"{atlasId}-material"
+
+    replaced = {materialId: atlasMaterialIds[transforms[imagePaths[imageId]][0]] for materialId, imageId in materialImages.items()}
+
+    for geometry in document["geometries"]:
+        if not any(primitive["material"] in replaced for primitive in geometry["primitives"]):
+            continue
+        newUvs = []
+        count = 0
+        for primitive in geometry["primitives"]:
+            indices = primitive["indices"]
+            unique, inverse = np.unique(indices[:, primitive["offset"]], return_inverse = True)
+            uvs = geometry["uvs"][unique]
+            if primitive["material"] in replaced:
+                uvs = applyTransform(uvs, transforms[imagePaths[materialImages[primitive["material"]]]][1])
+                primitive["element"].set("material", replaced[primitive["material"]])
+            indices[:, primitive["offset"]] = count + inverse.reshape(-1)
+            primitive["p"].text = " ".join(map(str, indices.reshape(-1).tolist()))
+            newUvs.append(uvs)
+            count += len(uvs)
+
+        uvs = np.concatenate(newUvs)
+        geometry["floatArray"].text = " ".join("%.6g" % value for value in uvs.reshape(-1).tolist())
+        geometry["floatArray"].set("count", str(uvs.size))
+        accessor = geometry["accessor"]
+        accessor.set("count", str(len(uvs)))
+        accessor.set("stride", "2")
+        for param in accessor.findall(_tag("param"))[2:]:
+            accessor.remove(param)
+
+    for bindings in document["root"].iter(_tag("technique_common")):
+        instances = bindings.findall(_tag("instance_material"))
+        if not instances:
+            continue
+        seen = set()
+        for instance in instances:
+            target = instance.get("target", "")[1:]
+            if target in replaced:
+                instance.set("symbol", replaced[target])
+                instance.set("target", f"#{replaced[target]}")
+            if instance.get("symbol") in seen:
+                bindings.remove(instance)
+            seen.add(instance.get("symbol"))
+
+    removedImages = {materialImages[materialId] for materialId in replaced}
+    removedEffects = {materialEffects[materialId].get("id") for materialId in replaced}
+    for material in libraryMaterials.findall(_tag("material")):
+        if material.get("id") in replaced:
+            libraryMaterials.remove(material)
+    # Un efecto o una imagen pueden seguir en uso por materiales que no se han sustituido
+    usedEffects = {instance.get("url", "")[1:] for instance in libraryMaterials.iter(_tag("instance_effect"))}
+    for effect in libraryEffects.findall(_tag("effect")):
+        if effect.get("id") in removedEffects and effect.get("id") not in usedEffects:
+            libraryEffects.remove(effect)
+    usedImages = set()
+    for effect in libraryEffects.findall(_tag("effect")):
+        usedImages.update(initFrom.text for initFrom in effect.iter(_tag("init_from")))
+        usedImages.update(texture.get("texture") for texture in effect.iter(_tag("texture")))
+    for image in libraryImages.findall(_tag("image")):
+        if image.get("id") in removedImages and image.get("id") not in usedImages:
+            libraryImages.remove(image)
+
+    tempPath = f"{document['path']}.tmp"
+    document["tree"].write(tempPath, encoding = "utf-8", xml_declaration = True)
+    os.replace(tempPath, document["path"])
+    return len(materialEffects), len(materialEffects) - len(replaced) + len(atlasMaterialIds)
+
+
+def atlasDaeFiles(daePaths, atlasSize = 4096, padding = 8):
+    """Agrupa en atlas comunes las texturas de varios Collada y reescribe sus UV y materiales.
+
+    Solo se incluyen las texturas cuyas UV están dentro de [0, 1] en todos los
+    archivos, ya que las que se repiten no se pueden muestrear desde una región
+    del atlas. Los atlas se guardan junto al primer archivo con su nombre como
+    prefijo y los comparten todos, de modo que los niveles de detalle de una
+    escena no duplican texturas. Los materiales, efectos e imágenes sustituidos se
+    eliminan, junto con las texturas originales que estaban junto a los .dae.
+
+    Args:
+        daePaths (list[str]): Rutas a los archivos .dae; el primero da nombre a los atlas.
+        atlasSize (int): Lado máximo de cada atlas.
+        padding (int): Margen alrededor de cada textura.
+
+    Returns:
+        dict: Número de texturas agrupadas, atlas generados y materiales antes y
+            después en el primer archivo.
+    """
+    ET.register_namespace("", colladaNamespace)
+    documents = [document for document in map(_readDocument, daePaths) if document is not None]
+    if not documents:
+        return {"textures": 0, "atlases": 0, "materials": 0, "atlasMaterials": 0}
+    materials = len(documents[0]["materialEffects"])
+
+    excluded = set().union(*(document["excluded"] for document in documents))
+    candidates = []
+    sizes = []
+    texturePaths = {document["imagePaths"][imageId] for document in documents for imageId in document["materialImages"].values()}
+    for texturePath in sorted(texturePaths - excluded):
+        try:
+            sizes.append(_imageSize(texturePath))
+            candidates.append(texturePath)
+        except OSError:
+            continue
+
+    placements, atlasSizes = packRectangles(sizes, atlasSize, padding)
+    transforms = {}
+    atlasTiles = [[] for _ in atlasSizes]
+    for texturePath, size, placement in zip(candidates, sizes, placements):
+        if placement is None:
+            continue
+        atlasIndex, x, y = placement
+        atlasWidth, atlasHeight = atlasSizes[atlasIndex]
+        transforms[texturePath] = (atlasIndex, uvTransform(x, y, size[0], size[1], atlasWidth, atlasHeight))
+        atlasTiles[atlasIndex].append((_readImage(texturePath), x, y))
+
+    # Un atlas con una sola textura no ahorra nada
+    singles = {texturePath for texturePath, (atlasIndex, _) in transforms.items() if len(atlasTiles[atlasIndex]) == 1}
+    for texturePath in singles:
+        del transforms[texturePath]
+    if not transforms:
+        return {"textures": 0, "atlases": 0, "materials": materials, "atlasMaterials": 0}
+
+    prefix = os.path.splitext(os.path.basename(daePaths[0]))[0]
+    usedAtlases = sorted({atlasIndex for atlasIndex, _ in transforms.values()})
+    atlasPaths = {atlasIndex: os.path.join(documents[0]["daeDir"], f"{prefix}_atlas{number}.png") for number, atlasIndex in enumerate(usedAtlases)}
+    for atlasIndex, atlasPath in atlasPaths.items():
+        atlasWidth, atlasHeight = atlasSizes[atlasIndex]
+        _writeImage(atlasPath, composeAtlas(atlasWidth, atlasHeight, atlasTiles[atlasIndex], padding))
+
+    rewritten = [_rewriteDocument(document, transforms, atlasPaths) for document in documents]
+
+    daeDirs = {document["daeDir"] for document in documents}
+    for texturePath in transforms:
+        if os.path.dirname(texturePath) in daeDirs and os.path.exists(texturePath):
+            os.remove(texturePath)
+
+    return {
+        "textures": len(transforms),
+        "atlases": len(atlasPaths),
+        "materials": materials,
+        "atlasMaterials": rewritten[0][1],
+    }
+
+
+def atlasDaeFile(daePath, atlasSize = 4096, padding = 8):
+    """Agrupa las texturas de un Collada en atlas y reescribe sus UV y materiales.
+
+    Args:
+        daePath (str): Ruta al archivo .dae.
+        atlasSize (int): Lado máximo de cada atlas.
+        padding (int): Margen alrededor de cada textura.
+
+    Returns:
+        dict: Número de texturas agrupadas, atlas generados y materiales antes y después.
+    """
+    return atlasDaeFiles([daePath], atlasSize, padding)
+
+
+def main():
+    """Agrupa en atlas las texturas de uno o varios archivos Collada ya exportados."""
+    parser = argparse.ArgumentParser(description = "Agrupa las texturas de un Collada en atlas")
+    parser.add_argument("daePaths", nargs = "+")
+    parser.add_argument("--size", type = int, default = 4096)
+    parser.add_argument("--padding", type = int, default = 8)
+    args = parser.parse_args()
+    stats = atlasDaeFiles(args.daePaths, args.size, args.padding)
+    print(f"Texturas agrupadas: {stats['textures']} en {stats['atlases']} atlas, materiales: {stats['materials']} -> {stats['atlasMaterials']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,242 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+import telemetry
+from settings import getConfig, projectRoot, upscalingOptions
+
+resourceNames = ("cpu", "gpu", "memoryMb")
+# Las copias permanentes comparten el índice del almacén y la elección del nombre libre
+permanentCopyLock = threading.Lock()
+
+
+class ResourcePool:
+    """Reparte plazas de CPU, GPU y memoria entre las etapas de los trabajos en ejecución.
+
+    Una etapa solo arranca cuando todos los recursos que pide están libres a la
+    vez, de modo que el upscaling de un mapa puede solaparse con el trabajo de
+    Blender de otro sin superar la capacidad de la máquina.
+    """
+
+    def __init__(self, capacity):
+        self.capacity = dict(capacity)
+        self.available = dict(capacity)
+        self.condition = threading.Condition()
+
+    def clamp(self, request):
+        """Limita una petición a la capacidad total para que siempre pueda llegar a cumplirse."""
+        return {name: min(request.get(name, 0), self.capacity[name]) for name in resourceNames}
+
+    def acquire(self, request):
+        request = self.clamp(request)
+        with self.condition:
+            self.condition.wait_for(lambda: all(self.available[name] >= request[name] for name in resourceNames))
+            for name in resourceNames:
+                self.available[name] -= request[name]
+        return request
+
+    def release(self, request):
+        with self.condition:
+            for name in resourceNames:
+                self.available[name] += request[name]
+            self.condition.notify_all()
+
+
+def loadJobs(jobFile):
+    """Carga y completa la lista de trabajos de un archivo JSON.
+
+    Cada trabajo indica "mapName" y, opcionalmente, "gltfDir", "textureDir",
+    "upscaling" ("0", "2" o "4"), "outputDir", "permanentCopy", la región de
+    interés ("bbox" [sur, oeste, norte, este] y/o "prefix") y "resources" con los
+    recursos de cada etapa.
+
+    Args:
+        jobFile (str): Ruta al archivo de trabajos.
+
+    Returns:
+        list[dict]: Trabajos con todos los campos resueltos.
+
+    Raises:
+        ValueError: Si un trabajo no es válido.
+    """
+    with open(jobFile, "r", encoding = "utf-8") as f:
+        data = json.load(f)
+    jobs = data["jobs"] if isinstance(data, dict) else data
+
+    config = getConfig()
+    batchConfig = config["batch"]
+    names = set()
+    resolved = []
+    for job in jobs:
+        mapName = job.get("mapName", "")
+        if not mapName.replace("_", "").replace("-", "").isalnum():
+            raise ValueError(f"Nombre de mapa no válido: '{mapName}'")
+        if mapName in names:
+            raise ValueError(f"Mapa repetido en el archivo de trabajos: '{mapName}'")
+        names.add(mapName)
+
+        upscaling = str(job.get("upscaling", "0"))
+        if upscaling not in upscalingOptions:
+            raise ValueError(f"Error: Metodo de upscaling '{upscaling}' no válido.")
+
+        resources = job.get("resources", {})
+        resolved.append({
+            "mapName": mapName,
+            "gltfDir": job.get("gltfDir", config["paths"]["gltfDir"]),
+            "textureDir": job.get("textureDir", config["paths"]["textureDir"]),
+            "upscaling": upscaling,
+            "outputDir": os.path.abspath(job.get("outputDir", os.path.join(batchConfig["outputDir"], mapName))),
+            "permanentCopy": job.get("permanentCopy", False),
+            "bbox": job.get("bbox"),
+            "prefix": job.get("prefix"),
+            "resources": {
+                "textures": dict(batchConfig["textureResources"], **resources.get("textures", {})),
+                "geometry": dict(batchConfig["geometryResources"], **resources.get("geometry", {})),
+            },
+        })
+    return resolved
+
+
+def runStage(job, stage, pool, logDir, resume = False):
+    """Ejecuta una etapa de converter.py para un trabajo cuando hay recursos libres.
+
+    Args:
+        job (dict): Trabajo resuelto con loadJobs.
+        stage (str): "textures" o "geometry".
+        pool (ResourcePool): Recursos compartidos.
+        logDir (str): Directorio de los registros de cada etapa.
+        resume (bool): Continuar los upscalings interrumpidos de una ejecución anterior.
+
+    Returns:
+        int: Código de salida de la etapa.
+    """
+    command = [
+        sys.executable,
+        os.path.join(projectRoot, "converter.py"),
+        job["mapName"],
+        "--stage", stage,
+        "--upscaling", job["upscaling"],
+        "--output-dir", job["outputDir"],
+        "--gltf-dir", job["gltfDir"],
+        "--texture-dir", job["textureDir"],
+    ]
+    if resume:
+        command.append("--resume")
+    if job["bbox"]:
+        command.extend(["--bbox"] + [str(value) for value in job["bbox"]])
+    if job["prefix"]:
+        command.extend(["--prefix", job["prefix"]])
+
+    if stage == "textures" and job["upscaling"] == "0":
+        request = {}
+    else:
+        request = pool.acquire(job["resources"][stage])
+    try:
+        print(f"[{job['mapName']}] Iniciando {stage}")
+        slots = {"cpuSlots": request.get("cpu", 0), "gpuSlots": request.get("gpu", 0), "memoryMb": request.get("memoryMb", 0)}
+        with telemetry.stage(f"batch.{stage}", mapName = job["mapName"], **slots) as record:
+            with open(os.path.join(logDir, f"{job['mapName']}.{stage}.log"), "w", encoding = "utf-8") as log:
+                record["returnCode"] = subprocess.run(command, cwd = projectRoot, stdout = log, stderr = subprocess.STDOUT).returncode
+        return record["returnCode"]
+    finally:
+        if request:
+            pool.release(request)
+
+
+def runJob(job, pool, textureLocks, logDir, results, resume = False):
+    """Ejecuta todas las etapas de un trabajo y guarda su resultado.
+
+    Los trabajos que comparten directorio de texturas se serializan, ya que el
+    upscaling sobrescribe las texturas en su sitio.
+    """
+    start = time.perf_counter()
+    status = "ok"
+    try:
+        with textureLocks[os.path.normcase(os.path.abspath(job["textureDir"]))]:
+            for stage in ("textures", "geometry"):
+                returnCode = runStage(job, stage, pool, logDir, resume)
+                if returnCode != 0:
+                    status = f"error en {stage} (código {returnCode})"
+                    break
+
+        if status == "ok":
+            from cleanup import cleanupOutputDae
+
+            cleanupOutputDae(job["outputDir"])
+            if job["permanentCopy"]:
+                from bridge import createPermanentCopy
+
+                with permanentCopyLock:
+                    createPermanentCopy(job["mapName"], job["outputDir"])
+    except Exception as e:
+        # Sin resultado, el resumen no mostraría el trabajo como fallido
+        status = f"error: {e}"
+
+    results[job["mapName"]] = {"status": status, "seconds": time.perf_counter() - start, "outputDir": job["outputDir"]}
+    print(f"[{job['mapName']}] {status} ({results[job['mapName']]['seconds']:.1f} s)")
+
+
+def runBatch(jobs, capacity, resume = False):
+    """Procesa todos los trabajos en paralelo dentro de la capacidad indicada.
+
+    Args:
+        jobs (list[dict]): Trabajos resueltos con loadJobs.
+        capacity (dict): Plazas de "cpu", "gpu" y "memoryMb".
+        resume (bool): Continuar los upscalings interrumpidos de una ejecución anterior.
+
+    Returns:
+        dict: Resultado de cada trabajo por nombre de mapa.
+    """
+    config = getConfig()
+    logDir = os.path.join(config["paths"]["reportsDir"], "batch")
+    os.makedirs(logDir, exist_ok = True)
+
+    pool = ResourcePool(capacity)
+    textureLocks = {}
+    for job in jobs:
+        textureLocks.setdefault(os.path.normcase(os.path.abspath(job["textureDir"])), threading.Lock())
+
+    results = {}
+    threads = [threading.Thread(target = runJob, args = (job, pool, textureLocks, logDir, results, resume)) for job in jobs]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def main():
+    """Procesa varios mapas sin interacción a partir de un archivo de trabajos."""
+    config = getConfig()
+    batchConfig = config["batch"]
+    parser = argparse.ArgumentParser(description = "Procesamiento por lotes de varios mapas")
+    parser.add_argument("jobFile")
+    parser.add_argument("--cpu", type = int, default = batchConfig["cpuSlots"] or os.cpu_count() or 1)
+    parser.add_argument("--gpu", type = int, default = batchConfig["gpuSlots"])
+    parser.add_argument("--memory-mb", type = int, default = batchConfig["memoryMb"])
+    parser.add_argument("--resume", action = "store_true", help = "Continuar los upscalings interrumpidos")
+    args = parser.parse_args()
+
+    jobs = loadJobs(args.jobFile)
+    capacity = {"cpu": args.cpu, "gpu": args.gpu, "memoryMb": args.memory_mb}
+    print(f"Trabajos: {len(jobs)}, recursos: {capacity}")
+
+    if config["telemetry"]["enabled"]:
+        reportPath = telemetry.startReport(config["paths"]["reportsDir"], source = "batch")
+        print(f"Informe de tiempos: {reportPath}")
+
+    results = runBatch(jobs, capacity, args.resume)
+
+    print("\nResumen:")
+    for job in jobs:
+        result = results.get(job["mapName"], {"status": "sin ejecutar", "seconds": 0.0})
+        print(f"  {job['mapName']}: {result['status']} ({result['seconds']:.1f} s)")
+    if any(result["status"] != "ok" for result in results.values()):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,501 @@
+import argparse
+import json
+import os
+import platform
+import shutil
+import struct
+import subprocess
+import sys
+import tempfile
+import time
+import zlib
+import numpy as np
+from settings import getConfig
+
+scales = {
+    "small": {"tiles": 4, "gridSize": 16, "textures": 4, "textureSize": 64, "daeGeometries": 50},
+    "medium": {"tiles": 16, "gridSize": 48, "textures": 8, "textureSize": 128, "daeGeometries": 400},
+    "large": {"tiles": 64, "gridSize": 96, "textures": 16, "textureSize": 256, "daeGeometries": 2000},
+}
+stageNames = ("textures", "geometry", "blender", "cleanup", "merge", "formats")
+keyPrefix = "21537360"
+keyLength = 20
+
+
+def tileKeys(count, seed = 0):
+    """Genera claves de tile deterministas con el formato de los nombres de textura (<clave>_LOD00.png).
+
+    Args:
+        count (int): Número de claves.
+        seed (int): Semilla del generador.
+
+    Returns:
+        list[str]: Claves de 20 dígitos octales, ordenadas y sin repetir.
+    """
+    rng = np.random.RandomState(seed)
+    keys = set()
+    while len(keys) < count:
+        digits = rng.randint(0, 8, size = keyLength - len(keyPrefix))
+        keys.add(keyPrefix + "".join(map(str, digits)))
+    return sorted(keys)
+
+
+def writePng(path, pixels):
+    """Escribe una imagen RGB de 8 bits como PNG usando solo la biblioteca estándar.
+
+    Args:
+        path (str): Ruta del archivo.
+        pixels (np.ndarray): Array (alto, ancho, 3) de tipo uint8.
+    """
+    height, width, _ = pixels.shape
+    rows = np.concatenate([np.zeros((height, 1), dtype = np.uint8), pixels.reshape(height, -1)], axis = 1)
+
+    def chunk(kind, data):
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data) & 0xFFFFFFFF)
+
+    with open(path, "wb") as f:
+        f.write(b"\x89PNG\r\n\x1a\n")
+        f.write(chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)))
+        f.write(chunk(b"IDAT", zlib.compress(rows.tobytes(), 6)))
+        f.write(chunk(b"IEND", b""))
+
+
+def makeTexture(size, seed):
+    """Genera una textura con gradientes suaves y ruido, parecida a una ortofoto."""
+    rng = np.random.RandomState(seed)
+    y, x = np.mgrid[0:size, 0:size].astype(np.float32) / size
+    base = np.stack([np.sin(x * 6 + seed), np.cos(y * 5 + seed), np.sin((x + y) * 4)], axis = 2) * 60 + 110
+    noise = rng.normal(0, 12, size = (size, size, 3))
+    return np.clip(base + noise, 0, 255).astype(np.uint8)
+
+
+def makeGrid(gridSize, seed):
+    """Genera una malla de terreno con los vértices duplicados por triángulo, como en las mallas exportadas.
+
+    Returns:
+        tuple: Posiciones (N, 3) en Y-up, UV (N, 2) e índices (N,).
+    """
+    rng = np.random.RandomState(seed)
+    steps = np.linspace(0.0, 1.0, gridSize + 1, dtype = np.float32)
+    u, v = np.meshgrid(steps, steps)
+    heights = 0.05 * np.sin(u * 7 + seed) * np.cos(v * 5) + rng.normal(0, 0.002, size = u.shape)
+
+    quads = np.arange(gridSize * gridSize)
+    row, column = quads // gridSize, quads % gridSize
+    corners = np.stack([
+        row * (gridSize + 1) + column,
+        row * (gridSize + 1) + column + 1,
+        (row + 1) * (gridSize + 1) + column + 1,
+        (row + 1) * (gridSize + 1) + column,
+    ], axis = 1)
+    triangles = np.concatenate([corners[:, [0, 2, 1]], corners[:, [0, 3, 2]]]).reshape(-1)
+
+    gridPositions = np.stack([u.ravel(), heights.ravel(), v.ravel()], axis = 1).astype(np.float32)
+    gridUvs = np.stack([u.ravel(), v.ravel()], axis = 1).astype(np.float32)
+    return gridPositions[triangles], gridUvs[triangles], np.arange(len(triangles), dtype = np.uint32)
+
+
+def writeGltfTile(gltfDir, name, textureName, gridSize, seed, offset):
+    """Escribe un tile glTF con su .bin externo y un material que referencia su textura."""
+    positions, uvs, indices = makeGrid(gridSize, seed)
+    blob = positions.tobytes() + uvs.tobytes() + indices.tobytes()
+    with open(os.path.join(gltfDir, f"{name}.bin"), "wb") as f:
+        f.write(blob)
+
+    gltf = {
+        "asset": {"version": "2.0", "generator": "benchmark.py"},
+        "scene": 0,
+        "scenes": [{"nodes": [0]}],
+        "nodes": [{"name": name, "mesh": 0, "translation": [offset[0], 0.0, offset[1]]}],
+        "meshes": [{"name": name, "primitives": [{"attributes": {"POSITION": 0, "TEXCOORD_0": 1}, "indices": 2, "material": 0}]}],
+        "materials": [{"name": f"{name}_material", "pbrMetallicRoughness": {"baseColorTexture": {"index": 0}}}],
+        "textures": [{"source": 0}],
+        "images": [{"uri": f"texture/{textureName}"}],
+        "buffers": [{"uri": f"{name}.bin", "byteLength": len(blob)}],
+        "bufferViews": [
+            {"buffer": 0, "byteOffset": 0, "byteLength": positions.nbytes},
+            {"buffer": 0, "byteOffset": positions.nbytes, "byteLength": uvs.nbytes},
+            {"buffer": 0, "byteOffset": positions.nbytes + uvs.nbytes, "byteLength": indices.nbytes},
+        ],
+        "accessors": [
+            {"bufferView": 0, "componentType": 5126, "count": len(positions), "type": "VEC3", "min": positions.min(axis = 0).tolist(), "max": positions.max(axis = 0).tolist()},
+            {"bufferView": 1, "componentType": 5126, "count": len(uvs), "type": "VEC2"},
+            {"bufferView": 2, "componentType": 5125, "count": len(indices), "type": "SCALAR"},
+        ],
+    }
+    with open(os.path.join(gltfDir, f"{name}.gltf"), "w", encoding = "utf-8") as f:
+        json.dump(gltf, f)
+
+
+def writeDae(path, geometryCount, gridSize, seed = 0, defaultObjects = True):
+    """Escribe un Collada sintético con la estructura del exportador de Blender.
+
+    Args:
+        path (str): Ruta del archivo.
+        geometryCount (int): Número de geometrías de tile.
+        gridSize (int): Resolución de la malla de cada tile.
+        seed (int): Semilla del generador.
+        defaultObjects (bool): Incluir el cubo, la cámara y la luz iniciales de Blender.
+    """
+    from geometry import ColladaWriter, processMesh
+
+    positions, uvs, indices = makeGrid(gridSize, seed)
+    mesh = processMesh(positions[:, [0, 2, 1]], uvs, [(0, indices.reshape(-1, 3).astype(np.int64))])
+    names = [f"tile_{index:05d}" for index in range(geometryCount)]
+    if defaultObjects:
+        names.insert(0, "Cube")
+
+    with open(path, "w", encoding = "utf-8") as out:
+        writer = ColladaWriter(out)
+        writer.begin()
+        if defaultObjects:
+            writer.write('  <library_cameras>\n    <camera id="Camera-camera" name="Camera">\n      <optics>\n        <technique_common>\n')
+            writer.write("          <perspective>\n            <xfov>39.59775</xfov>\n            <znear>0.1</znear>\n            <zfar>100</zfar>\n          </perspective>\n")
+            writer.write("        </technique_common>\n      </optics>\n    </camera>\n  </library_cameras>\n")
+            writer.write('  <library_lights>\n    <light id="Light-light" name="Light">\n      <technique_common>\n')
+            writer.write('        <point>\n          <color sid="color">1000 1000 1000</color>\n        </point>\n')
+            writer.write("      </technique_common>\n    </light>\n  </library_lights>\n")
+        writer.writeMaterials([{"id": "Material", "name": "Material", "image": None, "color": (0.8, 0.8, 0.8, 1.0)}], [])
+        writer.write("  <library_geometries>\n")
+        for name in names:
+            writer.writeGeometry(name, name, mesh, {0: "Material"})
+        writer.write("  </library_geometries>\n")
+
+        nodes = [(name, name, name, np.eye(4), ["Material"]) for name in names]
+        # Para la limpieza solo importa el id y el nombre de los nodos iniciales, no su contenido
+        if defaultObjects:
+            nodes.insert(0, ("Camera", "Camera", "Cube", np.eye(4), []))
+            nodes.insert(1, ("Light", "Light", "Cube", np.eye(4), []))
+        writer.writeScene(nodes)
+
+
+def createFixtures(fixtureDir, scale):
+    """Genera todos los datos de entrada de una escala en el directorio indicado.
+
+    Returns:
+        dict: Rutas y tamaños de los datos generados.
+    """
+    parameters = scales[scale]
+    gltfDir = os.path.join(fixtureDir, "gltf")
+    textureDir = os.path.join(gltfDir, "texture")
+    os.makedirs(textureDir, exist_ok = True)
+
+    keys = tileKeys(max(parameters["tiles"], parameters["textures"]))
+    textureNames = [f"{key}_LOD00.png" for key in keys[: parameters["textures"]]]
+    for index, textureName in enumerate(textureNames):
+        writePng(os.path.join(textureDir, textureName), makeTexture(parameters["textureSize"], index))
+
+    side = int(np.ceil(np.sqrt(parameters["tiles"])))
+    for index, key in enumerate(keys[: parameters["tiles"]]):
+        offset = (float(index % side), float(index // side))
+        writeGltfTile(gltfDir, key, textureNames[index % len(textureNames)], parameters["gridSize"], index, offset)
+
+    daePath = os.path.join(fixtureDir, "scene.dae")
+    writeDae(daePath, parameters["daeGeometries"], 8)
+
+    partPaths = []
+    for part in range(4):
+        partPath = os.path.join(fixtureDir, f"scene.part{part}.dae")
+        writeDae(partPath, max(1, parameters["daeGeometries"] // 4), 8, seed = part, defaultObjects = part == 0)
+        partPaths.append(partPath)
+
+    return {
+        "gltfDir": gltfDir,
+        "textureDir": textureDir,
+        "textureNames": textureNames,
+        "daePath": daePath,
+        "partPaths": partPaths,
+    }
+
+
+def stubUpsampler(fixtureDir, upscaleFactor):
+    """Crea un upsampler Real-ESRGAN con una RRDBNet diminuta para medir el pipeline sin los .pth reales.
+
+    Args:
+        fixtureDir (str): Directorio donde guardar los pesos del modelo de prueba.
+        upscaleFactor (int): Factor de escalado (2 o 4).
+
+    Returns:
+        RealESRGANer: Upsampler con el modelo de prueba.
+    """
+    import torch
+    from basicsr.archs.rrdbnet_arch import RRDBNet
+    from realesrgan import RealESRGANer
+    from upscaler import _tileProcess
+
+    torch.manual_seed(0)
+    model = RRDBNet(num_in_ch = 3, num_out_ch = 3, num_feat = 8, num_block = 1, num_grow_ch = 4, scale = upscaleFactor)
+    modelPath = os.path.join(fixtureDir, f"stub_x{upscaleFactor}.pth")
+    torch.save({"params_ema": model.state_dict()}, modelPath)
+
+    upsampler = RealESRGANer(scale = upscaleFactor, model_path = modelPath, model = model, tile = 0, tile_pad = 10, pre_pad = 0, half = False)
+    upsampler.tile_process = lambda: _tileProcess(upsampler)
+    return upsampler
+
+
+def measure(function, repeat = 1, setup = None):
+    """Mide el tiempo real y de CPU de una función y devuelve la mejor de varias repeticiones.
+
+    Args:
+        function (callable): Función a medir.
+        repeat (int): Número de repeticiones.
+        setup (callable, optional): Preparación antes de cada repetición, fuera de la medida.
+
+    Returns:
+        dict: Tiempos "wall" y "cpu" en segundos.
+    """
+    best = None
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        wallStart = time.perf_counter()
+        cpuStart = time.process_time()
+        function()
+        sample = {"wall": time.perf_counter() - wallStart, "cpu": time.process_time() - cpuStart}
+        if best is None or sample["wall"] < best["wall"]:
+            best = sample
+    return best
+
+
+def _restoreTextures(fixtures, workDir):
+    textureDir = os.path.join(workDir, "texture")
+    if os.path.isdir(textureDir):
+        shutil.rmtree(textureDir)
+    shutil.copytree(fixtures["textureDir"], textureDir)
+    return textureDir
+
+
+def benchmarkTextures(fixtures, workDir, repeat):
+    """Upscaling de las texturas con el modelo de prueba, con la configuración de texturas actual."""
+    import torch
+    from upscaler import upscaleTextures
+
+    textureConfig = dict(getConfig()["texture"], tileSize = 0)
+    upsampler = stubUpsampler(workDir, 2)
+    torch.set_num_threads(os.cpu_count() or 1)
+    textureDir = os.path.join(workDir, "texture")
+
+    timing = measure(
+        lambda: upscaleTextures(upsampler, textureDir, fixtures["textureNames"], textureConfig),
+        repeat,
+        setup = lambda: _restoreTextures(fixtures, workDir),
+    )
+    return dict(timing, items = len(fixtures["textureNames"]), unit = "texturas")
+
+
+def benchmarkGeometry(fixtures, workDir, repeat):
+    """Importación, soldado, normales y exportación Collada con el motor NumPy."""
+    from geometry import exportScene
+
+    outputDir = os.path.join(workDir, "geometry")
+    stats = {}
+
+    def run():
+        stats.update(exportScene(fixtures["gltfDir"], fixtures["textureDir"], outputDir, "benchmark"))
+
+    timing = measure(run, repeat)
+    return dict(timing, items = stats["triangles"], unit = "triángulos")
+
+
+def benchmarkBlender(fixtures, workDir, repeat):
+    """Pipeline completo de blender.py (arranque de Blender incluido); requiere el ejecutable configurado."""
+    config = getConfig()
+    blenderExe = config["paths"]["blenderExe"]
+    if not shutil.which(blenderExe) and not os.path.exists(blenderExe):
+        return None
+
+    outputDir = os.path.join(workDir, "blender")
+    os.makedirs(outputDir, exist_ok = True)
+    command = [blenderExe, "--background", "--python", os.path.abspath("blender.py"), "--", fixtures["gltfDir"], fixtures["textureDir"], outputDir, "benchmark"]
+    if not config["blender"]["fusedPasses"]:
+        command.append("--legacy-passes")
+
+    def run():
+        subprocess.run(command, stdout = subprocess.DEVNULL, stderr = subprocess.DEVNULL, check = True)
+
+    timing = measure(run, repeat)
+    return dict(timing, items = len([f for f in os.listdir(fixtures["gltfDir"]) if f.endswith(".gltf")]), unit = "glTF")
+
+
+def benchmarkCleanup(fixtures, workDir, repeat):
+    """Limpieza en streaming de un DAE grande con cleanup.cleanDaeFile."""
+    from cleanup import cleanDaeFile
+
+    daePath = os.path.join(workDir, "cleanup.dae")
+    timing = measure(lambda: cleanDaeFile(daePath), repeat, setup = lambda: shutil.copyfile(fixtures["daePath"], daePath))
+    return dict(timing, items = os.path.getsize(fixtures["daePath"]) / (1024 * 1024), unit = "MB")
+
+
+def benchmarkMerge(fixtures, workDir, repeat):
+    """Combinación de los Collada parciales de varias particiones de Blender."""
+    from collada import mergeColladaFiles
+
+    outputPath = os.path.join(workDir, "merged.dae")
+    timing = measure(lambda: mergeColladaFiles(fixtures["partPaths"], outputPath), repeat)
+    return dict(timing, items = sum(os.path.getsize(path) for path in fixtures["partPaths"]) / (1024 * 1024), unit = "MB")
+
+
+def parseDae(daePath):
+    """Carga un Collada como lo haría un simulador: analiza el XML y convierte los arrays y los índices a NumPy."""
+    import xml.etree.ElementTree as ET
+
+    arrays = []
+    for element in ET.parse(daePath).iter():
+        tag = element.tag.rsplit("}", 1)[-1]
+        if tag == "float_array" and element.text:
+            arrays.append(np.array(element.text.split(), dtype = np.float32))
+        elif tag == "p" and element.text:
+            arrays.append(np.array(element.text.split(), dtype = np.uint32))
+    return arrays
+
+
+def parseGlb(glbPath):
+    """Carga un glb: lee la cabecera y el JSON y obtiene cada accessor como vista NumPy del buffer."""
+    from glb import accessorArray, readGlb
+
+    gltf, binary = readGlb(glbPath)
+    return [accessorArray(gltf, binary, index) for index in range(len(gltf.get("accessors", [])))]
+
+
+def benchmarkFormats(fixtures, workDir, repeat):
+    """Compara el tamaño, el tiempo de exportación y el tiempo de carga del Collada, el glb y el glb cuantizado.
+
+    El tiempo de la etapa es el de exportar el glb; el detalle de cada formato se
+    guarda en "formats".
+    """
+    from geometry import exportScene
+
+    variants = {"dae": ("dae", False), "glb": ("glb", False), "glbQuantized": ("glb", True)}
+    formats = {}
+    exports = {}
+    stats = {}
+    for variant, (meshFormat, quantize) in variants.items():
+        outputDir = os.path.join(workDir, variant)
+
+        def run():
+            stats.update(exportScene(fixtures["gltfDir"], fixtures["textureDir"], outputDir, "benchmark", meshFormat = meshFormat, quantize = quantize))
+
+        exports[variant] = measure(run, repeat)
+        meshPath = os.path.join(outputDir, f"benchmark.{meshFormat}")
+        parse = measure(lambda: (parseGlb if meshFormat == "glb" else parseDae)(meshPath), repeat)
+        formats[variant] = {"bytes": os.path.getsize(meshPath), "exportWall": exports[variant]["wall"], "parseWall": parse["wall"]}
+
+    print("  Formato        Tamaño (KB)  Exportación (s)  Carga (s)")
+    for variant, result in formats.items():
+        print(f"  {variant:<13}  {result['bytes'] / 1024:>11.1f}  {result['exportWall']:>15.3f}  {result['parseWall']:>9.4f}")
+    return dict(exports["glb"], items = stats["triangles"], unit = "triángulos", formats = formats)
+
+
+stageFunctions = {
+    "textures": benchmarkTextures,
+    "geometry": benchmarkGeometry,
+    "blender": benchmarkBlender,
+    "cleanup": benchmarkCleanup,
+    "merge": benchmarkMerge,
+    "formats": benchmarkFormats,
+}
+
+
+def runBenchmarks(scaleNames, stages, repeat = 3):
+    """Ejecuta las etapas seleccionadas sobre datos sintéticos de cada escala.
+
+    Las etapas cuyas dependencias no están disponibles (torch, Blender) se
+    marcan como omitidas en lugar de interrumpir el resto.
+
+    Args:
+        scaleNames (list[str]): Escalas a medir (ver scales).
+        stages (list[str]): Etapas a medir (ver stageNames).
+        repeat (int): Repeticiones por etapa; se guarda la más rápida.
+
+    Returns:
+        dict: Resultados con el entorno y los tiempos por escala y etapa.
+    """
+    results = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "environment": {"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count()},
+        "repeat": repeat,
+        "scales": {},
+    }
+
+    for scale in scaleNames:
+        print(f"\nEscala {scale}: {scales[scale]}")
+        fixtureDir = tempfile.mkdtemp(prefix = f"benchmark_{scale}_")
+        try:
+            fixtures = createFixtures(os.path.join(fixtureDir, "fixtures"), scale)
+            stageResults = {}
+            for stage in stages:
+                workDir = os.path.join(fixtureDir, stage)
+                os.makedirs(workDir, exist_ok = True)
+                reason = None
+                try:
+                    result = stageFunctions[stage](fixtures, workDir, repeat)
+                except ImportError as e:
+                    result = None
+                    reason = str(e)
+                if result is None:
+                    print(f"  {stage}: omitida" + (f" ({reason})" if reason else ""))
+                    stageResults[stage] = {"skipped": True}
+                    continue
+                result["throughput"] = result["items"] / result["wall"] if result["wall"] > 0 else 0.0
+                stageResults[stage] = result
+                print(f"  {stage}: {result['wall']:.3f} s (CPU {result['cpu']:.3f} s), {result['throughput']:.1f} {result['unit']}/s")
+            results["scales"][scale] = stageResults
+        finally:
+            shutil.rmtree(fixtureDir, ignore_errors = True)
+    return results
+
+
+def compareResults(results, baseline, tolerance = 0.1):
+    """Compara los tiempos con una ejecución de referencia.
+
+    Args:
+        results (dict): Resultados de runBenchmarks.
+        baseline (dict): Resultados de referencia con el mismo formato.
+        tolerance (float): Aumento relativo del tiempo a partir del cual se considera regresión.
+
+    Returns:
+        list[tuple]: Escala, etapa, tiempo de referencia, tiempo actual y cociente de las etapas que empeoran.
+    """
+    regressions = []
+    print("\nComparación con la referencia:")
+    for scale, stageResults in results["scales"].items():
+        baseStages = baseline.get("scales", {}).get(scale, {})
+        for stage, result in stageResults.items():
+            baseResult = baseStages.get(stage)
+            if result.get("skipped") or not baseResult or baseResult.get("skipped"):
+                continue
+            ratio = result["wall"] / baseResult["wall"] if baseResult["wall"] > 0 else float("inf")
+            status = "REGRESIÓN" if ratio > 1 + tolerance else "OK"
+            print(f"  {scale}/{stage}: {baseResult['wall']:.3f} s -> {result['wall']:.3f} s ({ratio:.2f}x) {status}")
+            if ratio > 1 + tolerance:
+                regressions.append((scale, stage, baseResult["wall"], result["wall"], ratio))
+    return regressions
+
+
+def main():
+    """Mide el rendimiento de cada etapa del pipeline con datos sintéticos."""
+    parser = argparse.ArgumentParser(description = "Benchmark del pipeline con datos sintéticos")
+    parser.add_argument("--scale", nargs = "+", choices = list(scales), default = ["small"])
+    parser.add_argument("--stages", nargs = "+", choices = stageNames, default = list(stageNames))
+    parser.add_argument("--repeat", type = int, default = 3)
+    parser.add_argument("--output", default = os.path.join(getConfig()["paths"]["reportsDir"], "benchmark.json"))
+    parser.add_argument("--baseline", help = "JSON de una ejecución anterior con el que comparar")
+    parser.add_argument("--tolerance", type = float, default = 0.1)
+    args = parser.parse_args()
+
+    results = runBenchmarks(args.scale, args.stages, args.repeat)
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok = True)
+    with open(args.output, "w", encoding = "utf-8") as f:
+        json.dump(results, f, indent = 2)
+    print(f"\nResultados guardados en {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding = "utf-8") as f:
+            baseline = json.load(f)
+        if compareResults(results, baseline, args.tolerance):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
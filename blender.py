@@ -1,24 +1,54 @@
+import argparse
+import hashlib
+import json
 import os
 import sys
+import time
+import bmesh
 import bpy
+import numpy as np
+from mathutils import Vector
 
+# Blender no añade el directorio del script a sys.path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import telemetry  # noqa: E402
+from cache import fileDigest  # noqa: E402
+from build import shardOf  # noqa: E402
+from atlas import applyTransform, composeAtlas, packRectangles, uvTransform, uvTolerance  # noqa: E402
+from geometry import lodFileName  # noqa: E402
+from chunks import chunkFileName, chunkOf, loadManifest  # noqa: E402
+from tiles import regionFiles  # noqa: E402
 
-def importGLTF(directory):
+
+def importGLTF(directory, shard = 0, shards = 1, chunkDepth = 0, selected = None):
     """Importa todos los archivos GLTF del directorio especificado.
 
+    Cada objeto importado guarda en la propiedad "gltfFile" el archivo del que
+    procede, que se usa para repartirlo en trozos al exportar.
+
     Args:
         directory (str): Ruta al directorio que contiene los archivos GLTF.
+        shard (int): Índice de la partición a importar.
+        shards (int): Número total de particiones en las que se reparten los archivos.
+        chunkDepth (int): Si es mayor que 0, los archivos se reparten por trozo en
+            lugar de por nombre, de modo que cada trozo lo exporta un solo proceso.
+        selected (list[str], optional): Importar solo estos archivos (región de interés).
 
     Returns:
         bool: True si la importación se finalizó de manera correcta.
     """
     gltfFiles = []
-    for f in os.listdir(directory):
-        if f.endswith(".gltf"):
+    for f in sorted(os.listdir(directory)):
+        if selected is not None and f not in selected:
+            continue
+        if f.endswith(".gltf") and shardOf(chunkOf(f, chunkDepth) if chunkDepth else f, shards) == shard:
             gltfFiles.append(f)
 
     for gltfFile in gltfFiles:
+        existing = set(bpy.data.objects)
         bpy.ops.import_scene.gltf(filepath = os.path.join(directory, gltfFile))
+        for obj in set(bpy.data.objects) - existing:
+            obj["gltfFile"] = gltfFile
     return True
 
 
@@ -42,6 +72,29 @@ def exportCollada(outputDir, mapName):
     bpy.ops.wm.collada_export(filepath = outputPath)
 
 
+def exportMeshes(outputPath, meshFormat = "dae", selected = False):
+    """Exporta la escena o los objetos seleccionados como Collada o glTF binario, con los modificadores aplicados.
+
+    El glb se exporta sin cámaras ni luces y con las texturas embebidas.
+
+    Args:
+        outputPath (str): Ruta del archivo de salida.
+        meshFormat (str): Formato de salida, "dae" o "glb".
+        selected (bool): Exportar solo los objetos seleccionados.
+    """
+    if meshFormat == "glb":
+        bpy.ops.export_scene.gltf(
+            filepath = outputPath,
+            export_format = "GLB",
+            use_selection = selected,
+            export_apply = True,
+            export_cameras = False,
+            export_lights = False,
+        )
+    else:
+        bpy.ops.wm.collada_export(filepath = outputPath, apply_modifiers = True, selected = selected)
+
+
 def removeDuplicateVertices():
     """Elimina vértices duplicados de todos los objetos de las mallas"""
     meshObjects = []
@@ -93,6 +146,148 @@ def smoothShade():
         bpy.ops.object.shade_smooth()
 
 
+def processMeshes(threshold = 0.001):
+    """Elimina vértices duplicados, recalcula normales y aplica sombreado suave en una sola pasada.
+
+    Equivale a removeDuplicateVertices, calculateNormals y smoothShade, pero trabaja
+    con bmesh y la API de datos de la malla, sin cambiar la selección ni el modo de
+    edición. Las mallas compartidas por varios objetos se procesan una sola vez.
+
+    Args:
+        threshold (float): Distancia máxima para fusionar vértices.
+
+    Returns:
+        dict: Tiempo acumulado en segundos de cada paso.
+    """
+    meshes = []
+    for obj in bpy.context.scene.objects:
+        if obj.type == "MESH" and obj.data not in meshes:
+            meshes.append(obj.data)
+
+    timings = {"weld": 0.0, "normals": 0.0, "smooth": 0.0}
+    bm = bmesh.new()
+    for mesh in meshes:
+        _fusedPass(bm, mesh, threshold, timings)
+    bm.free()
+
+    print(f"Mallas procesadas: {len(meshes)}")
+    for passName, seconds in timings.items():
+        print(f"Tiempo {passName}: {seconds:.2f} s")
+    return timings
+
+
+def _fusedPass(bm, mesh, threshold, timings):
+    """Aplica a una malla el soldado, las normales y el sombreado de processMeshes, acumulando el tiempo de cada paso."""
+    bm.from_mesh(mesh)
+
+    start = time.perf_counter()
+    bmesh.ops.remove_doubles(bm, verts = bm.verts, dist = threshold)
+    weldEnd = time.perf_counter()
+    bmesh.ops.recalc_face_normals(bm, faces = bm.faces)
+    normalsEnd = time.perf_counter()
+    timings["weld"] += weldEnd - start
+    timings["normals"] += normalsEnd - weldEnd
+
+    bm.to_mesh(mesh)
+    bm.clear()
+
+    start = time.perf_counter()
+    mesh.polygons.foreach_set("use_smooth", [True] * len(mesh.polygons))
+    mesh.update()
+    timings["smooth"] += time.perf_counter() - start
+
+
+def _legacyPass(obj, threshold):
+    """Aplica a un objeto los operadores de removeDuplicateVertices, calculateNormals y smoothShade."""
+    bpy.context.view_layer.objects.active = obj
+    bpy.ops.object.select_all(action = "DESELECT")
+    obj.select_set(True)
+
+    bpy.ops.object.mode_set(mode = "EDIT")
+    bpy.ops.mesh.select_all(action = "SELECT")
+    bpy.ops.mesh.remove_doubles(threshold = threshold)
+    bpy.ops.mesh.normals_make_consistent(inside = False)
+    bpy.ops.object.mode_set(mode = "OBJECT")
+    bpy.ops.object.shade_smooth()
+
+
+def _faceNormals(mesh, decimals = 4):
+    """Obtiene la normal de cada cara indexada por las posiciones de sus vértices, sin depender del orden de las caras."""
+    normals = {}
+    for polygon in mesh.polygons:
+        key = tuple(sorted(tuple(round(value, decimals) for value in mesh.vertices[index].co) for index in polygon.vertices))
+        normals[key] = polygon.normal.copy()
+    return normals
+
+
+def verifyPasses(threshold = 0.001, normalTolerance = 1e-3):
+    """Comprueba que processMeshes da el mismo resultado que los operadores de --legacy-passes.
+
+    Cada malla se copia dos veces y se procesa por los dos caminos; se comparan los
+    vértices que quedan tras el soldado, las caras con sombreado suave y la normal
+    de cada cara. Las mallas de la escena no se modifican.
+
+    Args:
+        threshold (float): Distancia máxima para fusionar vértices.
+        normalTolerance (float): Diferencia máxima entre 1 y el producto escalar de las normales de una cara.
+
+    Returns:
+        dict: Mallas comparadas, vértices resultantes de cada camino, mallas y caras que no coinciden y tiempo de cada camino.
+    """
+    meshes = []
+    for obj in bpy.context.scene.objects:
+        if obj.type == "MESH" and obj.data not in meshes:
+            meshes.append(obj.data)
+
+    stats = {
+        "meshes": len(meshes),
+        "fusedVertices": 0,
+        "legacyVertices": 0,
+        "weldMismatches": 0,
+        "smoothMismatches": 0,
+        "normalMismatches": 0,
+        "fusedSeconds": 0.0,
+        "legacySeconds": 0.0,
+    }
+    timings = {"weld": 0.0, "normals": 0.0, "smooth": 0.0}
+    bm = bmesh.new()
+    for mesh in meshes:
+        fusedMesh = mesh.copy()
+        start = time.perf_counter()
+        _fusedPass(bm, fusedMesh, threshold, timings)
+        stats["fusedSeconds"] += time.perf_counter() - start
+
+        legacyObject = bpy.data.objects.new(f"{mesh.name}.verify", mesh.copy())
+        bpy.context.scene.collection.objects.link(legacyObject)
+        start = time.perf_counter()
+        _legacyPass(legacyObject, threshold)
+        stats["legacySeconds"] += time.perf_counter() - start
+        legacyMesh = legacyObject.data
+
+        stats["fusedVertices"] += len(fusedMesh.vertices)
+        stats["legacyVertices"] += len(legacyMesh.vertices)
+        if len(fusedMesh.vertices) != len(legacyMesh.vertices):
+            stats["weldMismatches"] += 1
+        if sum(p.use_smooth for p in fusedMesh.polygons) != sum(p.use_smooth for p in legacyMesh.polygons):
+            stats["smoothMismatches"] += 1
+
+        fusedNormals = _faceNormals(fusedMesh)
+        legacyNormals = _faceNormals(legacyMesh)
+        for key, normal in fusedNormals.items():
+            legacyNormal = legacyNormals.get(key)
+            if legacyNormal is None or normal.dot(legacyNormal) < 1 - normalTolerance:
+                stats["normalMismatches"] += 1
+        stats["normalMismatches"] += len(legacyNormals.keys() - fusedNormals.keys())
+
+        bpy.data.objects.remove(legacyObject, do_unlink = True)
+        bpy.data.meshes.remove(legacyMesh)
+        bpy.data.meshes.remove(fusedMesh)
+    bm.free()
+
+    stats["matches"] = not (stats["weldMismatches"] or stats["smoothMismatches"] or stats["normalMismatches"])
+    return stats
+
+
 def mergeObjects():
     """Fusiona todos los objetos de malla en un solo objeto y elimina duplicados."""
     meshObjects = []
@@ -132,19 +327,451 @@ def optimizeGeometry():
         bpy.ops.object.modifier_apply(modifier = "Decimate")
 
 
+def _baseColorImage(material):
+    """Obtiene la imagen conectada al color base de un material, o None si no tiene textura."""
+    if material is None or not material.use_nodes:
+        return None
+    for node in material.node_tree.nodes:
+        if node.type == "BSDF_PRINCIPLED":
+            links = node.inputs["Base Color"].links
+            if links and links[0].from_node.type == "TEX_IMAGE":
+                return links[0].from_node.image
+    return None
+
+
+def _loopMaterials(mesh):
+    """Obtiene el índice de material de cada esquina (loop) de la malla."""
+    polygons = len(mesh.polygons)
+    materialIndices = np.empty(polygons, dtype = np.int32)
+    loopStarts = np.empty(polygons, dtype = np.int32)
+    loopTotals = np.empty(polygons, dtype = np.int32)
+    mesh.polygons.foreach_get("material_index", materialIndices)
+    mesh.polygons.foreach_get("loop_start", loopStarts)
+    mesh.polygons.foreach_get("loop_total", loopTotals)
+    order = np.argsort(loopStarts)
+    return np.repeat(materialIndices[order], loopTotals[order]), materialIndices
+
+
+def _meshUvs(mesh):
+    uvs = np.empty(len(mesh.loops) * 2, dtype = np.float32)
+    mesh.uv_layers.active.data.foreach_get("uv", uvs)
+    return uvs.reshape(-1, 2)
+
+
+def _mergeMaterialSlots(mesh):
+    """Pasa los polígonos de las ranuras con un material repetido a la primera ranura con ese material."""
+    remap = np.arange(len(mesh.materials), dtype = np.int32)
+    firstSlot = {}
+    for index, material in enumerate(mesh.materials):
+        remap[index] = firstSlot.setdefault(material, index)
+    if (remap == np.arange(len(remap))).all():
+        return
+    materialIndices = np.empty(len(mesh.polygons), dtype = np.int32)
+    mesh.polygons.foreach_get("material_index", materialIndices)
+    mesh.polygons.foreach_set("material_index", remap[materialIndices])
+    mesh.update()
+
+
+def _imageDigest(image):
+    """Hash del contenido de una imagen.
+
+    Se usan los bytes del archivo o de los datos empaquetados, sin decodificar;
+    los píxeles solo se leen para las imágenes generadas, que no tienen ninguno de
+    los dos, ya que ocupan 16 bytes por píxel en float32.
+    """
+    if image.packed_file is not None:
+        return hashlib.sha256(bytes(image.packed_file.data)).hexdigest()
+    filePath = bpy.path.abspath(image.filepath) if image.source == "FILE" and image.filepath else ""
+    if filePath and os.path.isfile(filePath):
+        return fileDigest(filePath)
+
+    width, height = image.size
+    pixels = np.empty(width * height * image.channels, dtype = np.float32)
+    image.pixels.foreach_get(pixels)
+    digest = hashlib.sha256(f"{width}x{height}x{image.channels}".encode())
+    digest.update(pixels.tobytes())
+    return digest.hexdigest()
+
+
+def _socketValue(socket):
+    value = getattr(socket, "default_value", None)
+    if isinstance(value, float):
+        return round(value, 6)
+    if hasattr(value, "__len__") and not isinstance(value, str):
+        return tuple(round(component, 6) for component in value)
+    return value
+
+
+def _materialKey(material):
+    """Clave con los parámetros de un material: nodos, valores de las entradas sin enlazar, imágenes y enlaces."""
+    if not material.use_nodes:
+        return (tuple(material.diffuse_color), round(material.metallic, 6), round(material.roughness, 6))
+    nodes = tuple(
+        (
+            node.name,
+            node.bl_idname,
+            node.image.name if getattr(node, "image", None) is not None else None,
+            tuple((socket.identifier, _socketValue(socket)) for socket in node.inputs if not socket.is_linked),
+        )
+        for node in sorted(material.node_tree.nodes, key = lambda node: node.name)
+    )
+    links = tuple(sorted(
+        (link.from_node.name, link.from_socket.identifier, link.to_node.name, link.to_socket.identifier)
+        for link in material.node_tree.links
+    ))
+    return (material.blend_method, material.use_backface_culling, nodes, links)
+
+
+def deduplicateMaterials():
+    """Une las imágenes con los mismos píxeles y los materiales con los mismos parámetros.
+
+    Cada glTF importado crea sus propios materiales e imágenes aunque sean
+    idénticos a los de otros tiles. Las imágenes se comparan por el hash de sus
+    píxeles y los materiales por sus nodos una vez unidas las imágenes; los
+    repetidos se sustituyen en todos sus usuarios por el primero y se eliminan,
+    de modo que cada textura se exporta una sola vez.
+
+    Returns:
+        dict: Número de imágenes y materiales antes y después.
+    """
+    images = [image for image in bpy.data.images if image.users and image.size[0] > 0]
+    uniqueImages = {}
+    for image in images:
+        canonical = uniqueImages.setdefault(_imageDigest(image), image)
+        if canonical is not image:
+            image.user_remap(canonical)
+            bpy.data.images.remove(image)
+
+    materials = [material for material in bpy.data.materials if material.users]
+    uniqueMaterials = {}
+    for material in materials:
+        canonical = uniqueMaterials.setdefault(_materialKey(material), material)
+        if canonical is not material:
+            material.user_remap(canonical)
+            bpy.data.materials.remove(material)
+
+    meshes = {obj.data for obj in bpy.context.scene.objects if obj.type == "MESH"}
+    for mesh in meshes:
+        _mergeMaterialSlots(mesh)
+
+    stats = {"inputImages": len(images), "images": len(uniqueImages), "inputMaterials": len(materials), "materials": len(uniqueMaterials)}
+    print(f"Imágenes: {stats['inputImages']} -> {stats['images']}, materiales: {stats['inputMaterials']} -> {stats['materials']}")
+    return stats
+
+
+def atlasTextures(outputDir, atlasName, atlasSize = 4096, padding = 8, objects = None):
+    """Agrupa las texturas de la escena en atlas y reasigna las UV y materiales de las mallas.
+
+    Equivale a atlas.atlasDaeFile, pero se aplica antes de exportar, de modo que
+    el Collada ya referencia solo los atlas. Las texturas con UV fuera de [0, 1]
+    se repiten y se mantienen por separado.
+
+    Args:
+        outputDir (str): Directorio donde se guardan los atlas.
+        atlasName (str): Prefijo de los atlas y sus materiales.
+        atlasSize (int): Lado máximo de cada atlas.
+        padding (int): Margen alrededor de cada textura.
+        objects (list, optional): Agrupar solo las texturas de estos objetos; por
+            defecto, las de toda la escena.
+
+    Returns:
+        dict: Número de texturas agrupadas y atlas generados.
+    """
+    meshes = []
+    for obj in bpy.context.scene.objects if objects is None else objects:
+        if obj.type == "MESH" and obj.data not in meshes:
+            meshes.append(obj.data)
+
+    materialImages = {}
+    excluded = set()
+    for mesh in meshes:
+        hasUvs = mesh.uv_layers.active is not None
+        if hasUvs:
+            uvs = _meshUvs(mesh)
+            loopMaterials, _ = _loopMaterials(mesh)
+        for index, material in enumerate(mesh.materials):
+            image = _baseColorImage(material)
+            if image is None:
+                continue
+            materialImages[material] = image
+            used = uvs[loopMaterials == index] if hasUvs else None
+            if used is None or (len(used) and (used.min() < -uvTolerance or used.max() > 1 + uvTolerance)):
+                excluded.add(image)
+
+    images = [image for image in dict.fromkeys(materialImages.values()) if image not in excluded and image.size[0] > 0]
+    placements, atlasSizes = packRectangles([tuple(image.size) for image in images], atlasSize, padding)
+    tiles = [[] for _ in atlasSizes]
+    transforms = {}
+    for image, placement in zip(images, placements):
+        if placement is None:
+            continue
+        atlasIndex, x, y = placement
+        width, height = image.size
+        pixels = np.empty(width * height * 4, dtype = np.float32)
+        image.pixels.foreach_get(pixels)
+        # Blender guarda los píxeles de abajo arriba
+        tile = (pixels.reshape(height, width, 4)[::-1] * 255.0 + 0.5).astype(np.uint8)
+        if (tile[..., 3] == 255).all():
+            tile = tile[..., :3]
+        tiles[atlasIndex].append((tile, x, y))
+        transforms[image] = (atlasIndex, uvTransform(x, y, width, height, *atlasSizes[atlasIndex]))
+
+    # Un atlas con una sola textura no ahorra nada
+    transforms = {image: value for image, value in transforms.items() if len(tiles[value[0]]) > 1}
+    atlasMaterials = {}
+    for number, atlasIndex in enumerate(sorted({atlasIndex for atlasIndex, _ in transforms.values()})):
+        atlasWidth, atlasHeight = atlasSizes[atlasIndex]
+        atlas = composeAtlas(atlasWidth, atlasHeight, tiles[atlasIndex], padding)
+        rgba = np.concatenate([atlas, np.full(atlas.shape[:2] + (4 - atlas.shape[2],), 255, dtype = np.uint8)], axis = 2)
+        atlasId = f"{atlasName}_atlas{number}"
+        atlasImage = bpy.data.images.new(atlasId, atlasWidth, atlasHeight, alpha = atlas.shape[2] == 4)
+        atlasImage.pixels.foreach_set((rgba[::-1].astype(np.float32) / 255.0).reshape(-1))
+        atlasImage.filepath_raw = os.path.join(outputDir, f"{atlasId}.png")
+        atlasImage.file_format = "PNG"
+        atlasImage.save()
+
+        material = bpy.data.materials.new(atlasId)
+        material.use_nodes = True
+        nodes = material.node_tree.nodes
+        texture = nodes.new("ShaderNodeTexImage")
+        texture.image = atlasImage
+        material.node_tree.links.new(texture.outputs["Color"], nodes["Principled BSDF"].inputs["Base Color"])
+        atlasMaterials[atlasIndex] = material
+
+    replaced = {material: image for material, image in materialImages.items() if image in transforms}
+    for mesh in meshes:
+        slots = [material in replaced for material in mesh.materials]
+        if not any(slots):
+            continue
+        uvs = _meshUvs(mesh)
+        loopMaterials, _ = _loopMaterials(mesh)
+        for index, material in enumerate(mesh.materials):
+            if material in replaced:
+                mask = loopMaterials == index
+                uvs[mask] = applyTransform(uvs[mask], transforms[replaced[material]][1])
+        mesh.uv_layers.active.data.foreach_set("uv", uvs.reshape(-1))
+
+        # Las ranuras que pasan a usar el mismo atlas se unen en la primera
+        for index, material in enumerate(list(mesh.materials)):
+            if material in replaced:
+                mesh.materials[index] = atlasMaterials[transforms[replaced[material]][0]]
+        _mergeMaterialSlots(mesh)
+
+    for material in replaced:
+        if material.users == 0:
+            bpy.data.materials.remove(material)
+    for image in transforms:
+        if image.users == 0:
+            bpy.data.images.remove(image)
+
+    print(f"Texturas agrupadas: {len(transforms)} en {len(atlasMaterials)} atlas")
+    return {"textures": len(transforms), "atlases": len(atlasMaterials)}
+
+
+def countTriangles(meshObjects):
+    """Cuenta los triángulos de los objetos con sus modificadores aplicados."""
+    depsgraph = bpy.context.evaluated_depsgraph_get()
+    triangles = 0
+    for obj in meshObjects:
+        evaluated = obj.evaluated_get(depsgraph)
+        mesh = evaluated.to_mesh()
+        mesh.calc_loop_triangles()
+        triangles += len(mesh.loop_triangles)
+        evaluated.to_mesh_clear()
+    return triangles
+
+
+def exportLods(outputDir, mapName, levels, meshObjects = None, meshFormat = "dae"):
+    """Exporta una malla por cada nivel de detalle sin modificar la escena.
+
+    Los niveles con "ratio" añaden un modificador Decimate temporal y los niveles
+    con "error" fusionan sobre una copia de la malla los vértices más cercanos que
+    esa distancia. Cada nivel se escribe en <mapName>_lod<n>.dae (o .glb).
+
+    Args:
+        outputDir (str): Directorio de salida.
+        mapName (str): Nombre del mapa.
+        levels (list[dict]): Niveles con "ratio" (fracción de triángulos) o "error" (metros).
+        meshObjects (list, optional): Exportar solo estos objetos, que deben estar
+            seleccionados; por defecto se exporta toda la escena.
+        meshFormat (str): Formato de salida, "dae" o "glb".
+
+    Returns:
+        list[dict]: Triángulos y tiempo de exportación de cada nivel.
+    """
+    selected = meshObjects is not None
+    if meshObjects is None:
+        meshObjects = [obj for obj in bpy.context.scene.objects if obj.type == "MESH"]
+    results = []
+    for number, level in enumerate(levels, start = 1):
+        start = time.perf_counter()
+        originals = {obj: obj.data for obj in meshObjects}
+        copies = {}
+        for obj in meshObjects:
+            if level.get("error"):
+                if obj.data not in copies:
+                    copy = obj.data.copy()
+                    bm = bmesh.new()
+                    bm.from_mesh(copy)
+                    bmesh.ops.remove_doubles(bm, verts = bm.verts, dist = level["error"])
+                    bm.to_mesh(copy)
+                    bm.free()
+                    copies[obj.data] = copy
+                obj.data = copies[originals[obj]]
+            else:
+                decimate = obj.modifiers.new(name = "LOD", type = "DECIMATE")
+                decimate.ratio = level.get("ratio", 1.0)
+                decimate.use_collapse_triangulate = True
+
+        triangles = countTriangles(meshObjects)
+        fileName = lodFileName(mapName, number, f".{meshFormat}")
+        exportMeshes(os.path.join(outputDir, fileName), meshFormat, selected)
+
+        for obj in meshObjects:
+            decimate = obj.modifiers.get("LOD")
+            if decimate is not None:
+                obj.modifiers.remove(decimate)
+            obj.data = originals[obj]
+        for copy in copies.values():
+            bpy.data.meshes.remove(copy)
+
+        results.append({"level": number, "file": fileName, "triangles": triangles, "seconds": time.perf_counter() - start})
+    return results
+
+
+def exportChunks(outputDir, mapName, manifest, levels, meshFormat = "dae", atlasSize = 0, padding = 8):
+    """Exporta una malla por cada trozo de la escena, con sus niveles de detalle.
+
+    Los objetos de cada trozo se desplazan a su origen antes de exportarlos y se
+    devuelven a su posición después, de modo que cada malla queda centrada y el
+    model.sdf la coloca con la pose del trozo. Cada trozo tiene sus propios atlas
+    (<mapName>_<trozo>_atlas<n>.png), como con el motor NumPy, de modo que los
+    procesos que exportan trozos distintos no escriben los mismos archivos.
+
+    Args:
+        outputDir (str): Directorio de salida.
+        mapName (str): Nombre del mapa.
+        manifest (dict): Índice de trozos (ver chunks.saveManifest).
+        levels (list[dict]): Niveles de detalle adicionales.
+        meshFormat (str): Formato de salida, "dae" o "glb".
+        atlasSize (int): Lado máximo de cada atlas (0 = sin atlas).
+        padding (int): Margen alrededor de cada textura del atlas.
+
+    Returns:
+        list[dict]: Objetos, triángulos, texturas agrupadas y tiempo de exportación de cada trozo.
+    """
+    chunkObjects = {}
+    for obj in bpy.context.scene.objects:
+        if "gltfFile" in obj:
+            chunkObjects.setdefault(chunkOf(obj["gltfFile"], manifest["depth"]), []).append(obj)
+
+    results = []
+    for chunk, objects in sorted(chunkObjects.items()):
+        start = time.perf_counter()
+        chunkName = chunkFileName(mapName, chunk)
+        textures = atlasTextures(outputDir, chunkName, atlasSize, padding, objects)["textures"] if atlasSize > 0 else 0
+        origin = Vector(manifest["chunks"][chunk]["origin"])
+        roots = [obj for obj in objects if obj.parent is None]
+        for obj in roots:
+            obj.location -= origin
+        bpy.ops.object.select_all(action = "DESELECT")
+        for obj in objects:
+            obj.select_set(True)
+
+        meshObjects = [obj for obj in objects if obj.type == "MESH"]
+        exportMeshes(os.path.join(outputDir, f"{chunkName}.{meshFormat}"), meshFormat, selected = True)
+        triangles = countTriangles(meshObjects)
+        seconds = time.perf_counter() - start
+        exportLods(outputDir, chunkName, levels, meshObjects, meshFormat)
+
+        for obj in roots:
+            obj.location += origin
+        results.append({"chunk": chunk, "objects": len(objects), "triangles": triangles, "textures": textures, "seconds": seconds})
+    return results
+
+
+def removeDefaultObjects():
+    """Elimina el cubo, la cámara y la luz de la escena inicial de Blender."""
+    for name in ("Cube", "Camera", "Light"):
+        obj = bpy.data.objects.get(name)
+        if obj is not None:
+            bpy.data.objects.remove(obj, do_unlink = True)
+
+
 def main():
     """Función principal que procesa modelos 3D a través del pipeline de Blender."""
-    args = sys.argv[sys.argv.index("--") + 1 :]
-    gltfDir, textureDir, outputDir, mapName = args
-
-    if importGLTF(gltfDir):
-        findTextures(textureDir)
-        removeDuplicateVertices()
-        calculateNormals()
-        smoothShade()
+    parser = argparse.ArgumentParser()
+    parser.add_argument("gltfDir")
+    parser.add_argument("textureDir")
+    parser.add_argument("outputDir")
+    parser.add_argument("mapName")
+    parser.add_argument("--shard", type = int, default = 0)
+    parser.add_argument("--shards", type = int, default = 1)
+    parser.add_argument("--legacy-passes", action = "store_true")
+    parser.add_argument("--verify-passes", action = "store_true", help = "Comparar la pasada bmesh con los operadores de --legacy-passes")
+    parser.add_argument("--no-dedupe", action = "store_true", help = "No unir imágenes y materiales repetidos")
+    parser.add_argument("--atlas-size", type = int, default = 0)
+    parser.add_argument("--atlas-padding", type = int, default = 8)
+    parser.add_argument("--lod-levels", default = "[]", help = "Niveles de detalle adicionales en JSON")
+    parser.add_argument("--chunks", action = "store_true", help = "Exportar una malla por trozo según el índice chunks.json")
+    parser.add_argument("--format", choices = ["dae", "glb"], default = "dae")
+    parser.add_argument("--region", help = "Región de interés en JSON (bbox y/o prefix)")
+    parser.add_argument("--cache-dir", help = "Directorio de la caché con el índice de tiles")
+    args = parser.parse_args(sys.argv[sys.argv.index("--") + 1 :])
+    gltfDir, textureDir, outputDir, mapName = args.gltfDir, args.textureDir, args.outputDir, args.mapName
+    telemetry.configure(relay = True, source = f"blender{args.shard}")
+
+    # Los objetos iniciales se eliminan antes de exportar, así que la salida no necesita cleanup.py
+    removeDefaultObjects()
+
+    manifest = loadManifest(outputDir) if args.chunks else None
+    selected, _ = regionFiles(gltfDir, textureDir, json.loads(args.region) if args.region else None, args.cache_dir)
+    with telemetry.stage("blender.import") as record:
+        imported = importGLTF(gltfDir, args.shard, args.shards, manifest["depth"] if manifest else 0, None if selected is None else set(selected))
+        record["items"] = len([obj for obj in bpy.context.scene.objects if obj.type == "MESH"])
+
+    if imported:
+        with telemetry.stage("blender.findTextures"):
+            findTextures(textureDir)
+        if not args.no_dedupe:
+            with telemetry.stage("blender.dedupe") as record:
+                dedupeStats = deduplicateMaterials()
+                record["items"] = dedupeStats["inputMaterials"] - dedupeStats["materials"]
+        if args.verify_passes:
+            with telemetry.stage("blender.verifyPasses") as record:
+                record.update(verifyPasses())
+                record["items"] = record["meshes"]
+        if args.legacy_passes:
+            for passName, passFunction in (("weld", removeDuplicateVertices), ("normals", calculateNormals), ("smooth", smoothShade)):
+                with telemetry.stage(f"blender.{passName}"):
+                    passFunction()
+        else:
+            with telemetry.stage("blender.processMeshes"):
+                timings = processMeshes()
+            for passName, seconds in timings.items():
+                telemetry.event(f"blender.{passName}", wall = seconds)
+        # Con la escena dividida en trozos, los atlas se generan por trozo en exportChunks
+        if args.atlas_size > 0 and manifest is None:
+            with telemetry.stage("blender.atlas") as record:
+                record["items"] = atlasTextures(outputDir, mapName, args.atlas_size, args.atlas_padding)["textures"]
         # mergeObjects
         # optimizeGeometry
-        exportCollada(outputDir, mapName)
+        if manifest is not None:
+            with telemetry.stage("blender.chunks") as record:
+                chunkResults = exportChunks(outputDir, mapName, manifest, json.loads(args.lod_levels), args.format, args.atlas_size, args.atlas_padding)
+                record["items"] = len(chunkResults)
+            for chunk in chunkResults:
+                print(f"Trozo {chunk['chunk']}: {chunk['objects']} objetos, {chunk['triangles']} triángulos, {chunk['textures']} texturas en atlas, {chunk['seconds']:.2f} s")
+            return
+        with telemetry.stage("blender.export") as record:
+            record["items"] = countTriangles([obj for obj in bpy.context.scene.objects if obj.type == "MESH"])
+            if args.format == "glb":
+                exportMeshes(os.path.join(outputDir, f"{mapName}.glb"), "glb")
+            else:
+                exportCollada(outputDir, mapName)
+        for level in exportLods(outputDir, mapName, json.loads(args.lod_levels), meshFormat = args.format):
+            print(f"Nivel {level['level']}: {level['triangles']} triángulos en {level['seconds']:.2f} s ({level['file']})")
+            telemetry.event(f"blender.lod{level['level']}", wall = level["seconds"], items = level["triangles"])
 
 
 if __name__ == "__main__":
@@ -3,7 +3,8 @@ import shutil
 import subprocess
 import time
 from datetime import datetime
-from settings import getUpscalingConfig, setMapName
+import telemetry
+from settings import getConfig, getUpscalingConfig, setMapName
 
 
 def loadUpscaleConfig():
@@ -118,16 +119,15 @@ def askForPermanentCopy():
             print("Por favor, responde 's' para sí o 'n' para no.")
 
 
-def createPermanentCopy(mapName):
+def createPermanentCopy(mapName, outputDir = None):
     """Crea una copia permanente del mapa procesado.
 
     Args:
         mapName (str): Nombre del mapa para crear la copia permanente.
+        outputDir (str, optional): Directorio a copiar; por defecto, la salida configurada.
     """
-    from settings import getConfig
-
     config = getConfig()
-    outputDir = config["paths"]["outputDir"]
+    outputDir = outputDir or config["paths"]["outputDir"]
     savesDir = config["paths"]["savesDir"]
 
     os.makedirs(savesDir, exist_ok=True)
@@ -142,7 +142,16 @@ def createPermanentCopy(mapName):
         counter += 1
 
     try:
-        shutil.copytree(outputDir, permanentDir)
+        if config["saves"]["deduplicate"]:
+            from cleanup import cleanupOutputDae
+            from store import createSave
+
+            # Se guardan los DAE ya limpios para que la limpieza de saves no rompa los enlaces
+            cleanupOutputDae(outputDir)
+            fileCount, linked, newBytes = createSave(outputDir, savesDir, finalMapName)
+            print(f"Archivos: {fileCount} ({linked} enlazados), {newBytes / (1024 * 1024):.1f} MB nuevos en el almacén")
+        else:
+            shutil.copytree(outputDir, permanentDir)
         if finalMapName != mapName:
             print(f"Copia permanente creada en: {permanentDir}")
             print(f"(Renombrado a '{finalMapName}' para evitar duplicados)")
@@ -177,14 +186,21 @@ def main():
 
     input("\n--- Pulsa Enter para iniciar el procesamiento (Puede llevar un tiempo) ---")
 
-    runProcessingPipeline(mapName)
+    config = getConfig()
+    reportPath = None
+    if config["telemetry"]["enabled"]:
+        reportPath = telemetry.startReport(config["paths"]["reportsDir"], source = "bridge")
+
+    with telemetry.stage("pipeline", mapName = mapName):
+        runProcessingPipeline(mapName)
 
     endTime = time.time()
 
     print(f"\nTiempo total de la sesión: {(endTime - startTime):.1f} segundos")
 
     if askForPermanentCopy():
-        createPermanentCopy(mapName)
+        with telemetry.stage("permanentCopy", mapName = mapName):
+            createPermanentCopy(mapName)
 
     try:
         from cleanup import main as cleanupMain
@@ -193,6 +209,8 @@ def main():
     except Exception:
         pass
 
+    if reportPath is not None:
+        print(f"Informe de tiempos: {reportPath}")
     print("\n¡Procesamiento completado!")
 
 
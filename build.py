@@ -0,0 +1,143 @@
+import hashlib
+import json
+import os
+import zlib
+
+stateName = ".build_state.json"
+
+
+def shardOf(fileName, shards):
+    """Asigna un archivo a una partición de forma estable.
+
+    La partición depende solo del nombre, así que añadir o quitar un tile no
+    cambia la partición del resto y solo se reprocesan las particiones afectadas.
+
+    Args:
+        fileName (str): Nombre del archivo glTF.
+        shards (int): Número total de particiones.
+
+    Returns:
+        int: Índice de la partición.
+    """
+    return zlib.crc32(fileName.encode("utf-8")) % shards
+
+
+def fileStamp(filePath):
+    """Obtiene el tamaño y la fecha de modificación de un archivo, o None si no existe."""
+    try:
+        stat = os.stat(filePath)
+    except OSError:
+        return None
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def digestOf(*parts):
+    """Calcula el hash de un conjunto de valores serializables a JSON."""
+    return hashlib.sha256(json.dumps(parts, sort_keys = True, default = str).encode()).hexdigest()
+
+
+def directoryFingerprint(directory, extensions):
+    """Calcula la huella de los archivos de un directorio con las extensiones indicadas.
+
+    Args:
+        directory (str): Directorio a recorrer (sin subdirectorios).
+        extensions (tuple[str]): Extensiones en minúsculas, por ejemplo (".png",).
+
+    Returns:
+        str: Hash de los nombres, tamaños y fechas de modificación.
+    """
+    if not os.path.isdir(directory):
+        return digestOf(None)
+    entries = []
+    for f in sorted(os.listdir(directory)):
+        if f.lower().endswith(extensions):
+            entries.append((f, fileStamp(os.path.join(directory, f))))
+    return digestOf(entries)
+
+
+def gltfDependencies(gltfPath):
+    """Obtiene el archivo glTF y los buffers externos que referencia.
+
+    Args:
+        gltfPath (str): Ruta al archivo .gltf.
+
+    Returns:
+        list[str]: Rutas de los archivos de los que depende la malla.
+    """
+    dependencies = [gltfPath]
+    try:
+        with open(gltfPath, "r", encoding = "utf-8") as f:
+            gltf = json.load(f)
+    except (OSError, ValueError):
+        return dependencies
+    baseDir = os.path.dirname(gltfPath)
+    for buffer in gltf.get("buffers", []):
+        uri = buffer.get("uri", "")
+        if uri and not uri.startswith("data:"):
+            dependencies.append(os.path.join(baseDir, uri))
+    return dependencies
+
+
+def gltfFingerprint(gltfDir, gltfFiles):
+    """Calcula la huella de un conjunto de glTF y sus buffers.
+
+    Args:
+        gltfDir (str): Directorio de los glTF.
+        gltfFiles (list[str]): Nombres de los archivos .gltf.
+
+    Returns:
+        str: Hash de los archivos y sus fechas de modificación.
+    """
+    entries = []
+    for gltfFile in sorted(gltfFiles):
+        for dependency in gltfDependencies(os.path.join(gltfDir, gltfFile)):
+            entries.append((os.path.relpath(dependency, gltfDir), fileStamp(dependency)))
+    return digestOf(entries)
+
+
+def loadState(outputDir):
+    """Carga el estado de la última compilación incremental del directorio de salida.
+
+    Args:
+        outputDir (str): Directorio de salida.
+
+    Returns:
+        dict: Huella de cada etapa terminada.
+    """
+    statePath = os.path.join(outputDir, stateName)
+    if not os.path.exists(statePath):
+        return {}
+    try:
+        with open(statePath, "r", encoding = "utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def saveState(outputDir, state):
+    """Guarda el estado de la compilación incremental de forma atómica.
+
+    Args:
+        outputDir (str): Directorio de salida.
+        state (dict): Huella de cada etapa terminada.
+    """
+    statePath = os.path.join(outputDir, stateName)
+    tempPath = f"{statePath}.tmp"
+    with open(tempPath, "w", encoding = "utf-8") as f:
+        json.dump(state, f, indent = 2, sort_keys = True)
+    os.replace(tempPath, statePath)
+
+
+def isUpToDate(state, stage, fingerprint, outputs = ()):
+    """Comprueba si una etapa se completó con las mismas entradas y sus resultados siguen existiendo.
+
+    Args:
+        state (dict): Estado cargado con loadState.
+        stage (str): Nombre de la etapa.
+        fingerprint (str): Huella actual de sus entradas.
+        outputs (list[str]): Archivos que la etapa debe haber generado.
+
+    Returns:
+        bool: True si la etapa se puede omitir.
+    """
+    return state.get(stage) == fingerprint and all(os.path.exists(path) for path in outputs)
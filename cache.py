@@ -0,0 +1,189 @@
+import hashlib
+import os
+import shutil
+
+
+def fileDigest(filePath, chunkSize = 1 << 20):
+    """Calcula el hash SHA-256 del contenido de un archivo.
+
+    Args:
+        filePath (str): Ruta al archivo.
+        chunkSize (int): Tamaño de bloque de lectura en bytes.
+
+    Returns:
+        str: Hash hexadecimal del contenido.
+    """
+    digest = hashlib.sha256()
+    with open(filePath, "rb") as f:
+        for chunk in iter(lambda: f.read(chunkSize), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def configDigest(modelPath, upscaleFactor, tileSize, halfPrecision, quantization = None, triage = None):
+    """Calcula el hash de la configuración de upscaling que afecta al resultado.
+
+    Args:
+        modelPath (str): Ruta al archivo .pth del modelo.
+        upscaleFactor (int): Factor de escalado.
+        tileSize (int): Tamaño de tile.
+        halfPrecision (bool): Uso de precisión media.
+        quantization (str, optional): Cuantización del backend de inferencia.
+        triage (dict, optional): Umbrales de la clasificación de texturas, si está activa.
+
+    Returns:
+        str: Hash hexadecimal de la configuración.
+    """
+    digest = hashlib.sha256()
+    digest.update(fileDigest(modelPath).encode())
+    digest.update(f"x{upscaleFactor}|tile{tileSize}|half{int(bool(halfPrecision))}".encode())
+    if quantization:
+        digest.update(f"|{quantization}".encode())
+    if triage:
+        digest.update(f"|triage{sorted(triage.items())}".encode())
+    return digest.hexdigest()
+
+
+def textureKey(settingsDigest, inputDigest):
+    """Obtiene la clave de caché de una textura.
+
+    Args:
+        settingsDigest (str): Hash de la configuración (ver configDigest).
+        inputDigest (str): Hash del contenido de la textura original.
+
+    Returns:
+        str: Clave hexadecimal de la entrada de caché.
+    """
+    return hashlib.sha256(f"{settingsDigest}:{inputDigest}".encode()).hexdigest()
+
+
+def _objectPath(cacheDir, key):
+    return os.path.join(cacheDir, "objects", key[:2], f"{key}.png")
+
+
+def _markerPath(cacheDir, settingsDigest, outputDigest):
+    return os.path.join(cacheDir, "upscaled", settingsDigest[:16], outputDigest)
+
+
+def isUpscaled(cacheDir, settingsDigest, fileDigestValue):
+    """Comprueba si una textura ya es el resultado de un upscaling con esta configuración.
+
+    Evita volver a escalar texturas que una ejecución anterior ya sobrescribió.
+
+    Args:
+        cacheDir (str): Directorio de la caché.
+        settingsDigest (str): Hash de la configuración.
+        fileDigestValue (str): Hash del contenido actual de la textura.
+
+    Returns:
+        bool: True si la textura ya está escalada.
+    """
+    return os.path.exists(_markerPath(cacheDir, settingsDigest, fileDigestValue))
+
+
+def lookupTexture(cacheDir, key):
+    """Busca una textura escalada en la caché y actualiza su uso para el LRU.
+
+    Args:
+        cacheDir (str): Directorio de la caché.
+        key (str): Clave de la entrada.
+
+    Returns:
+        str: Ruta de la textura en caché o None si no existe.
+    """
+    cachedPath = _objectPath(cacheDir, key)
+    if not os.path.exists(cachedPath):
+        return None
+    try:
+        os.utime(cachedPath)
+    except OSError:
+        pass
+    return cachedPath
+
+
+def restoreTexture(cachedPath, imagePath, useLinks = False):
+    """Copia o enlaza una textura de la caché sobre su ruta de destino.
+
+    Args:
+        cachedPath (str): Ruta de la textura en caché.
+        imagePath (str): Ruta de destino.
+        useLinks (bool): Intentar un enlace duro antes de copiar.
+    """
+    tempPath = f"{imagePath}.tmp"
+    if os.path.exists(tempPath):
+        os.remove(tempPath)
+
+    linked = False
+    if useLinks:
+        try:
+            os.link(cachedPath, tempPath)
+            linked = True
+        except OSError:
+            pass
+    if not linked:
+        shutil.copyfile(cachedPath, tempPath)
+    os.replace(tempPath, imagePath)
+
+
+def storeTexture(cacheDir, settingsDigest, key, imagePath):
+    """Guarda una textura escalada en la caché y la marca como escalada.
+
+    Args:
+        cacheDir (str): Directorio de la caché.
+        settingsDigest (str): Hash de la configuración.
+        key (str): Clave de la entrada.
+        imagePath (str): Ruta de la textura escalada.
+    """
+    cachedPath = _objectPath(cacheDir, key)
+    os.makedirs(os.path.dirname(cachedPath), exist_ok = True)
+    tempPath = f"{cachedPath}.tmp"
+    shutil.copyfile(imagePath, tempPath)
+    os.replace(tempPath, cachedPath)
+
+    markerPath = _markerPath(cacheDir, settingsDigest, fileDigest(cachedPath))
+    os.makedirs(os.path.dirname(markerPath), exist_ok = True)
+    open(markerPath, "w").close()
+
+
+def evictTextures(cacheDir, maxBytes):
+    """Elimina las entradas menos usadas recientemente hasta respetar el tamaño máximo.
+
+    Las marcas de textura escalada se conservan: son el único registro de que una
+    textura ya sobrescrita en su directorio está escalada y, sin ellas, se volvería
+    a escalar en la siguiente ejecución. Son archivos vacíos, así que apenas ocupan.
+
+    Args:
+        cacheDir (str): Directorio de la caché.
+        maxBytes (int): Tamaño máximo de la caché en bytes.
+
+    Returns:
+        int: Número de entradas eliminadas.
+    """
+    objectsDir = os.path.join(cacheDir, "objects")
+    if not os.path.isdir(objectsDir):
+        return 0
+
+    entries = []
+    totalBytes = 0
+    for root, _, files in os.walk(objectsDir):
+        for f in files:
+            path = os.path.join(root, f)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            totalBytes += stat.st_size
+
+    removed = 0
+    entries.sort()
+    for _, size, path in entries:
+        if totalBytes <= maxBytes:
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+        totalBytes -= size
+        removed += 1
+    return removed
@@ -0,0 +1,137 @@
+import json
+import os
+import re
+import numpy as np
+from geometry import meshInstances
+
+manifestName = "chunks.json"
+keyPattern = re.compile(r"^[0-7]+")
+
+
+def tileKey(fileName):
+    """Obtiene la clave octal del tile al principio de un nombre de archivo, o None si no tiene."""
+    match = keyPattern.match(os.path.basename(fileName))
+    return match.group(0) if match else None
+
+
+def chunkOf(fileName, depth):
+    """Obtiene el trozo al que pertenece un tile: los primeros dígitos de su clave.
+
+    Args:
+        fileName (str): Nombre del archivo glTF o de la textura.
+        depth (int): Número de dígitos de la clave que definen el trozo.
+
+    Returns:
+        str: Prefijo de la clave, o "misc" si el nombre no empieza por una clave.
+    """
+    key = tileKey(fileName)
+    return key[:depth] if key else "misc"
+
+
+def chunkFileName(mapName, chunk):
+    """Nombre sin extensión de la malla de un trozo."""
+    return f"{mapName}_{chunk}"
+
+
+def groupChunks(gltfFiles, depth):
+    """Agrupa los glTF por el prefijo de su clave.
+
+    Args:
+        gltfFiles (list[str]): Nombres de los archivos glTF.
+        depth (int): Número de dígitos de la clave que definen cada trozo.
+
+    Returns:
+        dict: Trozo -> nombres de sus glTF, ordenado por trozo.
+    """
+    chunks = {}
+    for gltfFile in sorted(gltfFiles):
+        chunks.setdefault(chunkOf(gltfFile, depth), []).append(gltfFile)
+    return dict(sorted(chunks.items()))
+
+
+def gltfBounds(gltfPath):
+    """Calcula la caja envolvente en Z-up de un glTF a partir del mínimo y máximo de sus accessors.
+
+    No lee los buffers: el formato obliga a declarar "min" y "max" en los accessors
+    de posiciones, así que basta con transformar las esquinas de cada caja.
+
+    Args:
+        gltfPath (str): Ruta al archivo .gltf.
+
+    Returns:
+        tuple: Mínimo y máximo (3,), o None si no hay posiciones con límites.
+    """
+    with open(gltfPath, "r", encoding = "utf-8") as f:
+        gltf = json.load(f)
+    accessors = gltf.get("accessors", [])
+    corners = []
+    for _, meshIndex, matrix in meshInstances(gltf):
+        for primitive in gltf["meshes"][meshIndex].get("primitives", []):
+            accessor = accessors[primitive["attributes"]["POSITION"]] if "POSITION" in primitive.get("attributes", {}) else {}
+            if "min" not in accessor or "max" not in accessor:
+                continue
+            low, high = accessor["min"], accessor["max"]
+            box = np.array([[x, y, z, 1.0] for x in (low[0], high[0]) for y in (low[1], high[1]) for z in (low[2], high[2])])
+            corners.append((box @ matrix.T)[:, :3])
+    if not corners:
+        return None
+    corners = np.concatenate(corners)
+    return corners.min(axis = 0), corners.max(axis = 0)
+
+
+def chunkLayout(gltfDir, gltfFiles, depth):
+    """Calcula los trozos de la escena con sus tiles, su caja envolvente y su origen.
+
+    El origen es el centro de la caja: las mallas de cada trozo se exportan
+    relativas a él y el model.sdf coloca cada trozo en esa posición.
+
+    Args:
+        gltfDir (str): Directorio de los glTF.
+        gltfFiles (list[str]): Nombres de los archivos glTF.
+        depth (int): Número de dígitos de la clave que definen cada trozo.
+
+    Returns:
+        dict: Trozo -> {"tiles", "bounds", "origin"}.
+    """
+    layout = {}
+    for chunk, tiles in groupChunks(gltfFiles, depth).items():
+        boxes = [box for box in (gltfBounds(os.path.join(gltfDir, tile)) for tile in tiles) if box is not None]
+        if boxes:
+            low = np.min([box[0] for box in boxes], axis = 0)
+            high = np.max([box[1] for box in boxes], axis = 0)
+        else:
+            low = high = np.zeros(3)
+        layout[chunk] = {
+            "tiles": tiles,
+            "bounds": [low.tolist(), high.tolist()],
+            "origin": ((low + high) / 2).tolist(),
+        }
+    return layout
+
+
+def saveManifest(meshDir, mapName, depth, layout, extension = ".dae"):
+    """Guarda el índice de trozos junto a las mallas para que el simulador pueda cargarlos o descartarlos por separado.
+
+    Args:
+        meshDir (str): Directorio de las mallas.
+        mapName (str): Nombre del mapa.
+        depth (int): Número de dígitos de la clave de cada trozo.
+        layout (dict): Resultado de chunkLayout.
+        extension (str): Extensión de las mallas exportadas.
+    """
+    manifest = {
+        "mapName": mapName,
+        "depth": depth,
+        "chunks": {chunk: dict(entry, file = f"{chunkFileName(mapName, chunk)}{extension}") for chunk, entry in layout.items()},
+    }
+    manifestPath = os.path.join(meshDir, manifestName)
+    tempPath = f"{manifestPath}.tmp"
+    with open(tempPath, "w", encoding = "utf-8") as f:
+        json.dump(manifest, f, indent = 2)
+    os.replace(tempPath, manifestPath)
+
+
+def loadManifest(meshDir):
+    """Carga el índice de trozos guardado con saveManifest."""
+    with open(os.path.join(meshDir, manifestName), "r", encoding = "utf-8") as f:
+        return json.load(f)
@@ -1,72 +1,109 @@
+import json
 import os
-import re
+import xml.sax
+from concurrent.futures import ProcessPoolExecutor
+from xml.sax.saxutils import XMLGenerator
+import telemetry
+from cache import fileDigest
 from settings import getConfig
 
+manifestName = ".cleanup_manifest.json"
+defaultNodeNames = ("Cube", "Camera", "Light")
+defaultLibraries = ("library_cameras", "library_lights")
 
-def cleanDaeFile(filePath):
-    """Limpia un archivo DAE elimando los componentes iniciales de un proyecto BLender.
-    
-    Args:
-        filePath (str): Ruta al archivo DAE.
-        
-    Returns:
-        bool: True si se realizaron los cambios en el archivo, False en caso contrario.
+
+class DaeFilter(XMLGenerator):
+    """Reescribe un documento Collada en streaming omitiendo los elementos iniciales de Blender.
+
+    Se eliminan la geometría del cubo, los nodos Cube/Camera/Light y las
+    librerías de cámaras y luces. Solo se mantiene en memoria la profundidad del
+    elemento que se está omitiendo.
     """
-    if not os.path.exists(filePath):
+
+    def __init__(self, out):
+        super().__init__(out, encoding = "utf-8", short_empty_elements = True)
+        self.skipDepth = 0
+        self.removed = 0
+
+    def isDefaultElement(self, name, attrs):
+        if name in defaultLibraries:
+            return True
+        if name == "geometry":
+            return attrs.get("id") == "Cube-mesh" and attrs.get("name") == "Cube"
+        if name == "node" and attrs.get("type") == "NODE":
+            nodeId = attrs.get("id")
+            return nodeId in defaultNodeNames and attrs.get("name") == nodeId
         return False
 
-    try:
-        with open(filePath, "r", encoding = "utf-8") as f:
-            content = f.read()
+    def startElement(self, name, attrs):
+        if self.skipDepth:
+            self.skipDepth += 1
+            return
+        if self.isDefaultElement(name, attrs):
+            self.skipDepth = 1
+            self.removed += 1
+            return
+        super().startElement(name, attrs)
 
-        cubeGeometryPattern = r"<geometry id=\"Cube-mesh\" name=\"Cube\">.*?</geometry>"
-        cubeNodePattern = r"<node id=\"Cube\" name=\"Cube\" type=\"NODE\">.*?</node>"
+    def endElement(self, name):
+        if self.skipDepth:
+            self.skipDepth -= 1
+            return
+        super().endElement(name)
 
-        cameraLibraryPattern = r"<library_cameras>.*?</library_cameras>"
-        cameraNodePattern = (r"<node id=\"Camera\" name=\"Camera\" type=\"NODE\">.*?</node>")
+    def characters(self, content):
+        if not self.skipDepth:
+            super().characters(content)
 
-        lightLibraryPattern = r"<library_lights>.*?</library_lights>"
-        lightNodePattern = r"<node id=\"Light\" name=\"Light\" type=\"NODE\">.*?</node>"
+    def ignorableWhitespace(self, content):
+        if not self.skipDepth:
+            super().ignorableWhitespace(content)
 
-        geometryMatches = re.findall(cubeGeometryPattern, content, re.DOTALL)
-        if geometryMatches:
-            content = re.sub(cubeGeometryPattern, "", content, flags = re.DOTALL)
 
-        nodeMatches = re.findall(cubeNodePattern, content, re.DOTALL)
-        if nodeMatches:
-            content = re.sub(cubeNodePattern, "", content, flags = re.DOTALL)
+def cleanDaeFile(filePath):
+    """Limpia un archivo DAE elimando los componentes iniciales de un proyecto BLender.
 
-        cameraLibMatches = re.findall(cameraLibraryPattern, content, re.DOTALL)
-        if cameraLibMatches:
-            content = re.sub(cameraLibraryPattern, "", content, flags = re.DOTALL)
+    El archivo se procesa en una sola pasada con un parser incremental, por lo que
+    la memoria no depende del tamaño del mapa. El resultado se escribe en un
+    archivo temporal que sustituye al original solo si hubo cambios.
 
-        cameraNodeMatches = re.findall(cameraNodePattern, content, re.DOTALL)
-        if cameraNodeMatches:
-            content = re.sub(cameraNodePattern, "", content, flags = re.DOTALL)
+    Args:
+        filePath (str): Ruta al archivo DAE.
 
-        lightLibMatches = re.findall(lightLibraryPattern, content, re.DOTALL)
-        if lightLibMatches:
-            content = re.sub(lightLibraryPattern, "", content, flags = re.DOTALL)
+    Returns:
+        bool: True si se realizaron los cambios en el archivo, False en caso contrario.
+    """
+    if not os.path.exists(filePath):
+        return False
 
-        lightNodeMatches = re.findall(lightNodePattern, content, re.DOTALL)
-        if lightNodeMatches:
-            content = re.sub(lightNodePattern, "", content, flags = re.DOTALL)
+    tempPath = f"{filePath}.tmp"
+    try:
+        with open(tempPath, "wb") as out:
+            daeFilter = DaeFilter(out)
+            parser = xml.sax.make_parser()
+            parser.setContentHandler(daeFilter)
+            parser.parse(filePath)
+            out.write(b"\n")
 
-        if (geometryMatches or nodeMatches or cameraLibMatches or cameraNodeMatches or lightLibMatches or lightNodeMatches):
-            with open(filePath, "w", encoding = "utf-8") as f:
-                f.write(content)
+        if daeFilter.removed:
+            os.replace(tempPath, filePath)
             return True
-        else:
-            return False
+        os.remove(tempPath)
+        return False
 
     except Exception:
+        if os.path.exists(tempPath):
+            os.remove(tempPath)
         return False
 
 
-def cleanupOutputDae():
-    """Limpia el archivo DAE en el directorio de salida."""
-    config = getConfig()
-    outputDir = config["paths"]["outputDir"]
+def cleanupOutputDae(outputDir = None):
+    """Limpia todos los archivos DAE del directorio de salida, incluidos los de cada trozo y nivel de detalle.
+
+    Args:
+        outputDir (str, optional): Directorio de salida; por defecto, el configurado.
+    """
+    outputDir = outputDir or getConfig()["paths"]["outputDir"]
     meshesDir = os.path.join(outputDir, "meshes")
 
     if not os.path.exists(meshesDir):
@@ -76,16 +113,102 @@ def cleanupOutputDae():
         if f.endswith(".dae"):
             daePath = os.path.join(meshesDir, f)
             cleanDaeFile(daePath)
-            break
+
+
+def loadManifest(manifestPath):
+    """Carga el manifiesto de archivos DAE ya limpiados.
+
+    Args:
+        manifestPath (str): Ruta al manifiesto.
+
+    Returns:
+        dict: Ruta relativa -> {"size", "mtime", "sha256"} de cada archivo limpio.
+    """
+    if not os.path.exists(manifestPath):
+        return {}
+    try:
+        with open(manifestPath, "r", encoding = "utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def saveManifest(manifestPath, manifest):
+    """Guarda el manifiesto de forma atómica.
+
+    Args:
+        manifestPath (str): Ruta al manifiesto.
+        manifest (dict): Contenido del manifiesto.
+    """
+    tempPath = f"{manifestPath}.tmp"
+    with open(tempPath, "w", encoding = "utf-8") as f:
+        json.dump(manifest, f, indent = 2, sort_keys = True)
+    os.replace(tempPath, manifestPath)
+
+
+def _fingerprint(filePath):
+    stat = os.stat(filePath)
+    return {"size": stat.st_size, "mtime": stat.st_mtime_ns, "sha256": fileDigest(filePath)}
+
+
+def cleanAndFingerprint(filePath):
+    """Limpia un archivo DAE y devuelve su huella tras la limpieza.
+
+    Args:
+        filePath (str): Ruta al archivo DAE.
+
+    Returns:
+        tuple: Ruta del archivo y su huella ({"size", "mtime", "sha256"}).
+    """
+    cleanDaeFile(filePath)
+    return filePath, _fingerprint(filePath)
+
+
+def isClean(filePath, entry):
+    """Comprueba si un archivo coincide con su entrada del manifiesto.
+
+    Si el tamaño y la fecha coinciden no se lee el archivo; si solo cambió la
+    fecha, se compara el hash del contenido y se actualiza la entrada.
+
+    Args:
+        filePath (str): Ruta al archivo DAE.
+        entry (dict): Entrada del manifiesto o None.
+
+    Returns:
+        bool: True si el archivo no ha cambiado desde la última limpieza.
+    """
+    if entry is None:
+        return False
+    stat = os.stat(filePath)
+    if stat.st_size != entry["size"]:
+        return False
+    if stat.st_mtime_ns == entry["mtime"]:
+        return True
+    if fileDigest(filePath) != entry["sha256"]:
+        return False
+    entry["mtime"] = stat.st_mtime_ns
+    return True
 
 
 def cleanupSavesDae():
-    """Limpia todos los archivos DAE en los directorios de almacenamiento permanente."""
+    """Limpia los archivos DAE nuevos o modificados en los directorios de almacenamiento permanente.
+
+    Los archivos ya limpiados se registran en un manifiesto (tamaño, fecha y hash)
+    para no volver a procesarlos; los pendientes se limpian en paralelo.
+
+    Returns:
+        int: Número de archivos procesados.
+    """
     config = getConfig()
     savesDir = config["paths"]["savesDir"]
 
     if not os.path.exists(savesDir):
-        return
+        return 0
+
+    manifestPath = os.path.join(savesDir, manifestName)
+    manifest = loadManifest(manifestPath)
+    updatedManifest = {}
+    pendingFiles = []
 
     for saveFolder in os.listdir(savesDir):
         savePath = os.path.join(savesDir, saveFolder)
@@ -102,13 +225,34 @@ def cleanupSavesDae():
 
                 for daeFile in daeFiles:
                     daePath = os.path.join(meshesPath, daeFile)
-                    cleanDaeFile(daePath)
+                    relativePath = os.path.relpath(daePath, savesDir).replace(os.sep, "/")
+                    entry = manifest.get(relativePath)
+                    if isClean(daePath, entry):
+                        updatedManifest[relativePath] = entry
+                    else:
+                        pendingFiles.append(daePath)
+
+    workers = config["cleanup"]["workers"] or os.cpu_count() or 1
+    if len(pendingFiles) > 1 and workers > 1:
+        with ProcessPoolExecutor(max_workers = min(workers, len(pendingFiles))) as pool:
+            results = list(pool.map(cleanAndFingerprint, pendingFiles))
+    else:
+        results = [cleanAndFingerprint(daePath) for daePath in pendingFiles]
+
+    for daePath, fingerprint in results:
+        updatedManifest[os.path.relpath(daePath, savesDir).replace(os.sep, "/")] = fingerprint
+
+    if pendingFiles or updatedManifest != manifest:
+        saveManifest(manifestPath, updatedManifest)
+    return len(pendingFiles)
 
 
 def main():
     """Función principal que ejecuta la limpieza de archivos DAE."""
-    cleanupOutputDae()
-    cleanupSavesDae()
+    with telemetry.stage("cleanup.output"):
+        cleanupOutputDae()
+    with telemetry.stage("cleanup.saves") as record:
+        record["items"] = cleanupSavesDae()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,112 @@
+import os
+import xml.etree.ElementTree as ET
+
+colladaNamespace = "http://www.collada.org/2005/11/COLLADASchema"
+libraryOrder = [
+    "asset",
+    "library_animations",
+    "library_cameras",
+    "library_lights",
+    "library_effects",
+    "library_images",
+    "library_materials",
+    "library_geometries",
+    "library_controllers",
+    "library_visual_scenes",
+    "scene",
+]
+
+
+def _tag(name):
+    return f"{{{colladaNamespace}}}{name}"
+
+
+def _localName(tag):
+    return tag.rsplit("}", 1)[-1]
+
+
+def _renameIds(root, takenIds, suffix):
+    """Renombra los ids de un documento que ya existen en el documento base y actualiza sus referencias."""
+    renamed = {}
+    for element in root.iter():
+        elementId = element.get("id")
+        if elementId is None:
+            continue
+        if elementId in takenIds:
+            newId = f"{elementId}-{suffix}"
+            counter = 1
+            while newId in takenIds:
+                newId = f"{elementId}-{suffix}-{counter}"
+                counter += 1
+            renamed[elementId] = newId
+            element.set("id", newId)
+        takenIds.add(element.get("id"))
+
+    if not renamed:
+        return
+
+    for element in root.iter():
+        for attribute, value in element.attrib.items():
+            if value.startswith("#") and value[1:] in renamed:
+                element.set(attribute, f"#{renamed[value[1:]]}")
+        # COLLADA 1.4 referencia las imágenes de <surface> por id sin '#'
+        if _localName(element.tag) == "init_from" and element.text in renamed:
+            element.text = renamed[element.text]
+
+
+def _insertLibrary(root, library):
+    """Inserta una librería en el documento respetando el orden del esquema COLLADA."""
+    position = libraryOrder.index(_localName(library.tag))
+    for index, child in enumerate(list(root)):
+        name = _localName(child.tag)
+        if name in libraryOrder and libraryOrder.index(name) > position:
+            root.insert(index, library)
+            return
+    root.append(library)
+
+
+def mergeColladaFiles(partPaths, outputPath):
+    """Combina varios archivos Collada en uno solo resolviendo los ids duplicados.
+
+    El primer archivo se usa como base: conserva su <asset> y su <scene>, y los
+    elementos de las librerías y los nodos de la escena visual del resto se
+    añaden a continuación.
+
+    Args:
+        partPaths (list[str]): Rutas de los archivos parciales.
+        outputPath (str): Ruta del archivo combinado.
+    """
+    ET.register_namespace("", colladaNamespace)
+
+    baseTree = ET.parse(partPaths[0])
+    baseRoot = baseTree.getroot()
+    takenIds = {element.get("id") for element in baseRoot.iter() if element.get("id") is not None}
+    baseScene = baseRoot.find(f"{_tag('library_visual_scenes')}/{_tag('visual_scene')}")
+
+    for index, partPath in enumerate(partPaths[1:], start = 1):
+        partRoot = ET.parse(partPath).getroot()
+        _renameIds(partRoot, takenIds, f"part{index}")
+
+        for library in partRoot:
+            name = _localName(library.tag)
+            if not name.startswith("library_"):
+                continue
+
+            if name == "library_visual_scenes":
+                for scene in library:
+                    if baseScene is None:
+                        _insertLibrary(baseRoot, library)
+                        baseScene = scene
+                        break
+                    baseScene.extend([node for node in scene if _localName(node.tag) == "node"])
+                continue
+
+            baseLibrary = baseRoot.find(library.tag)
+            if baseLibrary is None:
+                _insertLibrary(baseRoot, library)
+            else:
+                baseLibrary.extend(list(library))
+
+    tempPath = f"{outputPath}.tmp"
+    baseTree.write(tempPath, encoding = "utf-8", xml_declaration = True)
+    os.replace(tempPath, outputPath)
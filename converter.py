@@ -1,27 +1,40 @@
+import argparse
+import json
 import os
+import re
 import shutil
 import subprocess
 import sys
-import numpy as np
-import torch
-from basicsr.archs.rrdbnet_arch import RRDBNet
-from PIL import Image
-from realesrgan import RealESRGANer
+import threading
+import time
+from collections import Counter
 from tqdm import tqdm
-from settings import getConfig, setMapName
+import telemetry
+from build import digestOf, directoryFingerprint, fileStamp, gltfFingerprint, isUpToDate, loadState, saveState, shardOf
+from cache import configDigest, evictTextures, fileDigest, isUpscaled, lookupTexture, restoreTexture, storeTexture, textureKey
+from chunks import chunkFileName, chunkLayout, chunkOf, saveManifest
+from collada import mergeColladaFiles
+from geometry import lodFileName
+from glb import mergeGlbFiles, quantizeGlbFile
+from journal import UpscaleJournal, removeTempFiles, settingsFingerprint
+from settings import getConfig, setMapName, setPaths, setRegion, setUpscalingMethod, upscalingOptions
+from tiles import isRegionSet, regionFiles
 
 
-def createFolder():
-    """Crea la estructura de carpetas de salida y prepara los archivos de plantilla."""
+def createFolder(incremental = False):
+    """Crea la estructura de carpetas de salida y prepara los archivos de plantilla.
+
+    Args:
+        incremental (bool): Conservar el contenido anterior del directorio de salida.
+    """
     config = getConfig()
     outputDir = config["paths"]["outputDir"]
     templatesDir = config["paths"]["templatesDir"]
     meshDir = os.path.join(outputDir, "meshes")
 
-    if os.path.isdir(outputDir):
+    if os.path.isdir(outputDir) and not incremental:
         shutil.rmtree(outputDir)
-    os.makedirs(outputDir)
-    os.makedirs(meshDir)
+    os.makedirs(meshDir, exist_ok = True)
 
     with open(os.path.join(templatesDir, "modelConfig.txt"), "r") as f:
         configContent = f.read()
@@ -31,24 +44,346 @@ def createFolder():
 
     with open(os.path.join(templatesDir, "modelSDF.txt"), "r") as f:
         sdfContent = f.read()
-    sdfContent = sdfContent.replace("{{MAP_NAME}}", config["mapName"])
+    chunkOrigins = None
+    if config["chunks"]["enabled"]:
+        layout = chunkLayout(config["paths"]["gltfDir"], selectedGltfFiles(config), config["chunks"]["depth"])
+        chunkOrigins = {chunk: entry["origin"] for chunk, entry in layout.items()}
+    sdfContent = renderModelSdf(sdfContent, config["mapName"], config["lod"], chunkOrigins, meshExtension(config))
     with open(os.path.join(outputDir, "model.sdf"), "w") as f:
         f.write(sdfContent)
 
 
-def enhanceTextures():
-    """Mejora las texturas usando upscaling Real-ESRGAN si está configurado."""
-    config = getConfig()
+def lodLevels(config):
+    """Niveles de detalle adicionales configurados, o ninguno si están desactivados."""
+    return list(config["lod"]["levels"]) if config["lod"]["enabled"] else []
+
+
+def meshExtension(config):
+    """Extensión de las mallas exportadas según el formato configurado (".dae" o ".glb")."""
+    return f".{config['geometry']['format']}"
+
+
+def lodMeshPaths(config, sceneName = None):
+    """Rutas de las mallas de todos los niveles de detalle de una escena, empezando por la completa.
+
+    Args:
+        config (dict): Configuración.
+        sceneName (str, optional): Nombre de la escena o del trozo; por defecto el del mapa.
+    """
+    meshDir = os.path.join(config["paths"]["outputDir"], "meshes")
+    sceneName = sceneName or config["mapName"]
+    return [os.path.join(meshDir, lodFileName(sceneName, level, meshExtension(config))) for level in range(len(lodLevels(config)) + 1)]
+
+
+def sceneNames(config):
+    """Nombres de las escenas exportadas: el mapa completo o un trozo por prefijo de clave."""
+    if not config["chunks"]["enabled"]:
+        return [config["mapName"]]
+    chunks = {chunkOf(f, config["chunks"]["depth"]) for f in selectedGltfFiles(config)}
+    return [chunkFileName(config["mapName"], chunk) for chunk in sorted(chunks)]
+
+
+def outputMeshPaths(config):
+    """Rutas de todas las mallas que genera la etapa de geometría."""
+    return [path for sceneName in sceneNames(config) for path in lodMeshPaths(config, sceneName)]
+
+
+def writeChunkManifest(config):
+    """Calcula los trozos de la escena y guarda su índice junto a las mallas.
+
+    Returns:
+        dict: Trozo -> tiles, caja envolvente y origen (ver chunks.chunkLayout).
+    """
+    gltfDir = config["paths"]["gltfDir"]
+    depth = config["chunks"]["depth"]
+    layout = chunkLayout(gltfDir, selectedGltfFiles(config), depth)
+    saveManifest(os.path.join(config["paths"]["outputDir"], "meshes"), config["mapName"], depth, layout, meshExtension(config))
+    print(f"Escena dividida en {len(layout)} trozos de profundidad {depth}")
+    return layout
+
+
+def _renderLink(link, mapName, sceneName, lodConfig, extension = ".dae"):
+    """Apunta el visual y la colisión de un enlace de la plantilla a las mallas de una escena."""
+    levels = len(lodConfig["levels"]) + 1 if lodConfig["enabled"] else 1
+    fileNames = [lodFileName(sceneName, level, extension) for level in range(levels)]
+    meshUri = f"/meshes/{mapName}.dae<"
+    if levels == 1:
+        return link.replace(meshUri, f"/meshes/{fileNames[0]}<")
+
+    collision = re.search(r"<collision\b.*?</collision>", link, re.S)
+    if collision is not None:
+        block = collision.group(0).replace(meshUri, f"/meshes/{fileNames[lodConfig['collisionLevel']]}<")
+        link = link[: collision.start()] + block + link[collision.end() :]
+
+    visual = re.search(r"([ \t]*)<visual\b[^>]*>\n?(.*?</visual>\n?)", link, re.S)
+    if visual is None:
+        return link
+    indent, body = visual.group(1), visual.group(2)
+    if lodConfig["layers"]:
+        blocks = []
+        for level, fileName in enumerate(fileNames):
+            meta = f"{indent}  <meta>\n{indent}    <layer>{level}</layer>\n{indent}  </meta>\n"
+            blocks.append(f'{indent}<visual name="visual_lod{level}">\n{meta}' + body.replace(meshUri, f"/meshes/{fileName}<"))
+        block = "".join(blocks)
+    else:
+        block = visual.group(0).replace(meshUri, f"/meshes/{fileNames[lodConfig['visualLevel']]}<")
+    return link[: visual.start()] + block + link[visual.end() :]
+
+
+def renderModelSdf(template, mapName, lodConfig, chunkOrigins = None, extension = ".dae"):
+    """Rellena la plantilla del model.sdf con las mallas de los niveles de detalle y de los trozos.
+
+    SDF no tiene un elemento de LOD por distancia, así que el visual y la colisión
+    apuntan a los niveles elegidos en la configuración. Con "layers" se añade un
+    visual por nivel en su propia capa para que el cliente pueda alternarlos. Si la
+    escena está dividida en trozos, el enlace de la plantilla se repite por trozo
+    con la pose de su origen. La plantilla referencia <mapName>.dae, que se
+    sustituye por la extensión del formato exportado.
+
+    Args:
+        template (str): Contenido de templates/modelSDF.txt.
+        mapName (str): Nombre del mapa.
+        lodConfig (dict): Sección "lod" de la configuración.
+        chunkOrigins (dict, optional): Trozo -> origen [x, y, z] de su malla.
+        extension (str): Extensión de las mallas exportadas.
+
+    Returns:
+        str: Contenido del model.sdf.
+    """
+    content = template.replace("{{MAP_NAME}}", mapName)
+    link = re.search(r"([ \t]*)<link\b[^>]*>\n?(.*?</link>\n?)", content, re.S)
+    if link is None:
+        return content
+    if chunkOrigins is None:
+        block = _renderLink(link.group(0), mapName, mapName, lodConfig, extension)
+    else:
+        indent, body = link.group(1), link.group(2)
+        blocks = []
+        for chunk, origin in chunkOrigins.items():
+            pose = f"{indent}  <pose>{' '.join('%.6f' % value for value in origin)} 0 0 0</pose>\n"
+            blocks.append(_renderLink(f'{indent}<link name="chunk_{chunk}">\n{pose}{body}', mapName, chunkFileName(mapName, chunk), lodConfig, extension))
+        block = "".join(blocks)
+    return content[: link.start()] + block + content[link.end() :]
+
+
+def templatesFingerprint(config):
+    """Huella de las entradas de createFolder: nombre del mapa, plantillas, formato de las mallas, niveles de detalle y trozos."""
+    templatesDir = config["paths"]["templatesDir"]
+    gltfDir = config["paths"]["gltfDir"]
+    # Las poses de los trozos dependen de los glTF
+    chunksDigest = gltfFingerprint(gltfDir, selectedGltfFiles(config)) if config["chunks"]["enabled"] else None
+    return digestOf(
+        config["mapName"],
+        fileStamp(os.path.join(templatesDir, "modelConfig.txt")),
+        fileStamp(os.path.join(templatesDir, "modelSDF.txt")),
+        config["geometry"]["format"],
+        config["lod"],
+        config["chunks"],
+        chunksDigest,
+    )
+
+
+def texturesFingerprint(config):
+    """Huella de las texturas y de la configuración de upscaling que les afecta."""
+    textureConfig = config["texture"]
     textureDir = config["paths"]["textureDir"]
+    _, textureFiles = regionFiles(config["paths"]["gltfDir"], textureDir, config["region"], config["paths"]["cacheDir"])
+    if textureFiles is None:
+        texturesDigest = directoryFingerprint(textureDir, (".png",))
+    else:
+        texturesDigest = digestOf([(f, fileStamp(os.path.join(textureDir, f))) for f in textureFiles])
+    return digestOf(
+        texturesDigest,
+        textureConfig["upscaleFactor"],
+        textureConfig["modelFile"],
+        textureConfig["tileSize"],
+        textureConfig["halfPrecision"],
+        textureConfig["quantization"],
+        config["triage"],
+    )
+
+
+def listGltfFiles(gltfDir):
+    """Obtiene los archivos glTF del directorio en orden alfabético."""
+    return [f for f in sorted(os.listdir(gltfDir)) if f.endswith(".gltf")]
 
-    imageFiles = []
-    for f in os.listdir(textureDir):
-        if f.lower().endswith(".png"):
-            imageFiles.append(f)
 
-    device = ("cuda" if torch.cuda.is_available() and config["texture"]["useGpu"] else "cpu")
+def selectedGltfFiles(config):
+    """Obtiene los glTF de la región de interés, o todos si no hay región definida."""
+    gltfFiles, _ = regionFiles(config["paths"]["gltfDir"], config["paths"]["textureDir"], config["region"], config["paths"]["cacheDir"])
+    return listGltfFiles(config["paths"]["gltfDir"]) if gltfFiles is None else gltfFiles
+
+
+def geometryFingerprint(config, gltfFiles, texturesDigest):
+    """Huella de las entradas de la etapa de geometría para un conjunto de glTF."""
+    return digestOf(
+        gltfFingerprint(config["paths"]["gltfDir"], gltfFiles),
+        texturesDigest,
+        config["mapName"],
+        config["geometry"],
+        config["dedupe"],
+        config["blender"]["fusedPasses"],
+        config["atlas"],
+        config["compression"],
+        lodLevels(config),
+        config["chunks"],
+    )
+
+
+def restoreCachedTextures(textureDir, imageFiles, settingsDigest, cacheDir, useLinks):
+    """Recupera de la caché las texturas ya escaladas y devuelve las pendientes.
+
+    Args:
+        textureDir (str): Directorio de las texturas.
+        imageFiles (list[str]): Nombres de archivo a procesar.
+        settingsDigest (str): Hash de la configuración de upscaling.
+        cacheDir (str): Directorio de la caché.
+        useLinks (bool): Enlazar en lugar de copiar las texturas recuperadas.
+
+    Returns:
+        tuple: Lista de texturas pendientes y diccionario nombre -> clave de caché.
+    """
+    pendingFiles = []
+    cacheKeys = {}
+    hits = 0
+    skipped = 0
+
+    for fileName in imageFiles:
+        imagePath = os.path.join(textureDir, fileName)
+        try:
+            inputDigest = fileDigest(imagePath)
+            if isUpscaled(cacheDir, settingsDigest, inputDigest):
+                skipped += 1
+                continue
+
+            key = textureKey(settingsDigest, inputDigest)
+            cachedPath = lookupTexture(cacheDir, key)
+            if cachedPath is not None:
+                restoreTexture(cachedPath, imagePath, useLinks)
+                hits += 1
+                continue
+        except Exception as e:
+            print(f"Error consultando la caché para {fileName}: {str(e)}")
+            key = None
+
+        pendingFiles.append(fileName)
+        if key is not None:
+            cacheKeys[fileName] = key
+
+    print(f"Caché de texturas: {hits} recuperadas, {skipped} ya escaladas, {len(pendingFiles)} pendientes")
+    return pendingFiles, cacheKeys
+
+
+def upscaleLocally(config, modelPath, textureDir, imageFiles, progress, onComplete):
+    """Escala las texturas en este proceso, importando torch y Real-ESRGAN solo ahora.
+
+    Args:
+        config (dict): Configuración completa.
+        modelPath (str): Ruta al archivo .pth del modelo.
+        textureDir (str): Directorio de las texturas.
+        imageFiles (list[str]): Nombres de archivo a procesar.
+        progress (tqdm): Barra de progreso a actualizar.
+        onComplete (callable): Función llamada con el nombre de cada textura guardada.
+    """
+    import torch
+    from upscaler import backendOptionsFrom, loadUpsampler, memoryBudgetFor, upscaleProcessPool, upscaleTextures
+
+    textureConfig = config["texture"]
+    device = ("cuda" if torch.cuda.is_available() and textureConfig["useGpu"] else "cpu")
     print(f"\nDispositivo utilizado: {device}")
 
+    cpuWorkers = textureConfig["cpuWorkers"]
+    useProcessPool = device == "cpu" and cpuWorkers > 1
+    memoryBudget = memoryBudgetFor(device, textureConfig, cpuWorkers if useProcessPool else 1)
+    if memoryBudget is not None:
+        print(f"Tile automático con presupuesto de {memoryBudget / (1024 * 1024):.0f} MB")
+
+    if useProcessPool:
+        print(f"Upscaling en CPU con {cpuWorkers} procesos")
+        upscaleProcessPool(
+            modelPath,
+            textureConfig["upscaleFactor"],
+            textureConfig["tileSize"],
+            textureDir,
+            imageFiles,
+            cpuWorkers,
+            threadsPerWorker = textureConfig["threadsPerWorker"],
+            progress = progress,
+            onComplete = onComplete,
+            memoryBudget = memoryBudget,
+            backendOptions = backendOptionsFrom(textureConfig),
+        )
+        return
+
+    with telemetry.stage("model.load", device = device, modelFile = os.path.basename(modelPath)):
+        upsampler = loadUpsampler(
+            modelPath,
+            textureConfig["upscaleFactor"],
+            device,
+            textureConfig["tileSize"],
+            textureConfig["halfPrecision"],
+            backendOptionsFrom(textureConfig),
+        )
+    upscaleTextures(upsampler, textureDir, imageFiles, textureConfig, memoryBudget, progress, onComplete)
+
+
+def reportTriageSavings(stats, networkFiles, fastFiles, networkSeconds, fastSeconds):
+    """Estima el tiempo de inferencia ahorrado con el redimensionado rápido.
+
+    El ahorro se estima con el tiempo por píxel de las texturas que sí pasaron por
+    la red en esta ejecución, descontando lo que tardó el redimensionado.
+
+    Args:
+        stats (dict): Medidas de cada textura (ver triage.triageTextures).
+        networkFiles (list[str]): Texturas escaladas con la red.
+        fastFiles (list[str]): Texturas redimensionadas.
+        networkSeconds (float): Tiempo total del upscaling con la red.
+        fastSeconds (float): Tiempo total del redimensionado.
+    """
+    def pixels(files):
+        return sum(stats[f]["width"] * stats[f]["height"] for f in files if f in stats)
+
+    networkPixels = pixels(networkFiles)
+    fastPixels = pixels(fastFiles)
+    savedSeconds = None
+    if networkPixels > 0:
+        savedSeconds = networkSeconds / networkPixels * fastPixels - fastSeconds
+        print(f"Redimensionado rápido: {len(fastFiles)} texturas en {fastSeconds:.1f} s, ahorro estimado de inferencia: {savedSeconds:.1f} s")
+    else:
+        print(f"Redimensionado rápido: {len(fastFiles)} texturas en {fastSeconds:.1f} s, sin inferencia ni carga del modelo")
+    telemetry.event(
+        "upscale.triageSavings",
+        items = len(fastFiles),
+        fastPixels = fastPixels,
+        fastSeconds = fastSeconds,
+        networkPixels = networkPixels,
+        networkSeconds = networkSeconds,
+        estimatedSavedSeconds = savedSeconds,
+    )
+
+
+def enhanceTextures(resume = False):
+    """Mejora las texturas usando upscaling Real-ESRGAN si está configurado.
+
+    Args:
+        resume (bool): Continuar un upscaling interrumpido a partir de su diario.
+
+    Raises:
+        RuntimeError: Si hay un upscaling interrumpido y no se pidió reanudarlo.
+    """
+    config = getConfig()
+    textureDir = config["paths"]["textureDir"]
+
+    # Con una región de interés solo se escalan las texturas de sus tiles
+    _, imageFiles = regionFiles(config["paths"]["gltfDir"], textureDir, config["region"], config["paths"]["cacheDir"])
+    if imageFiles is None:
+        imageFiles = []
+        for f in os.listdir(textureDir):
+            if f.lower().endswith(".png"):
+                imageFiles.append(f)
+    else:
+        print(f"Región de interés: {len(imageFiles)} texturas seleccionadas")
+
     upscaleFactor = config["texture"]["upscaleFactor"]
     modelFile = config["texture"]["modelFile"]
 
@@ -70,84 +405,467 @@ def enhanceTextures():
         print("Procesando modelos 3D en Blender")
         return
 
-    stateDict = torch.load(modelPath, map_location = "cpu")["params_ema"]
+    journal = None
+    if config["texture"]["journal"]:
+        journal = UpscaleJournal(textureDir)
+        settings = settingsFingerprint(config["texture"], config["triage"])
+        if journal.exists() and not resume:
+            raise RuntimeError(f"Hay un upscaling interrumpido en {textureDir}; use --resume para continuarlo o elimine {journal.path}")
+        if removeTempFiles(textureDir):
+            print("Eliminadas texturas temporales de una ejecución interrumpida")
+        if journal.exists():
+            imageFiles = journal.resume(imageFiles, settings)
+        else:
+            journal.begin(imageFiles, settings)
 
-    model = RRDBNet(
-        num_in_ch = 3,
-        num_out_ch = 3,
-        num_feat = 64,
-        num_block = 23,
-        num_grow_ch = 32,
-        scale = upscaleFactor,
-    )
+    remaining = set(imageFiles)
+    try:
+        _upscalePending(config, modelPath, textureDir, imageFiles, journal, remaining)
+    finally:
+        if journal is not None:
+            journal.close(not remaining)
+            if remaining:
+                print(f"{len(remaining)} texturas sin escalar; use --resume para reintentarlas")
 
-    model.load_state_dict(stateDict, strict=True)
-    model = model.to(device)
-
-    upsampler = RealESRGANer(
-        scale = upscaleFactor,
-        model_path = modelPath,
-        model = model,
-        tile = config["texture"]["tileSize"],
-        tile_pad = 10,
-        pre_pad = 0,
-        half = config["texture"]["halfPrecision"],
-    )
+    print("Procesando modelos 3D en Blender")
 
-    for fileName in tqdm(imageFiles, desc="Upscaling", unit="texturas"):
-        imagePath = os.path.join(textureDir, fileName)
+
+def _upscalePending(config, modelPath, textureDir, imageFiles, journal, remaining):
+    """Escala las texturas pendientes registrando cada una en el diario al terminarla.
+
+    Args:
+        config (dict): Configuración completa.
+        modelPath (str): Ruta al archivo .pth del modelo.
+        textureDir (str): Directorio de las texturas.
+        imageFiles (list[str]): Texturas pendientes.
+        journal (UpscaleJournal): Diario de upscaling o None si está desactivado.
+        remaining (set[str]): Texturas sin terminar; se vacía a medida que se completan.
+    """
+    def markComplete(fileName):
+        if journal is not None:
+            journal.complete(fileName)
+        remaining.discard(fileName)
+
+    upscaleFactor = config["texture"]["upscaleFactor"]
+    cacheDir = config["paths"]["cacheDir"]
+    useCache = config["texture"]["cache"]
+    cacheKeys = {}
+    if useCache:
+        settingsDigest = configDigest(
+            modelPath,
+            upscaleFactor,
+            config["texture"]["tileSize"],
+            config["texture"]["halfPrecision"],
+            config["texture"]["quantization"],
+            config["triage"] if config["triage"]["enabled"] else None,
+        )
+        imageFiles, cacheKeys = restoreCachedTextures(
+            textureDir,
+            imageFiles,
+            settingsDigest,
+            cacheDir,
+            config["texture"]["cacheLinks"],
+        )
+        for fileName in remaining - set(imageFiles):
+            markComplete(fileName)
+        if not imageFiles:
+            return
+
+    def onComplete(fileName):
+        markComplete(fileName)
+        if fileName not in cacheKeys:
+            return
         try:
-            img = Image.open(imagePath).convert("RGB")
-            imgArray = np.array(img)
-            output, _ = upsampler.enhance(imgArray, outscale = upscaleFactor)
-            outputImg = Image.fromarray(output)
-            outputImg.save(imagePath)
+            storeTexture(cacheDir, settingsDigest, cacheKeys[fileName], os.path.join(textureDir, fileName))
         except Exception as e:
-            print(f"Error procesando {fileName}: {str(e)}")
+            print(f"Error guardando {fileName} en la caché: {str(e)}")
 
-    print("Procesando modelos 3D en Blender")
+    fastFiles = []
+    if config["triage"]["enabled"]:
+        from triage import resizeTextures, triageTextures
+
+        with telemetry.stage("upscale.triage", items = len(imageFiles)):
+            imageFiles, fastFiles, stats = triageTextures(textureDir, imageFiles, config["triage"])
+        classes = Counter(fileStats["class"] for fileStats in stats.values())
+        print(
+            f"Clasificación de texturas: {len(imageFiles)} con detalle, {classes['uniform']} uniformes, "
+            f"{classes['lowDetail']} de poco detalle, {classes['empty']} vacías"
+        )
+
+    networkFiles = list(imageFiles)
+    fastSeconds = 0.0
+    networkSeconds = 0.0
+    progress = tqdm(total = len(imageFiles) + len(fastFiles), desc="Upscaling", unit="texturas")
+    try:
+        if fastFiles:
+            start = time.perf_counter()
+            with telemetry.stage("upscale.fastPath", items = len(fastFiles)):
+                resizeTextures(textureDir, fastFiles, upscaleFactor, config["texture"]["encodeWorkers"], progress, onComplete)
+            fastSeconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        if imageFiles and config["server"]["enabled"]:
+            from server import requestUpscale
+
+            imageFiles = requestUpscale(config, modelPath, textureDir, imageFiles, progress = progress, onComplete = onComplete)
+
+        if imageFiles:
+            upscaleLocally(config, modelPath, textureDir, imageFiles, progress, onComplete)
+        networkSeconds = time.perf_counter() - start
+    finally:
+        progress.close()
+
+    if fastFiles:
+        reportTriageSavings(stats, networkFiles, fastFiles, networkSeconds, fastSeconds)
+
+    if useCache:
+        removed = evictTextures(cacheDir, config["texture"]["cacheMaxSizeMb"] * 1024 * 1024)
+        if removed:
+            print(f"Caché de texturas: {removed} entradas antiguas eliminadas")
+
+
+def _printBlenderEvent(event):
+    """Muestra los tiempos de cada paso de Blender, cuya salida estándar no se imprime."""
+    stageName = event.get("stage", "")
+    if not stageName.startswith("blender."):
+        return
+    print(f"[{event.get('source', 'blender')}] {stageName}: {event.get('wall', 0.0):.2f} s")
+    if stageName == "blender.verifyPasses":
+        print(
+            f"  Pasada bmesh {event['fusedSeconds']:.2f} s, operadores {event['legacySeconds']:.2f} s; "
+            f"vértices {event['fusedVertices']} / {event['legacyVertices']}"
+        )
+        if event["matches"]:
+            print(f"  Resultados equivalentes en {event['meshes']} mallas")
+        else:
+            print(
+                f"  ADVERTENCIA: la pasada bmesh no coincide con --legacy-passes: {event['weldMismatches']} mallas con distinto soldado, "
+                f"{event['smoothMismatches']} con distinto sombreado y {event['normalMismatches']} caras con distinta normal"
+            )
+
+
+def _startBlender(command):
+    """Lanza un proceso de Blender y reenvía sus eventos de telemetría desde un hilo.
+
+    Returns:
+        tuple: Proceso y hilo que lee su salida.
+    """
+    process = subprocess.Popen(
+        command,
+        stdout = subprocess.PIPE,
+        stderr = subprocess.DEVNULL,
+        text = True,
+        encoding = "utf-8",
+        errors = "replace",
+    )
+    relay = threading.Thread(target = telemetry.relayOutput, args = (process.stdout, _printBlenderEvent), daemon = True)
+    relay.start()
+    return process, relay
+
+
+def runBlender(state = None):
+    """Ejecuta el procesamiento de Blender, repartiendo los glTF entre varios procesos si está configurado.
+
+    Con varias particiones, cada proceso exporta una malla parcial y al final se
+    combinan en <mapName>.dae (o .glb). En modo incremental los parciales se conservan en
+    <outputDir>/.parts y solo se vuelven a generar las particiones cuyos glTF o
+    texturas han cambiado. Con la escena dividida en trozos, los glTF se reparten
+    por trozo y cada proceso exporta directamente las mallas de sus trozos.
+
+    Args:
+        state (dict, optional): Estado de la compilación incremental; se actualiza con la huella de cada partición.
+
+    Returns:
+        int: Código de salida (0 si todos los procesos terminaron correctamente).
+    """
+    config = getConfig()
+    blenderDir = config["paths"]["blenderExe"]
+    blenderFileDir = os.path.abspath("blender.py")
+    gltfDir = config["paths"]["gltfDir"]
+    textureDir = config["paths"]["textureDir"]
+    outputDir = config["paths"]["outputDir"]
+    meshDir = os.path.join(outputDir, "meshes")
+    mapName = config["mapName"]
+    shards = max(1, config["blender"]["shards"])
+
+    command = [
+        blenderDir,
+        "--background",
+        "--python",
+        blenderFileDir,
+        "--",
+        gltfDir,
+        textureDir,
+        meshDir,
+    ]
+
+    if not config["blender"]["fusedPasses"]:
+        command.append("--legacy-passes")
+    elif config["blender"]["verifyPasses"]:
+        command.append("--verify-passes")
+    if not config["dedupe"]["enabled"]:
+        command.append("--no-dedupe")
+    extension = meshExtension(config)
+    command.extend(["--format", config["geometry"]["format"]])
+    if config["atlas"]["enabled"]:
+        command.extend(["--atlas-size", str(config["atlas"]["size"]), "--atlas-padding", str(config["atlas"]["padding"])])
+    levels = lodLevels(config)
+    if levels:
+        command.extend(["--lod-levels", json.dumps(levels)])
+    if isRegionSet(config["region"]):
+        command.extend(["--region", json.dumps(config["region"]), "--cache-dir", config["paths"]["cacheDir"]])
+    chunkDepth = 0
+    if config["chunks"]["enabled"]:
+        chunkDepth = config["chunks"]["depth"]
+        layout = writeChunkManifest(config)
+        command.append("--chunks")
+
+    if shards == 1:
+        process, relay = _startBlender(command + [mapName])
+        returnCode = process.wait()
+        relay.join()
+        return returnCode
+
+    if chunkDepth:
+        # Cada trozo lo exporta un único proceso, así que sus mallas no se combinan
+        partNames = [mapName] * shards
+        shardOutputs = [[] for _ in range(shards)]
+        for chunk in layout:
+            shardOutputs[shardOf(chunk, shards)].extend(lodMeshPaths(config, chunkFileName(mapName, chunk)))
+    else:
+        partNames = [f"{mapName}.part{shard}" for shard in range(shards)]
+        partsDir = meshDir if state is None else os.path.join(outputDir, ".parts")
+        # Cada partición exporta un parcial por nivel de detalle, que se combinan por separado
+        levelPartPaths = [[os.path.join(partsDir, lodFileName(partName, level, extension)) for partName in partNames] for level in range(len(levels) + 1)]
+        shardOutputs = [[partPaths[shard] for partPaths in levelPartPaths] for shard in range(shards)]
+    pendingShards = list(range(shards))
+    fingerprints = {}
+    if state is not None:
+        if not chunkDepth:
+            os.makedirs(partsDir, exist_ok = True)
+        gltfFiles = selectedGltfFiles(config)
+        texturesDigest = texturesFingerprint(config)
+        shardStates = state.setdefault("shards", {})
+        pendingShards = []
+        for shard in range(shards):
+            shardFiles = [f for f in gltfFiles if shardOf(chunkOf(f, chunkDepth) if chunkDepth else f, shards) == shard]
+            fingerprints[shard] = geometryFingerprint(config, shardFiles, texturesDigest)
+            if not isUpToDate(shardStates, f"{shards}:{shard}", fingerprints[shard], shardOutputs[shard]):
+                pendingShards.append(shard)
+
+    print(f"Procesando modelos 3D en {len(pendingShards)} de {shards} procesos de Blender")
+    processes = []
+    for shard in pendingShards:
+        shardCommand = command + ["--shard", str(shard), "--shards", str(shards), partNames[shard]]
+        processes.append((shard, _startBlender(shardCommand)))
+    returnCodes = []
+    for shard, (process, relay) in processes:
+        returnCode = process.wait()
+        relay.join()
+        returnCodes.append(returnCode)
+        if state is not None and returnCode == 0:
+            if not chunkDepth:
+                for level, partPaths in enumerate(levelPartPaths):
+                    os.replace(os.path.join(meshDir, lodFileName(partNames[shard], level, extension)), partPaths[shard])
+            state["shards"][f"{shards}:{shard}"] = fingerprints[shard]
+
+    for returnCode in returnCodes:
+        if returnCode != 0:
+            return returnCode
+    if chunkDepth:
+        return 0
+
+    mergeFiles = mergeGlbFiles if extension == ".glb" else mergeColladaFiles
+    for level, partPaths in enumerate(levelPartPaths):
+        mergeFiles([path for path in partPaths if os.path.exists(path)], os.path.join(meshDir, lodFileName(mapName, level, extension)))
+        if state is None:
+            for partPath in partPaths:
+                if os.path.exists(partPath):
+                    os.remove(partPath)
+    return 0
+
+
+def runGeometryEngine():
+    """Procesa los modelos 3D con el motor NumPy de geometry.py, sin necesidad de Blender.
+
+    Returns:
+        int: Código de salida (0 si la exportación terminó correctamente).
+    """
+    from geometry import exportScene
+
+    config = getConfig()
+    meshDir = os.path.join(config["paths"]["outputDir"], "meshes")
+    scenes = {config["mapName"]: (selectedGltfFiles(config), None)}
+    if config["chunks"]["enabled"]:
+        layout = writeChunkManifest(config)
+        scenes = {chunkFileName(config["mapName"], chunk): (entry["tiles"], entry["origin"]) for chunk, entry in layout.items()}
+
+    for sceneName, (gltfFiles, origin) in scenes.items():
+        stats = exportScene(
+            config["paths"]["gltfDir"],
+            config["paths"]["textureDir"],
+            meshDir,
+            sceneName,
+            config["geometry"]["weldThreshold"],
+            lodLevels(config),
+            gltfFiles,
+            origin,
+            config["geometry"]["format"],
+            config["geometry"]["quantize"],
+            config["dedupe"]["enabled"],
+        )
+        for passName, seconds in stats["timings"].items():
+            telemetry.event(f"geometry.{passName}", wall = seconds, items = stats["meshes"])
+        if len(stats["levels"]) > 1:
+            reportLevels(stats["levels"])
+
+        if config["atlas"]["enabled"] and config["geometry"]["format"] != "dae":
+            print("Los atlas del motor NumPy solo se generan para Collada; el glb conserva las texturas originales")
+        elif config["atlas"]["enabled"]:
+            from atlas import atlasDaeFiles
+
+            # Los niveles de detalle comparten las mismas texturas y por tanto los mismos atlas;
+            # cada trozo tiene los suyos para poder cargarse por separado
+            with telemetry.stage("geometry.atlas") as record:
+                atlasStats = atlasDaeFiles(lodMeshPaths(config, sceneName), config["atlas"]["size"], config["atlas"]["padding"])
+                record["items"] = atlasStats["textures"]
+            print(f"Texturas agrupadas: {atlasStats['textures']} en {atlasStats['atlases']} atlas, materiales: {atlasStats['materials']} -> {atlasStats['atlasMaterials']}")
+    return 0
+
+
+def reportLevels(levels):
+    """Muestra y registra los triángulos y el tiempo de exportación de cada nivel de detalle.
+
+    Args:
+        levels (list[dict]): Nivel, archivo, triángulos y segundos de cada nivel.
+    """
+    baseTriangles = max(1, levels[0]["triangles"])
+    print("Nivel  Triángulos  % del LOD0  Tiempo (s)  Archivo")
+    for level in levels:
+        print(f"{level['level']:>5}  {level['triangles']:>10}  {100 * level['triangles'] / baseTriangles:>9.1f}%  {level['seconds']:>10.2f}  {level['file']}")
+        telemetry.event(f"geometry.lod{level['level']}", wall = level["seconds"], items = level["triangles"])
+
+
+def quantizeOutputMeshes():
+    """Cuantiza los .glb exportados por Blender con KHR_mesh_quantization."""
+    config = getConfig()
+    with telemetry.stage("geometry.quantize") as record:
+        glbPaths = [path for path in outputMeshPaths(config) if os.path.exists(path)]
+        stats = {"floatBytes": 0, "quantizedBytes": 0}
+        for glbPath in glbPaths:
+            floatBytes, quantizedBytes = quantizeGlbFile(glbPath)
+            stats["floatBytes"] += floatBytes
+            stats["quantizedBytes"] += quantizedBytes
+        record.update(items = len(glbPaths), **stats)
+    print(f"Mallas cuantizadas: {len(glbPaths)}, {stats['floatBytes'] / (1024 * 1024):.1f} MB -> {stats['quantizedBytes'] / (1024 * 1024):.1f} MB")
+
+
+def compressOutputTextures():
+    """Comprime en DDS con mipmaps las texturas de los .dae exportados y actualiza sus referencias."""
+    from dds import compressDaeTextures
+
+    config = getConfig()
+    compressionConfig = config["compression"]
+    with telemetry.stage("geometry.compress") as record:
+        stats = {"textures": 0, "pngBytes": 0, "ddsBytes": 0}
+        # Los niveles de detalle reutilizan los .dds ya generados para el primero
+        for daePath in outputMeshPaths(config):
+            daeStats = compressDaeTextures(daePath, compressionConfig["workers"], compressionConfig["mipmaps"], compressionConfig["keepPng"])
+            for key in stats:
+                stats[key] += daeStats[key]
+        record.update(items = stats["textures"], pngBytes = stats["pngBytes"], ddsBytes = stats["ddsBytes"])
+    print(
+        f"Texturas comprimidas: {stats['textures']}, "
+        f"{stats['pngBytes'] / (1024 * 1024):.1f} MB PNG -> {stats['ddsBytes'] / (1024 * 1024):.1f} MB DDS"
+    )
 
 
 if __name__ == "__main__":
     """Bloque de ejecución principal para el procesamiento de texturas y modelos de mapas."""
-    if len(sys.argv) > 1:
-        mapName = sys.argv[1]
-        setMapName(mapName)
+    parser = argparse.ArgumentParser()
+    parser.add_argument("mapName", nargs = "?")
+    parser.add_argument("--stage", choices = ("all", "textures", "geometry"), default = "all")
+    parser.add_argument("--upscaling", choices = list(upscalingOptions))
+    parser.add_argument("--output-dir")
+    parser.add_argument("--gltf-dir")
+    parser.add_argument("--texture-dir")
+    parser.add_argument("--full", action = "store_true", help = "Reconstruir todas las etapas aunque sus entradas no hayan cambiado")
+    parser.add_argument("--resume", action = "store_true", help = "Continuar un upscaling interrumpido desde la última textura completada")
+    parser.add_argument("--bbox", type = float, nargs = 4, metavar = ("SUR", "OESTE", "NORTE", "ESTE"), help = "Procesar solo los tiles dentro de esta caja (grados)")
+    parser.add_argument("--prefix", help = "Procesar solo los tiles cuya clave empieza por este prefijo")
+    args = parser.parse_args()
+
+    if args.mapName:
+        setMapName(args.mapName)
+    if args.upscaling is not None:
+        setUpscalingMethod(args.upscaling)
+    overrides = {"outputDir": args.output_dir, "gltfDir": args.gltf_dir, "textureDir": args.texture_dir}
+    setPaths(**{key: value for key, value in overrides.items() if value is not None})
+    setRegion(args.bbox, args.prefix)
+
+    config = getConfig()
+    if telemetry.configureFromEnvironment("converter") is None and config["telemetry"]["enabled"]:
+        telemetry.startReport(config["paths"]["reportsDir"], source = "converter")
 
+    outputDir = config["paths"]["outputDir"]
+    meshDir = os.path.join(outputDir, "meshes")
+    incremental = config["build"]["incremental"] and not args.full
+    state = loadState(outputDir) if incremental else {}
+
+    returnCode = 0
     try:
-        createFolder()
-        enhanceTextures()
-
-        config = getConfig()
-        blenderDir = config["paths"]["blenderExe"]
-        blenderFileDir = os.path.abspath("blender.py")
-        gltfDir = config["paths"]["gltfDir"]
-        textureDir = config["paths"]["textureDir"]
-        outputDir = config["paths"]["outputDir"]
-        meshDir = os.path.join(outputDir, "meshes")
-
-        with open(os.devnull, "w") as devnull:
-            result = subprocess.run(
-                [
-                    blenderDir,
-                    "--background",
-                    "--python",
-                    blenderFileDir,
-                    "--",
-                    gltfDir,
-                    textureDir,
-                    meshDir,
-                    config["mapName"],
-                ],
-                stdout = devnull,
-                stderr = devnull,
-            )
+        if args.stage in ("all", "textures"):
+            fingerprint = templatesFingerprint(config)
+            templateOutputs = [os.path.join(outputDir, "model.config"), os.path.join(outputDir, "model.sdf")]
+            if incremental and isUpToDate(state, "templates", fingerprint, templateOutputs):
+                print("Plantillas sin cambios")
+            else:
+                with telemetry.stage("createFolder"):
+                    createFolder(incremental)
+                if not incremental:
+                    state = {}
+                state["templates"] = fingerprint
+                saveState(outputDir, state)
 
-        if result.returncode == 0:
-            print("Procesamiento de Blender completado")
-        else:
-            print(f"Error en Blender: código de salida {result.returncode}")
+            if incremental and isUpToDate(state, "textures", texturesFingerprint(config)):
+                print("Texturas sin cambios desde la última ejecución")
+            else:
+                with telemetry.stage("textures"):
+                    enhanceTextures(args.resume)
+                # Se guarda la huella posterior al upscaling, que sobrescribe las texturas
+                state["textures"] = texturesFingerprint(config)
+                saveState(outputDir, state)
+
+        if args.stage in ("all", "geometry"):
+            os.makedirs(meshDir, exist_ok = True)
+            fingerprint = geometryFingerprint(config, selectedGltfFiles(config), texturesFingerprint(config))
+            if incremental and isUpToDate(state, "geometry", fingerprint, outputMeshPaths(config)):
+                print("Geometría sin cambios desde la última ejecución")
+            elif config["geometry"]["engine"] == "numpy":
+                with telemetry.stage("geometry"):
+                    returnCode = runGeometryEngine()
+                print("Procesamiento de geometría completado")
+            else:
+                with telemetry.stage("blender", shards = config["blender"]["shards"]) as record:
+                    returnCode = runBlender(state if incremental else None)
+                    record["returnCode"] = returnCode
+
+                if returnCode == 0 and config["geometry"]["format"] == "glb" and config["geometry"]["quantize"]:
+                    quantizeOutputMeshes()
+                if returnCode == 0:
+                    print("Procesamiento de Blender completado")
+                else:
+                    print(f"Error en Blender: código de salida {returnCode}")
+
+            if returnCode == 0 and config["compression"]["enabled"] and config["geometry"]["format"] != "dae":
+                print("La compresión DDS solo se aplica a los Collada; el glb conserva las texturas PNG")
+            elif returnCode == 0 and config["compression"]["enabled"]:
+                compressOutputTextures()
+            if returnCode == 0:
+                state["geometry"] = fingerprint
+            saveState(outputDir, state)
 
     except Exception as e:
         print(f"Error en el pipeline: {str(e)}")
         sys.exit(1)
+    sys.exit(returnCode)
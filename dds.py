@@ -0,0 +1,321 @@
+import argparse
+import os
+import struct
+import time
+import xml.etree.ElementTree as ET
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from build import fileStamp
+
+colladaNamespace = "http://www.collada.org/2005/11/COLLADASchema"
+# Bloques codificados a la vez, para limitar la memoria de los arrays intermedios
+chunkBlocks = 1 << 16
+
+colorBlock = np.dtype([("color0", "<u2"), ("color1", "<u2"), ("indices", "<u4")])
+alphaBlock = np.dtype([("alpha0", "u1"), ("alpha1", "u1"), ("indices", "u1", (6,))])
+
+headerFlags = 0x1 | 0x2 | 0x4 | 0x1000 | 0x20000 | 0x80000
+pixelFormatFourCC = 0x4
+capsTexture = 0x1000
+capsMipmap = 0x400000
+capsComplex = 0x8
+
+_srgbToLinear = np.where(
+    np.arange(256) / 255.0 <= 0.04045,
+    np.arange(256) / 255.0 / 12.92,
+    ((np.arange(256) / 255.0 + 0.055) / 1.055) ** 2.4,
+).astype(np.float32)
+
+
+def _linearToSrgb(values):
+    values = np.clip(values, 0.0, 1.0)
+    srgb = np.where(values <= 0.0031308, values * 12.92, 1.055 * np.power(values, 1 / 2.4) - 0.055)
+    return np.rint(srgb * 255.0).astype(np.uint8)
+
+
+def buildMipChain(image):
+    """Genera la cadena de mipmaps de una imagen con un filtro de caja 2x2.
+
+    El color se promedia en espacio lineal para que los niveles reducidos no se
+    oscurezcan; el alfa se promedia directamente. En dimensiones impares se
+    descarta la última fila o columna, como en el tamaño estándar max(1, n // 2).
+
+    Args:
+        image (np.ndarray): Imagen (alto, ancho, canales) uint8 con 3 o 4 canales.
+
+    Returns:
+        list[np.ndarray]: Niveles desde la imagen original hasta 1x1.
+    """
+    levels = [image]
+    linear = _srgbToLinear[image[..., :3]]
+    alpha = image[..., 3:].astype(np.float32)
+    while linear.shape[0] > 1 or linear.shape[1] > 1:
+        height, width = linear.shape[:2]
+        newHeight, newWidth = max(1, height // 2), max(1, width // 2)
+        rowStep = 2 if height > 1 else 1
+        colStep = 2 if width > 1 else 1
+        linear = linear[: newHeight * rowStep, : newWidth * colStep]
+        linear = linear.reshape(newHeight, rowStep, newWidth, colStep, 3).mean(axis = (1, 3))
+        alpha = alpha[: newHeight * rowStep, : newWidth * colStep]
+        alpha = alpha.reshape(newHeight, rowStep, newWidth, colStep, alpha.shape[2]).mean(axis = (1, 3))
+        level = _linearToSrgb(linear)
+        if alpha.shape[2]:
+            level = np.concatenate([level, np.rint(alpha).astype(np.uint8)], axis = 2)
+        levels.append(level)
+    return levels
+
+
+def toBlocks(image):
+    """Divide una imagen en bloques de 4x4 píxeles, repitiendo los bordes si no es múltiplo de 4.
+
+    Returns:
+        np.ndarray: Bloques (N, 16, canales) en orden de filas.
+    """
+    height, width, channels = image.shape
+    padHeight = -height % 4
+    padWidth = -width % 4
+    if padHeight or padWidth:
+        image = np.pad(image, ((0, padHeight), (0, padWidth), (0, 0)), mode = "edge")
+    height, width = image.shape[:2]
+    return image.reshape(height // 4, 4, width // 4, 4, channels).transpose(0, 2, 1, 3, 4).reshape(-1, 16, channels)
+
+
+def _pack565(colors):
+    colors = np.clip(np.rint(colors * np.array([31.0, 63.0, 31.0]) / 255.0), 0, (31, 63, 31)).astype(np.uint16)
+    return (colors[:, 0] << 11) | (colors[:, 1] << 5) | colors[:, 2]
+
+
+def _unpack565(values):
+    red = (values >> 11) & 31
+    green = (values >> 5) & 63
+    blue = values & 31
+    return np.stack([(red << 3) | (red >> 2), (green << 2) | (green >> 4), (blue << 3) | (blue >> 2)], axis = 1).astype(np.float32)
+
+
+def encodeColorBlocks(blocks):
+    """Codifica bloques de color en BC1 con extremos sobre el eje principal de cada bloque.
+
+    El eje se obtiene por iteración de potencia sobre la covarianza del bloque y
+    los extremos son las proyecciones mínima y máxima. Siempre se usa el modo de
+    cuatro colores (color0 > color1), válido también para el color de BC3.
+
+    Args:
+        blocks (np.ndarray): Bloques (N, 16, 3) uint8.
+
+    Returns:
+        np.ndarray: Bloques codificados con el dtype colorBlock.
+    """
+    pixels = blocks.astype(np.float32)
+    mean = pixels.mean(axis = 1)
+    centered = pixels - mean[:, None, :]
+    covariance = np.einsum("nki,nkj->nij", centered, centered)
+    axis = pixels.max(axis = 1) - pixels.min(axis = 1) + 1e-3
+    for _ in range(6):
+        axis = np.einsum("nij,nj->ni", covariance, axis)
+        axis /= np.maximum(np.linalg.norm(axis, axis = 1, keepdims = True), 1e-12)
+    projection = np.einsum("nki,ni->nk", centered, axis)
+    end0 = mean + axis * projection.max(axis = 1)[:, None]
+    end1 = mean + axis * projection.min(axis = 1)[:, None]
+
+    color0 = _pack565(end0)
+    color1 = _pack565(end1)
+    swap = color0 < color1
+    color0, color1 = np.where(swap, color1, color0), np.where(swap, color0, color1)
+
+    palette0 = _unpack565(color0)
+    palette1 = _unpack565(color1)
+    palette = np.stack([palette0, palette1, (2 * palette0 + palette1) / 3, (palette0 + 2 * palette1) / 3], axis = 1)
+    distances = ((pixels[:, :, None, :] - palette[:, None, :, :]) ** 2).sum(axis = 3)
+    indices = distances.argmin(axis = 2).astype(np.uint32)
+    indices[color0 == color1] = 0
+
+    encoded = np.empty(len(blocks), dtype = colorBlock)
+    encoded["color0"] = color0
+    encoded["color1"] = color1
+    encoded["indices"] = (indices << (2 * np.arange(16, dtype = np.uint32))).sum(axis = 1, dtype = np.uint32)
+    return encoded
+
+
+def encodeAlphaBlocks(alpha):
+    """Codifica el alfa de bloques de 4x4 en el formato de BC3 con ocho niveles interpolados.
+
+    Args:
+        alpha (np.ndarray): Alfa (N, 16) uint8.
+
+    Returns:
+        np.ndarray: Bloques codificados con el dtype alphaBlock.
+    """
+    alpha0 = alpha.max(axis = 1).astype(np.float32)
+    alpha1 = alpha.min(axis = 1).astype(np.float32)
+    weights = np.array([0, 7, 1, 2, 3, 4, 5, 6], dtype = np.float32)
+    palette = np.rint(((7 - weights) * alpha0[:, None] + weights * alpha1[:, None]) / 7)
+    palette[:, 1] = alpha1
+    indices = np.abs(alpha[:, :, None].astype(np.float32) - palette[:, None, :]).argmin(axis = 2).astype(np.uint64)
+    indices[alpha0 == alpha1] = 0
+
+    bits = (indices << (3 * np.arange(16, dtype = np.uint64))).sum(axis = 1, dtype = np.uint64)
+    encoded = np.empty(len(alpha), dtype = alphaBlock)
+    encoded["alpha0"] = alpha0
+    encoded["alpha1"] = alpha1
+    encoded["indices"] = bits.astype("<u8").view(np.uint8).reshape(-1, 8)[:, :6]
+    return encoded
+
+
+def encodeLevel(image, format):
+    """Codifica un nivel de mipmap en BC1 ("DXT1") o BC3 ("DXT5").
+
+    Returns:
+        bytes: Bloques codificados del nivel.
+    """
+    blocks = toBlocks(image)
+    parts = []
+    for start in range(0, len(blocks), chunkBlocks):
+        chunk = blocks[start : start + chunkBlocks]
+        color = encodeColorBlocks(chunk[:, :, :3])
+        if format == "DXT5":
+            combined = np.empty(len(chunk), dtype = [("alpha", alphaBlock), ("color", colorBlock)])
+            combined["alpha"] = encodeAlphaBlocks(chunk[:, :, 3])
+            combined["color"] = color
+            parts.append(combined.tobytes())
+        else:
+            parts.append(color.tobytes())
+    return b"".join(parts)
+
+
+def ddsHeader(width, height, mipLevels, format):
+    """Construye la cabecera DDS de una textura comprimida con mipmaps."""
+    blockBytes = 8 if format == "DXT1" else 16
+    linearSize = max(1, -(-width // 4)) * max(1, -(-height // 4)) * blockBytes
+    caps = capsTexture | (capsMipmap | capsComplex if mipLevels > 1 else 0)
+    pixelFormat = struct.pack("<II4sIIIII", 32, pixelFormatFourCC, format.encode("ascii"), 0, 0, 0, 0, 0)
+    return b"DDS " + struct.pack("<7I", 124, headerFlags, height, width, linearSize, 0, mipLevels) + b"\0" * 44 + pixelFormat + struct.pack("<5I", caps, 0, 0, 0, 0)
+
+
+def encodeDdsFile(imagePath, ddsPath, mipmaps = True):
+    """Convierte una imagen en un DDS comprimido: BC1 si es opaca y BC3 si tiene transparencia.
+
+    Args:
+        imagePath (str): Ruta de la imagen de origen.
+        ddsPath (str): Ruta del archivo .dds.
+        mipmaps (bool): Incluir la cadena completa de mipmaps.
+
+    Returns:
+        tuple: Formato usado ("DXT1" o "DXT5") y tamaño del archivo en bytes.
+    """
+    from PIL import Image
+
+    with Image.open(imagePath) as img:
+        hasAlpha = "A" in img.getbands() or "transparency" in img.info
+        image = np.array(img.convert("RGBA" if hasAlpha else "RGB"))
+    if hasAlpha and (image[..., 3] == 255).all():
+        image = image[..., :3]
+    format = "DXT5" if image.shape[2] == 4 else "DXT1"
+
+    levels = buildMipChain(image) if mipmaps else [image]
+    tempPath = f"{ddsPath}.tmp"
+    with open(tempPath, "wb") as f:
+        f.write(ddsHeader(image.shape[1], image.shape[0], len(levels), format))
+        for level in levels:
+            f.write(encodeLevel(level, format))
+    os.replace(tempPath, ddsPath)
+    return format, os.path.getsize(ddsPath)
+
+
+def _tag(name):
+    return f"{{{colladaNamespace}}}{name}"
+
+
+def compressDaeTextures(daePath, workers = 0, mipmaps = True, keepSource = False):
+    """Comprime en DDS las texturas PNG que referencia un Collada y actualiza sus referencias.
+
+    Solo se convierten las imágenes que están junto al .dae (las que copia el
+    exportador o los atlas). Cada textura se codifica en un proceso del pool, y
+    se reutilizan los DDS de ejecuciones anteriores que no son más antiguos que
+    su PNG o cuyo PNG ya se eliminó.
+
+    Args:
+        daePath (str): Ruta al archivo .dae.
+        workers (int): Procesos de codificación (0 = núcleos disponibles).
+        mipmaps (bool): Incluir la cadena completa de mipmaps.
+        keepSource (bool): Conservar los PNG originales.
+
+    Returns:
+        dict: Número de texturas, bytes de los PNG y de los DDS, y segundos empleados.
+    """
+    start = time.perf_counter()
+    ET.register_namespace("", colladaNamespace)
+    tree = ET.parse(daePath)
+    daeDir = os.path.dirname(os.path.abspath(daePath))
+
+    references = []
+    for image in tree.getroot().iter(_tag("image")):
+        initFrom = image.find(_tag("init_from"))
+        if initFrom is None or not initFrom.text:
+            continue
+        fileName = initFrom.text.strip()
+        if os.path.dirname(fileName) or not fileName.lower().endswith(".png"):
+            continue
+        references.append((initFrom, fileName))
+
+    stats = {"textures": 0, "reused": 0, "pngBytes": 0, "ddsBytes": 0, "formats": {}}
+    converted = set()
+    fileNames = []
+    for fileName in sorted({fileName for _, fileName in references}):
+        pngStamp = fileStamp(os.path.join(daeDir, fileName))
+        ddsStamp = fileStamp(os.path.join(daeDir, f"{os.path.splitext(fileName)[0]}.dds"))
+        if ddsStamp is not None and (pngStamp is None or ddsStamp[1] >= pngStamp[1]):
+            converted.add(fileName)
+            stats["reused"] += 1
+        elif pngStamp is not None:
+            fileNames.append(fileName)
+
+    with ProcessPoolExecutor(max_workers = workers or os.cpu_count() or 1) as pool:
+        futures = {}
+        for fileName in fileNames:
+            ddsName = f"{os.path.splitext(fileName)[0]}.dds"
+            futures[fileName] = pool.submit(encodeDdsFile, os.path.join(daeDir, fileName), os.path.join(daeDir, ddsName), mipmaps)
+        for fileName, future in futures.items():
+            try:
+                format, ddsBytes = future.result()
+            except Exception as e:
+                print(f"Error comprimiendo {fileName}: {str(e)}")
+                continue
+            converted.add(fileName)
+            stats["textures"] += 1
+            stats["pngBytes"] += os.path.getsize(os.path.join(daeDir, fileName))
+            stats["ddsBytes"] += ddsBytes
+            stats["formats"][format] = stats["formats"].get(format, 0) + 1
+
+    for initFrom, fileName in references:
+        if fileName in converted:
+            initFrom.text = f"{os.path.splitext(fileName)[0]}.dds"
+    tempPath = f"{daePath}.tmp"
+    tree.write(tempPath, encoding = "utf-8", xml_declaration = True)
+    os.replace(tempPath, daePath)
+
+    if not keepSource:
+        for fileName in converted:
+            if os.path.exists(os.path.join(daeDir, fileName)):
+                os.remove(os.path.join(daeDir, fileName))
+    stats["seconds"] = time.perf_counter() - start
+    return stats
+
+
+def main():
+    """Comprime en DDS las texturas de un archivo Collada ya exportado."""
+    parser = argparse.ArgumentParser(description = "Comprime las texturas de un Collada en DDS BC1/BC3 con mipmaps")
+    parser.add_argument("daePath")
+    parser.add_argument("--workers", type = int, default = 0)
+    parser.add_argument("--no-mipmaps", action = "store_true")
+    parser.add_argument("--keep-png", action = "store_true")
+    args = parser.parse_args()
+    stats = compressDaeTextures(args.daePath, args.workers, not args.no_mipmaps, args.keep_png)
+    print(
+        f"Texturas comprimidas: {stats['textures']} {stats['formats']}, reutilizadas: {stats['reused']}, "
+        f"{stats['pngBytes'] / (1024 * 1024):.1f} MB PNG -> {stats['ddsBytes'] / (1024 * 1024):.1f} MB DDS "
+        f"en {stats['seconds']:.1f} s"
+    )
+
+
+if __name__ == "__main__":
+    main()
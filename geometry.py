@@ -0,0 +1,920 @@
+import argparse
+import base64
+import json
+import os
+import re
+import shutil
+import time
+from contextlib import ExitStack
+from xml.sax.saxutils import escape, quoteattr
+import numpy as np
+from cache import fileDigest
+
+componentTypes = {5120: np.int8, 5121: np.uint8, 5122: np.int16, 5123: np.uint16, 5125: np.uint32, 5126: np.float32}
+typeSizes = {"SCALAR": 1, "VEC2": 2, "VEC3": 3, "VEC4": 4, "MAT2": 4, "MAT3": 9, "MAT4": 16}
+normalizedScales = {np.int8: 127.0, np.uint8: 255.0, np.int16: 32767.0, np.uint16: 65535.0}
+imageExtensions = {"image/png": ".png", "image/jpeg": ".jpg"}
+
+# El importador glTF de Blender convierte el eje Y-up de glTF a Z-up: (x, y, z) -> (x, -z, y)
+axisConversion = np.array([[1, 0, 0, 0], [0, 0, -1, 0], [0, 1, 0, 0], [0, 0, 0, 1]], dtype = np.float64)
+chunkValues = 1 << 16
+
+
+def _sanitizeId(name, takenIds):
+    """Convierte un nombre en un id Collada válido y único."""
+    base = re.sub(r"[^A-Za-z0-9_.-]", "_", name) or "id"
+    if not (base[0].isalpha() or base[0] == "_"):
+        base = f"_{base}"
+    newId = base
+    counter = 1
+    while newId in takenIds:
+        newId = f"{base}_{counter:03d}"
+        counter += 1
+    takenIds.add(newId)
+    return newId
+
+
+def _readUri(uri, baseDir):
+    if uri.startswith("data:"):
+        return base64.b64decode(uri.split(",", 1)[1])
+    with open(os.path.join(baseDir, uri), "rb") as f:
+        return f.read()
+
+
+def loadBuffers(gltf, baseDir):
+    """Carga los buffers binarios de un documento glTF.
+
+    Args:
+        gltf (dict): Documento glTF.
+        baseDir (str): Directorio del archivo .gltf.
+
+    Returns:
+        list[bytes]: Contenido de cada buffer.
+    """
+    return [_readUri(buffer["uri"], baseDir) for buffer in gltf.get("buffers", [])]
+
+
+def _viewArray(gltf, buffers, viewIndex, byteOffset, dtype, components, count):
+    view = gltf["bufferViews"][viewIndex]
+    buffer = buffers[view["buffer"]]
+    offset = view.get("byteOffset", 0) + byteOffset
+    stride = view.get("byteStride", 0)
+    if stride and stride != dtype.itemsize * components:
+        return np.ndarray((count, components), dtype = dtype, buffer = buffer, offset = offset, strides = (stride, dtype.itemsize))
+    return np.frombuffer(buffer, dtype = dtype, count = count * components, offset = offset).reshape(count, components)
+
+
+def readAccessor(gltf, buffers, accessorIndex):
+    """Lee un accessor glTF como un array de NumPy sin copiar el buffer cuando es posible.
+
+    Args:
+        gltf (dict): Documento glTF.
+        buffers (list[bytes]): Buffers cargados con loadBuffers.
+        accessorIndex (int): Índice del accessor.
+
+    Returns:
+        np.ndarray: Array de forma (count, componentes).
+    """
+    accessor = gltf["accessors"][accessorIndex]
+    componentType = componentTypes[accessor["componentType"]]
+    dtype = np.dtype(componentType).newbyteorder("<")
+    components = typeSizes[accessor["type"]]
+    count = accessor["count"]
+
+    if "bufferView" in accessor:
+        data = _viewArray(gltf, buffers, accessor["bufferView"], accessor.get("byteOffset", 0), dtype, components, count)
+    else:
+        data = np.zeros((count, components), dtype = dtype)
+
+    sparse = accessor.get("sparse")
+    if sparse:
+        indicesInfo = sparse["indices"]
+        indicesDtype = np.dtype(componentTypes[indicesInfo["componentType"]]).newbyteorder("<")
+        indices = _viewArray(gltf, buffers, indicesInfo["bufferView"], indicesInfo.get("byteOffset", 0), indicesDtype, 1, sparse["count"])
+        values = _viewArray(gltf, buffers, sparse["values"]["bufferView"], sparse["values"].get("byteOffset", 0), dtype, components, sparse["count"])
+        data = data.copy()
+        data[indices[:, 0]] = values
+
+    if accessor.get("normalized") and componentType in normalizedScales:
+        data = np.maximum(data.astype(np.float32) / normalizedScales[componentType], -1.0)
+    return data
+
+
+def _nodeMatrix(node):
+    if "matrix" in node:
+        return np.array(node["matrix"], dtype = np.float64).reshape(4, 4).T
+
+    x, y, z, w = node.get("rotation", (0.0, 0.0, 0.0, 1.0))
+    rotation = np.array([
+        [1 - 2 * (y * y + z * z), 2 * (x * y - z * w), 2 * (x * z + y * w)],
+        [2 * (x * y + z * w), 1 - 2 * (x * x + z * z), 2 * (y * z - x * w)],
+        [2 * (x * z - y * w), 2 * (y * z + x * w), 1 - 2 * (x * x + y * y)],
+    ])
+    matrix = np.eye(4)
+    matrix[:3, :3] = rotation * np.array(node.get("scale", (1.0, 1.0, 1.0)))
+    matrix[:3, 3] = node.get("translation", (0.0, 0.0, 0.0))
+    return matrix
+
+
+def meshInstances(gltf):
+    """Recorre la jerarquía de nodos de la escena y obtiene las mallas con su transformación global.
+
+    Args:
+        gltf (dict): Documento glTF.
+
+    Returns:
+        list[tuple]: Nombre del nodo, índice de la malla y matriz 4x4 en Z-up.
+    """
+    nodes = gltf.get("nodes", [])
+    scenes = gltf.get("scenes")
+    if scenes:
+        roots = scenes[gltf.get("scene", 0)].get("nodes", [])
+    else:
+        children = {child for node in nodes for child in node.get("children", [])}
+        roots = [index for index in range(len(nodes)) if index not in children]
+
+    instances = []
+    stack = [(index, axisConversion) for index in reversed(roots)]
+    while stack:
+        index, parentMatrix = stack.pop()
+        node = nodes[index]
+        matrix = parentMatrix @ _nodeMatrix(node)
+        if "mesh" in node:
+            instances.append((node.get("name", f"node{index}"), node["mesh"], matrix))
+        stack.extend((child, matrix) for child in reversed(node.get("children", [])))
+    return instances
+
+
+def _primitiveTriangles(primitive, indices):
+    mode = primitive.get("mode", 4)
+    if mode == 4:
+        return indices.reshape(-1, 3)
+    count = len(indices) - 2
+    if count <= 0:
+        return np.empty((0, 3), dtype = indices.dtype)
+    steps = np.arange(count)
+    if mode == 5:
+        odd = steps % 2 == 1
+        first = np.where(odd, steps + 1, steps)
+        second = np.where(odd, steps, steps + 1)
+        return np.stack([indices[first], indices[second], indices[steps + 2]], axis = 1)
+    if mode == 6:
+        return np.stack([np.full(count, indices[0]), indices[steps + 1], indices[steps + 2]], axis = 1)
+    return None
+
+
+def loadMesh(gltf, buffers, meshIndex):
+    """Carga las primitivas triangulares de una malla glTF en arrays combinados.
+
+    Args:
+        gltf (dict): Documento glTF.
+        buffers (list[bytes]): Buffers cargados con loadBuffers.
+        meshIndex (int): Índice de la malla.
+
+    Returns:
+        tuple: Posiciones (N, 3), UV (N, 2) y lista de (material, triángulos (K, 3)).
+    """
+    positions = []
+    uvs = []
+    groups = []
+    vertexOffset = 0
+
+    for primitive in gltf["meshes"][meshIndex]["primitives"]:
+        attributes = primitive["attributes"]
+        if "POSITION" not in attributes:
+            continue
+        primitivePositions = readAccessor(gltf, buffers, attributes["POSITION"])
+        vertexCount = len(primitivePositions)
+
+        if "indices" in primitive:
+            indices = readAccessor(gltf, buffers, primitive["indices"])[:, 0].astype(np.int64)
+        else:
+            indices = np.arange(vertexCount, dtype = np.int64)
+        triangles = _primitiveTriangles(primitive, indices)
+        if triangles is None:
+            continue
+
+        if "TEXCOORD_0" in attributes:
+            primitiveUvs = readAccessor(gltf, buffers, attributes["TEXCOORD_0"]).astype(np.float32)
+        else:
+            primitiveUvs = np.zeros((vertexCount, 2), dtype = np.float32)
+
+        positions.append(primitivePositions.astype(np.float32))
+        uvs.append(primitiveUvs)
+        groups.append((primitive.get("material"), triangles + vertexOffset))
+        vertexOffset += vertexCount
+
+    if not positions:
+        return np.empty((0, 3), dtype = np.float32), np.empty((0, 2), dtype = np.float32), []
+    return np.concatenate(positions), np.concatenate(uvs), groups
+
+
+def _packCells(cells, spans):
+    """Empaqueta las coordenadas de celda (no negativas) en un único int64 por vértice."""
+    packed = np.zeros(len(cells), dtype = np.int64)
+    for axis in range(3):
+        packed = packed * int(spans[axis]) + cells[:, axis]
+    return packed
+
+
+# Mitad de las 26 celdas vecinas: las que preceden a la celda en el orden de las claves
+neighborOffsets = np.array(
+    [(dx, dy, dz) for dx in (-1, 0, 1) for dy in (-1, 0, 1) for dz in (-1, 0, 1) if (dx, dy, dz) < (0, 0, 0)],
+    dtype = np.int64,
+)
+
+
+def weldVertices(positions, threshold = 0.001):
+    """Fusiona los vértices cercanos mediante un hash espacial de celdas del tamaño del umbral.
+
+    Equivalente vectorizado de remove_doubles: los vértices de una misma celda se
+    fusionan en el primero de ellos y, después, cada celda se une a una celda
+    vecina si sus representantes están a menos del umbral, para no separar
+    vértices casi coincidentes que caen a ambos lados de un borde de celda. Se
+    conserva el orden original de los vértices.
+
+    Args:
+        positions (np.ndarray): Posiciones (N, 3).
+        threshold (float): Tamaño de celda (distancia de fusión).
+
+    Returns:
+        tuple: Posiciones fusionadas (M, 3) y array (N,) con el nuevo índice de cada vértice.
+    """
+    if len(positions) == 0:
+        return positions, np.empty(0, dtype = np.int64)
+
+    cells = np.floor(positions.astype(np.float64) / threshold).astype(np.int64)
+    # Margen de una celda a cada lado para que las vecinas también se puedan empaquetar
+    cells -= cells.min(axis = 0) - 1
+    spans = cells.max(axis = 0) + 2
+    if np.prod(spans.astype(np.float64)) >= 2.0 ** 62:
+        _, first, inverse = np.unique(cells, axis = 0, return_index = True, return_inverse = True)
+        inverse = inverse.reshape(-1)
+    else:
+        keys, first, inverse = np.unique(_packCells(cells, spans), return_index = True, return_inverse = True)
+        inverse = inverse.reshape(-1)
+
+        representatives = positions[first].astype(np.float64)
+        representativeCells = cells[first]
+        target = np.arange(len(keys))
+        for offset in neighborOffsets:
+            neighborKeys = _packCells(representativeCells + offset, spans)
+            neighbor = np.minimum(np.searchsorted(keys, neighborKeys), len(keys) - 1)
+            distance = np.linalg.norm(representatives - representatives[neighbor], axis = 1)
+            merge = (keys[neighbor] == neighborKeys) & (distance <= threshold)
+            target[merge] = np.minimum(target[merge], neighbor[merge])
+        # Las celdas siempre apuntan a una anterior, así que basta con saltar punteros hasta estabilizar
+        while True:
+            jumped = target[target]
+            if np.array_equal(jumped, target):
+                break
+            target = jumped
+        cellIds, target = np.unique(target, return_inverse = True)
+        first = first[cellIds]
+        inverse = target.reshape(-1)[inverse]
+
+    order = np.argsort(first)
+    remap = np.empty_like(order)
+    remap[order] = np.arange(len(order))
+    return positions[first[order]], remap[inverse]
+
+
+def smoothNormals(positions, triangles):
+    """Calcula normales suaves por vértice ponderando cada cara por su área.
+
+    Args:
+        positions (np.ndarray): Posiciones (M, 3).
+        triangles (np.ndarray): Índices de los triángulos (K, 3).
+
+    Returns:
+        np.ndarray: Normales unitarias (M, 3).
+    """
+    normals = np.zeros((len(positions), 3), dtype = np.float64)
+    if len(triangles) == 0:
+        normals[:, 2] = 1.0
+        return normals.astype(np.float32)
+
+    corners = positions[triangles].astype(np.float64)
+    faceNormals = np.cross(corners[:, 1] - corners[:, 0], corners[:, 2] - corners[:, 0])
+    vertexIndices = triangles.reshape(-1)
+    cornerNormals = np.repeat(faceNormals, 3, axis = 0)
+    for axis in range(3):
+        normals[:, axis] = np.bincount(vertexIndices, weights = cornerNormals[:, axis], minlength = len(positions))
+
+    lengths = np.linalg.norm(normals, axis = 1)
+    valid = lengths > 0
+    normals[valid] /= lengths[valid, None]
+    normals[~valid] = (0.0, 0.0, 1.0)
+    return normals.astype(np.float32)
+
+
+def windingFlips(positions, triangles):
+    """Obtiene los triángulos que hay que invertir para que el sentido de giro sea coherente.
+
+    Equivale a normals_make_consistent de Blender dentro de cada zona conexa: dos
+    caras que comparten una arista (con exactamente dos caras) deben recorrerla en
+    sentidos opuestos. A diferencia de Blender, no se decide qué lado de la zona es
+    el exterior: se mantiene el sentido de la mayor parte de su área, que en los
+    tiles es el del glTF original.
+
+    Args:
+        positions (np.ndarray): Posiciones (M, 3).
+        triangles (np.ndarray): Índices de los triángulos (K, 3).
+
+    Returns:
+        np.ndarray: Máscara booleana (K,) de los triángulos a invertir.
+    """
+    faceCount = len(triangles)
+    flips = np.zeros(faceCount, dtype = bool)
+    if faceCount == 0:
+        return flips
+
+    edges = np.concatenate([triangles[:, [0, 1]], triangles[:, [1, 2]], triangles[:, [2, 0]]])
+    faces = np.tile(np.arange(faceCount), 3)
+    low = edges.min(axis = 1)
+    high = edges.max(axis = 1)
+    forward = edges[:, 0] < edges[:, 1]
+    order = np.lexsort((high, low))
+    low, high, faces, forward = low[order], high[order], faces[order], forward[order]
+
+    starts = np.flatnonzero(np.r_[True, (low[1:] != low[:-1]) | (high[1:] != high[:-1])])
+    counts = np.diff(np.r_[starts, len(low)])
+    # Las aristas con más de dos caras no son variedad y separan zonas, como en Blender
+    pairs = starts[counts == 2]
+    sameDirection = forward[pairs] == forward[pairs + 1]
+    if not sameDirection.any():
+        return flips
+
+    nodes = np.concatenate([faces[pairs], faces[pairs + 1]])
+    neighbors = np.concatenate([faces[pairs + 1], faces[pairs]])
+    parities = np.concatenate([sameDirection, sameDirection])
+    order = np.argsort(nodes, kind = "stable")
+    offsets = np.searchsorted(nodes[order], np.arange(faceCount + 1)).tolist()
+    neighbors = neighbors[order].tolist()
+    parities = parities[order].tolist()
+
+    component = [-1] * faceCount
+    flipList = [False] * faceCount
+    for seed in range(faceCount):
+        if component[seed] >= 0:
+            continue
+        component[seed] = seed
+        stack = [seed]
+        while stack:
+            face = stack.pop()
+            for index in range(offsets[face], offsets[face + 1]):
+                other = neighbors[index]
+                if component[other] < 0:
+                    component[other] = seed
+                    flipList[other] = flipList[face] != parities[index]
+                    stack.append(other)
+
+    flips = np.array(flipList, dtype = bool)
+    component = np.array(component)
+    corners = positions[triangles].astype(np.float64)
+    areas = np.linalg.norm(np.cross(corners[:, 1] - corners[:, 0], corners[:, 2] - corners[:, 0]), axis = 1)
+    flippedArea = np.bincount(component, weights = areas * flips, minlength = faceCount)
+    totalArea = np.bincount(component, weights = areas, minlength = faceCount)
+    return flips ^ (flippedArea > totalArea - flippedArea)[component]
+
+
+def processMesh(positions, uvs, groups, threshold = 0.001):
+    """Suelda los vértices, elimina los triángulos degenerados, orienta las caras y calcula las normales de una malla.
+
+    Las UV se mantienen por esquina de triángulo, como en Blender, por lo que
+    soldar las posiciones no altera el mapeado de texturas.
+
+    Args:
+        positions (np.ndarray): Posiciones (N, 3).
+        uvs (np.ndarray): UV glTF (N, 2).
+        groups (list[tuple]): Material y triángulos (K, 3) de cada primitiva.
+        threshold (float): Distancia de fusión de vértices.
+
+    Returns:
+        dict: Arrays "positions", "normals", "uvs" y lista "groups" de (material, vértices (K, 3), uv (K, 3)).
+    """
+    weldedPositions, remap = weldVertices(positions, threshold)
+
+    # Blender invierte la coordenada V al importar glTF
+    flippedUvs = np.column_stack([uvs[:, 0], 1.0 - uvs[:, 1]]).astype(np.float32)
+    # Cada par de float32 se compara como un único uint64
+    uvKeys = np.ascontiguousarray(flippedUvs).view(np.uint64).reshape(-1)
+    _, uvFirst, uvIndices = np.unique(uvKeys, return_index = True, return_inverse = True)
+    uniqueUvs = flippedUvs[uvFirst]
+    uvIndices = uvIndices.reshape(-1)
+
+    processedGroups = []
+    allTriangles = []
+    for material, corners in groups:
+        triangles = remap[corners]
+        valid = (triangles[:, 0] != triangles[:, 1]) & (triangles[:, 1] != triangles[:, 2]) & (triangles[:, 0] != triangles[:, 2])
+        triangles = triangles[valid]
+        if len(triangles) == 0:
+            continue
+        processedGroups.append((material, triangles, uvIndices[corners[valid]]))
+        allTriangles.append(triangles)
+
+    triangles = np.concatenate(allTriangles) if allTriangles else np.empty((0, 3), dtype = np.int64)
+    flips = windingFlips(weldedPositions, triangles)
+    if flips.any():
+        offset = 0
+        for material, groupTriangles, groupUvs in processedGroups:
+            groupFlips = flips[offset : offset + len(groupTriangles)]
+            groupTriangles[groupFlips] = groupTriangles[groupFlips][:, [0, 2, 1]]
+            groupUvs[groupFlips] = groupUvs[groupFlips][:, [0, 2, 1]]
+            offset += len(groupTriangles)
+        triangles[flips] = triangles[flips][:, [0, 2, 1]]
+    return {
+        "positions": weldedPositions,
+        "normals": smoothNormals(weldedPositions, triangles),
+        "uvs": uniqueUvs,
+        "groups": processedGroups,
+    }
+
+
+def clusterVertices(positions, cellSize):
+    """Agrupa los vértices en una rejilla de celdas y sustituye cada grupo por su posición media.
+
+    A diferencia de weldVertices, no se unen celdas vecinas, de modo que el error
+    de cada vértice está acotado por el tamaño de celda.
+
+    Args:
+        positions (np.ndarray): Posiciones (N, 3).
+        cellSize (float): Lado de las celdas.
+
+    Returns:
+        tuple: Posiciones agrupadas (M, 3) y array (N,) con el grupo de cada vértice.
+    """
+    cells = np.floor(positions.astype(np.float64) / cellSize).astype(np.int64)
+    cells -= cells.min(axis = 0)
+    spans = cells.max(axis = 0) + 1
+    if np.prod(spans.astype(np.float64)) >= 2.0 ** 62:
+        _, inverse = np.unique(cells, axis = 0, return_inverse = True)
+    else:
+        _, inverse = np.unique(_packCells(cells, spans), return_inverse = True)
+    inverse = inverse.reshape(-1)
+    counts = np.bincount(inverse)
+    sums = np.column_stack([np.bincount(inverse, weights = positions[:, axis], minlength = len(counts)) for axis in range(3)])
+    return (sums / counts[:, None]).astype(np.float32), inverse
+
+
+def _remapGroups(groups, remap):
+    """Aplica un remapeo de vértices a los grupos de una malla y descarta los triángulos degenerados."""
+    remapped = []
+    for material, triangles, uvIndices in groups:
+        triangles = remap[triangles]
+        valid = (triangles[:, 0] != triangles[:, 1]) & (triangles[:, 1] != triangles[:, 2]) & (triangles[:, 0] != triangles[:, 2])
+        if valid.any():
+            remapped.append((material, triangles[valid], uvIndices[valid]))
+    return remapped
+
+
+def decimateMesh(mesh, level):
+    """Genera un nivel de detalle de una malla procesada agrupando sus vértices en una rejilla.
+
+    Con "error" el tamaño de celda es directamente el error máximo admitido en
+    metros; con "ratio" se busca por bisección el tamaño de celda que conserva esa
+    fracción de los triángulos.
+
+    Args:
+        mesh (dict): Resultado de processMesh.
+        level (dict): Nivel con "ratio" (fracción de triángulos) o "error" (metros).
+
+    Returns:
+        dict: Malla simplificada con la misma estructura que processMesh.
+    """
+    positions = mesh["positions"]
+    extent = float(np.ptp(positions, axis = 0).max()) if len(positions) else 0.0
+    if extent == 0.0:
+        return mesh
+
+    if level.get("error"):
+        cellSize = level["error"]
+    else:
+        if level.get("ratio", 1.0) >= 1.0:
+            return mesh
+        target = level["ratio"] * sum(len(triangles) for _, triangles, _ in mesh["groups"])
+        low, high = extent * 1e-6, extent
+        for _ in range(16):
+            middle = (low * high) ** 0.5
+            remaining = sum(len(triangles) for _, triangles, _ in _remapGroups(mesh["groups"], clusterVertices(positions, middle)[1]))
+            if remaining > target:
+                low = middle
+            else:
+                high = middle
+        cellSize = high
+
+    clustered, remap = clusterVertices(positions, cellSize)
+    groups = _remapGroups(mesh["groups"], remap)
+    triangles = np.concatenate([triangles for _, triangles, _ in groups]) if groups else np.empty((0, 3), dtype = np.int64)
+    return {
+        "positions": clustered,
+        "normals": smoothNormals(clustered, triangles),
+        "uvs": mesh["uvs"],
+        "groups": groups,
+    }
+
+
+class ColladaWriter:
+    """Escribe un documento Collada 1.4.1 en streaming con la misma estructura que el exportador de Blender.
+
+    No se generan el cubo, la cámara ni la luz iniciales, por lo que el resultado
+    equivale a exportCollada seguido de cleanup.cleanDaeFile.
+    """
+
+    def __init__(self, out):
+        self.out = out
+        self.takenIds = set()
+
+    def write(self, text):
+        self.out.write(text)
+
+    def writeArray(self, values, fmt):
+        flat = values.reshape(-1).tolist()
+        for start in range(0, len(flat), chunkValues):
+            if start:
+                self.write(" ")
+            self.write(" ".join(map(fmt.__mod__, flat[start : start + chunkValues])))
+
+    def begin(self):
+        now = time.strftime("%Y-%m-%dT%H:%M:%S")
+        self.write('<?xml version="1.0" encoding="utf-8"?>\n')
+        self.write('<COLLADA xmlns="http://www.collada.org/2005/11/COLLADASchema" version="1.4.1" xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance">\n')
+        self.write("  <asset>\n")
+        self.write("    <contributor>\n      <author>Scenario-Generation</author>\n      <authoring_tool>geometry.py</authoring_tool>\n    </contributor>\n")
+        self.write(f"    <created>{now}</created>\n    <modified>{now}</modified>\n")
+        self.write('    <unit name="meter" meter="1"/>\n    <up_axis>Z_UP</up_axis>\n  </asset>\n')
+
+    def beginGeometries(self):
+        self.write("  <library_geometries>\n")
+
+    def endGeometries(self):
+        self.write("  </library_geometries>\n")
+
+    def writeMaterials(self, materials, images):
+        """Escribe las librerías de efectos, imágenes y materiales.
+
+        Args:
+            materials (list[dict]): Materiales con "id", "name", "image" (id o None) y "color".
+            images (list[tuple]): Id y nombre de archivo de cada imagen.
+        """
+        self.write("  <library_effects>\n")
+        for material in materials:
+            self.write(f'    <effect id="{material["id"]}-effect">\n      <profile_COMMON>\n')
+            imageId = material["image"]
+            if imageId is not None:
+                self.write(f'        <newparam sid="{imageId}-surface">\n          <surface type="2D">\n            <init_from>{imageId}</init_from>\n          </surface>\n        </newparam>\n')
+                self.write(f'        <newparam sid="{imageId}-sampler">\n          <sampler2D>\n            <source>{imageId}-surface</source>\n          </sampler2D>\n        </newparam>\n')
+            self.write('        <technique sid="common">\n          <lambert>\n')
+            self.write('            <emission>\n              <color sid="emission">0 0 0 1</color>\n            </emission>\n')
+            if imageId is not None:
+                diffuse = f'<texture texture="{imageId}-sampler" texcoord="UVMap"/>'
+            else:
+                diffuse = f'<color sid="diffuse">{" ".join("%.6g" % value for value in material["color"])}</color>'
+            self.write(f"            <diffuse>\n              {diffuse}\n            </diffuse>\n")
+            self.write('            <index_of_refraction>\n              <float sid="ior">1.45</float>\n            </index_of_refraction>\n')
+            self.write("          </lambert>\n        </technique>\n      </profile_COMMON>\n    </effect>\n")
+        self.write("  </library_effects>\n")
+
+        self.write("  <library_images>\n")
+        for imageId, fileName in images:
+            self.write(f'    <image id="{imageId}" name="{imageId}">\n      <init_from>{escape(fileName)}</init_from>\n    </image>\n')
+        self.write("  </library_images>\n")
+
+        self.write("  <library_materials>\n")
+        for material in materials:
+            self.write(f'    <material id="{material["id"]}-material" name={quoteattr(material["name"])}>\n')
+            self.write(f'      <instance_effect url="#{material["id"]}-effect"/>\n    </material>\n')
+        self.write("  </library_materials>\n")
+
+    def _writeSource(self, sourceId, values, params, fmt):
+        count = len(values)
+        self.write(f'        <source id="{sourceId}">\n')
+        self.write(f'          <float_array id="{sourceId}-array" count="{count * len(params)}">')
+        self.writeArray(values, fmt)
+        self.write("</float_array>\n          <technique_common>\n")
+        self.write(f'            <accessor source="#{sourceId}-array" count="{count}" stride="{len(params)}">\n')
+        for param in params:
+            self.write(f'              <param name="{param}" type="float"/>\n')
+        self.write("            </accessor>\n          </technique_common>\n        </source>\n")
+
+    def writeGeometry(self, geometryId, name, mesh, materialIds):
+        """Escribe una geometría con posiciones, normales y UV indexadas por separado.
+
+        Args:
+            geometryId (str): Id base de la geometría.
+            name (str): Nombre de la malla.
+            mesh (dict): Resultado de processMesh.
+            materialIds (dict): Índice de material glTF -> id del material Collada.
+        """
+        meshId = f"{geometryId}-mesh"
+        self.write(f'    <geometry id="{meshId}" name={quoteattr(name)}>\n      <mesh>\n')
+        self._writeSource(f"{meshId}-positions", mesh["positions"], ("X", "Y", "Z"), "%.7g")
+        self._writeSource(f"{meshId}-normals", mesh["normals"], ("X", "Y", "Z"), "%.6g")
+        self._writeSource(f"{meshId}-map-0", mesh["uvs"], ("S", "T"), "%.6g")
+        self.write(f'        <vertices id="{meshId}-vertices">\n          <input semantic="POSITION" source="#{meshId}-positions"/>\n        </vertices>\n')
+
+        for material, triangles, uvIndices in mesh["groups"]:
+            materialAttribute = f' material="{materialIds[material]}-material"' if material in materialIds else ""
+            self.write(f'        <triangles{materialAttribute} count="{len(triangles)}">\n')
+            self.write(f'          <input semantic="VERTEX" source="#{meshId}-vertices" offset="0"/>\n')
+            self.write(f'          <input semantic="NORMAL" source="#{meshId}-normals" offset="1"/>\n')
+            self.write(f'          <input semantic="TEXCOORD" source="#{meshId}-map-0" offset="2" set="0"/>\n')
+            self.write("          <p>")
+            self.writeArray(np.stack([triangles, triangles, uvIndices], axis = 2), "%d")
+            self.write("</p>\n        </triangles>\n")
+        self.write("      </mesh>\n    </geometry>\n")
+
+    def writeScene(self, nodes):
+        """Escribe la escena visual con un nodo por instancia de malla.
+
+        Args:
+            nodes (list[tuple]): Id del nodo, nombre, id de la geometría, matriz 4x4 e ids de sus materiales.
+        """
+        self.write('  <library_visual_scenes>\n    <visual_scene id="Scene" name="Scene">\n')
+        for nodeId, name, geometryId, matrix, materials in nodes:
+            self.write(f'      <node id="{nodeId}" name={quoteattr(name)} type="NODE">\n        <matrix sid="transform">')
+            self.writeArray(matrix, "%.9g")
+            self.write("</matrix>\n")
+            self.write(f'        <instance_geometry url="#{geometryId}-mesh" name={quoteattr(name)}>\n')
+            if materials:
+                self.write("          <bind_material>\n            <technique_common>\n")
+                for materialId in materials:
+                    self.write(f'              <instance_material symbol="{materialId}-material" target="#{materialId}-material">\n')
+                    self.write('                <bind_vertex_input semantic="UVMap" input_semantic="TEXCOORD" input_set="0"/>\n')
+                    self.write("              </instance_material>\n")
+                self.write("            </technique_common>\n          </bind_material>\n")
+            self.write("        </instance_geometry>\n      </node>\n")
+        self.write("    </visual_scene>\n  </library_visual_scenes>\n")
+        self.write('  <scene>\n    <instance_visual_scene url="#Scene"/>\n  </scene>\n</COLLADA>\n')
+
+
+def _resolveImage(gltf, buffers, imageIndex, gltfDir, textureDir, outputDir, stem):
+    """Obtiene la ruta de origen de una imagen, extrayendo a outputDir las imágenes embebidas.
+
+    Returns:
+        tuple: Ruta de la imagen y si se ha extraído de un buffer o URI de datos.
+    """
+    image = gltf["images"][imageIndex]
+    if "uri" in image and not image["uri"].startswith("data:"):
+        sourcePath = os.path.join(gltfDir, image["uri"])
+        if os.path.exists(sourcePath):
+            return sourcePath, False
+        # Igual que find_missing_files, se busca el archivo por nombre en el directorio de texturas
+        return os.path.join(textureDir, os.path.basename(image["uri"])), False
+
+    if "uri" in image:
+        data = _readUri(image["uri"], gltfDir)
+        mimeType = image["uri"][5:].split(";", 1)[0]
+    else:
+        view = gltf["bufferViews"][image["bufferView"]]
+        offset = view.get("byteOffset", 0)
+        data = buffers[view["buffer"]][offset : offset + view["byteLength"]]
+        mimeType = image.get("mimeType", "image/png")
+    extractedPath = os.path.join(outputDir, f"{stem}_image{imageIndex}{imageExtensions.get(mimeType, '.png')}")
+    with open(extractedPath, "wb") as f:
+        f.write(data)
+    return extractedPath, True
+
+
+def _collectMaterials(documents, textureDir, outputDir, takenIds, materialTakenIds, deduplicate = True):
+    """Crea los materiales e imágenes Collada de todos los documentos y copia las texturas junto al .dae.
+
+    Con deduplicate, las imágenes con el mismo contenido se copian una sola vez y
+    los materiales con la misma imagen y el mismo color se unen en uno.
+
+    Returns:
+        tuple: Materiales, imágenes, ids de material de cada documento y número de
+            imágenes y materiales antes y después de deduplicar.
+    """
+    materials = []
+    images = []
+    imageIds = {}
+    contentIds = {}
+    materialKeys = {}
+    materialIds = []
+    counts = {"inputImages": 0, "images": 0, "inputMaterials": 0, "materials": 0}
+
+    for gltfPath, gltf, buffers in documents:
+        gltfDir = os.path.dirname(gltfPath)
+        stem = os.path.splitext(os.path.basename(gltfPath))[0]
+        documentMaterials = {}
+        for index, material in enumerate(gltf.get("materials", [])):
+            pbr = material.get("pbrMetallicRoughness", {})
+            imageId = None
+            textureInfo = pbr.get("baseColorTexture")
+            if textureInfo is not None:
+                source = gltf["textures"][textureInfo["index"]].get("source")
+                if source is not None:
+                    sourcePath, extracted = _resolveImage(gltf, buffers, source, gltfDir, textureDir, outputDir, stem)
+                    if sourcePath not in imageIds:
+                        counts["inputImages"] += 1
+                        digest = fileDigest(sourcePath) if deduplicate and os.path.exists(sourcePath) else None
+                        if digest in contentIds:
+                            imageIds[sourcePath] = contentIds[digest]
+                            if extracted:
+                                os.remove(sourcePath)
+                        else:
+                            fileName = os.path.basename(sourcePath)
+                            destPath = os.path.join(outputDir, fileName)
+                            if os.path.exists(sourcePath) and os.path.abspath(sourcePath) != os.path.abspath(destPath):
+                                shutil.copyfile(sourcePath, destPath)
+                            imageIds[sourcePath] = _sanitizeId(os.path.splitext(fileName)[0], takenIds)
+                            images.append((imageIds[sourcePath], fileName))
+                            if digest is not None:
+                                contentIds[digest] = imageIds[sourcePath]
+                    imageId = imageIds[sourcePath]
+
+            counts["inputMaterials"] += 1
+            color = pbr.get("baseColorFactor", (0.8, 0.8, 0.8, 1.0))
+            materialKey = (imageId, tuple(color))
+            if deduplicate and materialKey in materialKeys:
+                documentMaterials[index] = materialKeys[materialKey]
+                continue
+            name = material.get("name", f"{stem}_material{index}")
+            materialId = _sanitizeId(name, materialTakenIds)
+            documentMaterials[index] = materialId
+            materialKeys[materialKey] = materialId
+            materials.append({"id": materialId, "name": name, "image": imageId, "color": color})
+        materialIds.append(documentMaterials)
+    counts["images"] = len(images)
+    counts["materials"] = len(materials)
+    return materials, images, materialIds, counts
+
+
+def lodFileName(mapName, level, extension = ".dae"):
+    """Nombre de la malla de un nivel de detalle (el nivel 0 es el archivo completo)."""
+    return f"{mapName}{extension}" if level == 0 else f"{mapName}_lod{level}{extension}"
+
+
+def exportScene(gltfDir, textureDir, outputDir, mapName, threshold = 0.001, lodLevels = (), gltfFiles = None, origin = None, meshFormat = "dae", quantize = False, deduplicate = True):
+    """Convierte los glTF de un directorio en un Collada sin utilizar Blender.
+
+    Sustituye a blender.py: importa los glTF, fusiona vértices, calcula normales
+    suaves y escribe <mapName>.dae. Las geometrías se escriben en cuanto se
+    procesan, por lo que en memoria solo se mantiene una malla a la vez. Cada
+    nivel de detalle adicional se escribe a la vez en <mapName>_lod<n>.dae.
+    Con meshFormat "glb" se escribe un glTF binario en lugar del Collada.
+
+    Args:
+        gltfDir (str): Directorio con los archivos glTF.
+        textureDir (str): Directorio de las texturas.
+        outputDir (str): Directorio de salida del .dae y las texturas.
+        mapName (str): Nombre del archivo de salida sin extensión.
+        threshold (float): Distancia de fusión de vértices.
+        lodLevels (list[dict]): Niveles de detalle adicionales (ver decimateMesh).
+        gltfFiles (list[str], optional): glTF a exportar; por defecto todos los del directorio.
+        origin (list[float], optional): Punto que pasa a ser el origen de la escena exportada.
+        meshFormat (str): Formato de salida, "dae" o "glb".
+        quantize (bool): Cuantizar las mallas del glb con KHR_mesh_quantization.
+        deduplicate (bool): Unir las imágenes con el mismo contenido y los materiales iguales.
+
+    Returns:
+        dict: Estadísticas de mallas, vértices, triángulos, imágenes y materiales,
+            tiempo de cada paso y triángulos y tiempo de cada nivel de detalle en "levels".
+    """
+    if gltfFiles is None:
+        gltfFiles = [f for f in sorted(os.listdir(gltfDir)) if f.endswith(".gltf")]
+    offset = np.eye(4)
+    if origin is not None:
+        offset[:3, 3] = -np.asarray(origin, dtype = np.float64)
+    os.makedirs(outputDir, exist_ok = True)
+    timings = {"load": 0.0, "weld": 0.0, "write": 0.0}
+    stats = {"meshes": 0, "inputVertices": 0, "vertices": 0, "triangles": 0}
+
+    documents = []
+    for gltfFile in gltfFiles:
+        gltfPath = os.path.join(gltfDir, gltfFile)
+        with open(gltfPath, "r", encoding = "utf-8") as f:
+            documents.append([gltfPath, json.load(f), None])
+
+    # Los ids de geometrías y materiales llevan sufijo (-mesh, -material), así que no chocan con los nodos
+    takenIds = {"Scene"}
+    geometryTakenIds = set()
+    materialTakenIds = set()
+    levels = [{}] + list(lodLevels)
+    outputPaths = [os.path.join(outputDir, lodFileName(mapName, level, f".{meshFormat}")) for level in range(len(levels))]
+    levelStats = [{"level": level, "file": os.path.basename(path), "vertices": 0, "triangles": 0, "seconds": 0.0} for level, path in enumerate(outputPaths)]
+    # Si algo falla, no se dejan archivos .tmp a medias en el directorio de salida
+    try:
+        with ExitStack() as stack:
+            if meshFormat == "glb":
+                from glb import GlbWriter
+                writers = [stack.enter_context(GlbWriter(f"{path}.tmp")) for path in outputPaths]
+            else:
+                writers = [ColladaWriter(stack.enter_context(open(f"{path}.tmp", "w", encoding = "utf-8"))) for path in outputPaths]
+            for writer in writers:
+                writer.begin()
+
+            # Los buffers solo se necesitan aquí para las imágenes embebidas
+            for document in documents:
+                if any("uri" not in image for image in document[1].get("images", [])):
+                    document[2] = loadBuffers(document[1], os.path.dirname(document[0]))
+            materials, images, materialIds, counts = _collectMaterials(documents, textureDir, outputDir, takenIds, materialTakenIds, deduplicate)
+            stats.update(counts)
+            for writer in writers:
+                writer.writeMaterials(materials, images)
+                writer.beginGeometries()
+
+            levelNodes = [[] for _ in levels]
+            for (gltfPath, gltf, _), documentMaterials in zip(documents, materialIds):
+                start = time.perf_counter()
+                buffers = loadBuffers(gltf, os.path.dirname(gltfPath))
+                timings["load"] += time.perf_counter() - start
+
+                geometryIds = {}
+                for nodeName, meshIndex, matrix in meshInstances(gltf):
+                    if meshIndex not in geometryIds:
+                        start = time.perf_counter()
+                        positions, uvs, groups = loadMesh(gltf, buffers, meshIndex)
+                        loadEnd = time.perf_counter()
+                        mesh = processMesh(positions, uvs, groups, threshold)
+                        weldEnd = time.perf_counter()
+
+                        meshName = gltf["meshes"][meshIndex].get("name", f"mesh{meshIndex}")
+                        geometryId = _sanitizeId(meshName, geometryTakenIds)
+                        timings["load"] += loadEnd - start
+                        timings["weld"] += weldEnd - loadEnd
+
+                        levelGeometries = []
+                        for level, (writer, levelMesh) in enumerate(zip(writers, [mesh] + [None] * len(lodLevels))):
+                            levelStart = time.perf_counter()
+                            if levelMesh is None:
+                                levelMesh = decimateMesh(mesh, levels[level])
+                            writeStart = time.perf_counter()
+                            writer.writeGeometry(geometryId, meshName, levelMesh, documentMaterials)
+                            writeEnd = time.perf_counter()
+                            timings["write"] += writeEnd - writeStart
+                            levelStats[level]["seconds"] += writeEnd - (levelStart if level else start)
+                            levelStats[level]["vertices"] += len(levelMesh["positions"])
+                            levelStats[level]["triangles"] += sum(len(triangles) for _, triangles, _ in levelMesh["groups"])
+
+                            usedMaterials = [documentMaterials[material] for material, _, _ in levelMesh["groups"] if material in documentMaterials]
+                            levelGeometries.append(list(dict.fromkeys(usedMaterials)))
+                        geometryIds[meshIndex] = (geometryId, levelGeometries)
+                        stats["meshes"] += 1
+                        stats["inputVertices"] += len(positions)
+                        stats["vertices"] += len(mesh["positions"])
+                        stats["triangles"] += sum(len(triangles) for _, triangles, _ in mesh["groups"])
+
+                    geometryId, levelGeometries = geometryIds[meshIndex]
+                    nodeId = _sanitizeId(nodeName, takenIds)
+                    for nodes, usedMaterials in zip(levelNodes, levelGeometries):
+                        nodes.append((nodeId, nodeName, geometryId, offset @ matrix, usedMaterials))
+                buffers = None
+
+            for level, (writer, nodes) in enumerate(zip(writers, levelNodes)):
+                start = time.perf_counter()
+                writer.endGeometries()
+                writer.writeScene(nodes)
+                seconds = time.perf_counter() - start
+                timings["write"] += seconds
+                levelStats[level]["seconds"] += seconds
+        for path in outputPaths:
+            os.replace(f"{path}.tmp", path)
+    except BaseException:
+        for path in outputPaths:
+            if os.path.exists(f"{path}.tmp"):
+                os.remove(f"{path}.tmp")
+        raise
+    if quantize and meshFormat == "glb":
+        from glb import quantizeGlbFile
+        for path in outputPaths:
+            quantizeGlbFile(path)
+
+    print(f"Mallas procesadas: {stats['meshes']}")
+    print(f"Vértices: {stats['inputVertices']} -> {stats['vertices']}, triángulos: {stats['triangles']}")
+    print(f"Imágenes: {stats['inputImages']} -> {stats['images']}, materiales: {stats['inputMaterials']} -> {stats['materials']}")
+    for passName, seconds in timings.items():
+        print(f"Tiempo {passName}: {seconds:.2f} s")
+    return dict(stats, timings = timings, levels = levelStats)
+
+
+def main():
+    """Procesa los modelos 3D sin Blender, con los mismos argumentos que blender.py."""
+    parser = argparse.ArgumentParser()
+    parser.add_argument("gltfDir")
+    parser.add_argument("textureDir")
+    parser.add_argument("outputDir")
+    parser.add_argument("mapName")
+    parser.add_argument("--threshold", type = float, default = 0.001)
+    parser.add_argument("--lod-levels", default = "[]", help = "Niveles de detalle adicionales en JSON")
+    parser.add_argument("--format", choices = ["dae", "glb"], default = "dae")
+    parser.add_argument("--quantize", action = "store_true", help = "Cuantizar las mallas del glb")
+    parser.add_argument("--no-dedupe", action = "store_true", help = "No unir imágenes y materiales repetidos")
+    args = parser.parse_args()
+    exportScene(
+        args.gltfDir,
+        args.textureDir,
+        args.outputDir,
+        args.mapName,
+        args.threshold,
+        json.loads(args.lod_levels),
+        meshFormat = args.format,
+        quantize = args.quantize,
+        deduplicate = not args.no_dedupe,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,487 @@
+import argparse
+import json
+import os
+import shutil
+import struct
+import numpy as np
+from geometry import axisConversion, componentTypes, typeSizes
+
+glbMagic = b"glTF"
+jsonChunkType = 0x4E4F534A
+binChunkType = 0x004E4942
+arrayKeys = ("scenes", "nodes", "meshes", "materials", "textures", "images", "samplers", "accessors", "bufferViews", "cameras")
+# Inversa de geometry.axisConversion: vuelve del Z-up de Collada al Y-up de glTF
+zUpToYUp = axisConversion.T
+
+
+def _padding(length, alignment = 4):
+    return -length % alignment
+
+
+class GlbWriter:
+    """Escribe un glTF binario (.glb) en streaming con la misma interfaz que geometry.ColladaWriter.
+
+    Los datos binarios se escriben en un archivo temporal a medida que llegan las
+    geometrías y al final se compone el .glb con la cabecera, el JSON y el
+    buffer. Las texturas se referencian por nombre de archivo, igual que en el
+    Collada, para que los niveles de detalle las compartan. Como el resultado no
+    contiene el cubo, la cámara ni la luz iniciales, no necesita limpieza posterior.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.binPath = f"{path}.bin"
+        self.bin = open(self.binPath, "wb")
+        self.length = 0
+        self.gltf = {
+            "asset": {"version": "2.0", "generator": "Scenario-Generation geometry.py"},
+            "scene": 0,
+            "scenes": [{"name": "Scene", "nodes": []}],
+            "nodes": [],
+            "meshes": [],
+            "materials": [],
+            "textures": [],
+            "images": [],
+            "samplers": [{"magFilter": 9729, "minFilter": 9987, "wrapS": 10497, "wrapT": 10497}],
+            "accessors": [],
+            "bufferViews": [],
+        }
+        self.materialIndices = {}
+        self.meshIndices = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        """Cierra y elimina el buffer temporal."""
+        if not self.bin.closed:
+            self.bin.close()
+        if os.path.exists(self.binPath):
+            os.remove(self.binPath)
+
+    def _appendView(self, data, target = None, stride = None):
+        data = np.ascontiguousarray(data).tobytes()
+        self.bin.write(b"\0" * _padding(self.length))
+        self.length += _padding(self.length)
+        view = {"buffer": 0, "byteOffset": self.length, "byteLength": len(data)}
+        if target is not None:
+            view["target"] = target
+        if stride is not None:
+            view["byteStride"] = stride
+        self.bin.write(data)
+        self.length += len(data)
+        self.gltf["bufferViews"].append(view)
+        return len(self.gltf["bufferViews"]) - 1
+
+    def _appendAccessor(self, values, accessorType, target = None, withBounds = False):
+        componentType = next(code for code, dtype in componentTypes.items() if dtype == values.dtype)
+        accessor = {
+            "bufferView": self._appendView(values, target),
+            "componentType": componentType,
+            "count": len(values),
+            "type": accessorType,
+        }
+        if withBounds:
+            accessor["min"] = values.min(axis = 0).tolist()
+            accessor["max"] = values.max(axis = 0).tolist()
+        self.gltf["accessors"].append(accessor)
+        return len(self.gltf["accessors"]) - 1
+
+    def begin(self):
+        pass
+
+    def beginGeometries(self):
+        pass
+
+    def endGeometries(self):
+        pass
+
+    def writeMaterials(self, materials, images):
+        """Añade los materiales y las imágenes, que se referencian como archivos externos.
+
+        Args:
+            materials (list[dict]): Materiales con "id", "name", "image" (id o None) y "color".
+            images (list[tuple]): Id y nombre de archivo de cada imagen.
+        """
+        textureIndices = {}
+        for imageId, fileName in images:
+            self.gltf["images"].append({"name": imageId, "uri": fileName})
+            self.gltf["textures"].append({"source": len(self.gltf["images"]) - 1, "sampler": 0})
+            textureIndices[imageId] = len(self.gltf["textures"]) - 1
+        for material in materials:
+            pbr = {"metallicFactor": 0.0, "roughnessFactor": 1.0}
+            if material["image"] is not None:
+                pbr["baseColorTexture"] = {"index": textureIndices[material["image"]]}
+            else:
+                pbr["baseColorFactor"] = list(material["color"])
+            self.gltf["materials"].append({"name": material["name"], "pbrMetallicRoughness": pbr})
+            self.materialIndices[material["id"]] = len(self.gltf["materials"]) - 1
+
+    def writeGeometry(self, geometryId, name, mesh, materialIds):
+        """Añade una malla con un vértice por cada combinación distinta de posición y UV.
+
+        Args:
+            geometryId (str): Id base de la geometría.
+            name (str): Nombre de la malla.
+            mesh (dict): Resultado de processMesh.
+            materialIds (dict): Índice de material glTF -> id del material.
+        """
+        groups = [group for group in mesh["groups"] if len(group[1])]
+        if not groups:
+            self.meshIndices[geometryId] = None
+            return
+
+        uvCount = max(1, len(mesh["uvs"]))
+        corners = np.concatenate([np.stack([triangles, uvIndices], axis = 2).reshape(-1, 2) for _, triangles, uvIndices in groups])
+        unique, inverse = np.unique(corners[:, 0].astype(np.int64) * uvCount + corners[:, 1], return_inverse = True)
+        inverse = inverse.reshape(-1)
+        positions = mesh["positions"][unique // uvCount].astype(np.float32)
+        normals = mesh["normals"][unique // uvCount].astype(np.float32)
+        uvs = mesh["uvs"][unique % uvCount].astype(np.float32)
+        # processMesh invierte la V para Collada; glTF tiene el origen de las UV arriba
+        uvs[:, 1] = 1.0 - uvs[:, 1]
+
+        attributes = {
+            "POSITION": self._appendAccessor(positions, "VEC3", 34962, withBounds = True),
+            "NORMAL": self._appendAccessor(normals, "VEC3", 34962),
+            "TEXCOORD_0": self._appendAccessor(uvs, "VEC2", 34962),
+        }
+        indexType = np.uint16 if len(positions) < 65536 else np.uint32
+        primitives = []
+        start = 0
+        for material, triangles, _ in groups:
+            count = triangles.size
+            primitive = {"attributes": attributes, "indices": self._appendAccessor(inverse[start : start + count].astype(indexType), "SCALAR", 34963), "mode": 4}
+            start += count
+            if material in materialIds:
+                primitive["material"] = self.materialIndices[materialIds[material]]
+            primitives.append(primitive)
+        self.gltf["meshes"].append({"name": name, "primitives": primitives})
+        self.meshIndices[geometryId] = len(self.gltf["meshes"]) - 1
+
+    def writeScene(self, nodes):
+        """Añade un nodo por instancia de malla y compone el archivo .glb.
+
+        Args:
+            nodes (list[tuple]): Id del nodo, nombre, id de la geometría, matriz 4x4 en Z-up e ids de sus materiales.
+        """
+        for _, name, geometryId, matrix, _ in nodes:
+            meshIndex = self.meshIndices.get(geometryId)
+            if meshIndex is None:
+                continue
+            node = {"name": name, "mesh": meshIndex}
+            matrix = zUpToYUp @ matrix
+            if not np.allclose(matrix, np.eye(4)):
+                node["matrix"] = matrix.T.reshape(-1).tolist()
+            self.gltf["nodes"].append(node)
+            self.gltf["scenes"][0]["nodes"].append(len(self.gltf["nodes"]) - 1)
+
+        self.bin.write(b"\0" * _padding(self.length))
+        self.length += _padding(self.length)
+        self.bin.close()
+        if self.length:
+            self.gltf["buffers"] = [{"byteLength": self.length}]
+        gltf = {key: value for key, value in self.gltf.items() if value != []}
+        with open(self.path, "wb") as out:
+            _writeHeader(out, gltf, self.length)
+            with open(self.binPath, "rb") as binFile:
+                shutil.copyfileobj(binFile, out)
+
+
+def _jsonBytes(gltf):
+    data = json.dumps(gltf, separators = (",", ":")).encode("utf-8")
+    return data + b" " * _padding(len(data))
+
+
+def _writeHeader(out, gltf, binLength):
+    """Escribe la cabecera del .glb, el bloque JSON y la cabecera del bloque binario."""
+    data = _jsonBytes(gltf)
+    total = 12 + 8 + len(data) + (8 + binLength if binLength else 0)
+    out.write(glbMagic + struct.pack("<II", 2, total))
+    out.write(struct.pack("<II", len(data), jsonChunkType) + data)
+    if binLength:
+        out.write(struct.pack("<II", binLength, binChunkType))
+
+
+def readGlb(path):
+    """Lee un archivo .glb.
+
+    Returns:
+        tuple: Documento glTF y contenido del bloque binario.
+
+    Raises:
+        ValueError: Si el archivo no es un glTF binario.
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+    if data[:4] != glbMagic:
+        raise ValueError(f"No es un archivo glb: {path}")
+    jsonLength, _ = struct.unpack_from("<II", data, 12)
+    gltf = json.loads(data[20 : 20 + jsonLength])
+    binary = b""
+    offset = 20 + jsonLength
+    if offset + 8 <= len(data):
+        binLength, chunkType = struct.unpack_from("<II", data, offset)
+        if chunkType == binChunkType:
+            binary = data[offset + 8 : offset + 8 + binLength]
+    return gltf, binary
+
+
+def writeGlb(path, gltf, binary):
+    """Escribe un archivo .glb de forma atómica."""
+    binary = bytes(binary) + b"\0" * _padding(len(binary))
+    if binary:
+        gltf["buffers"] = [{"byteLength": len(binary)}]
+    tempPath = f"{path}.tmp"
+    with open(tempPath, "wb") as out:
+        _writeHeader(out, gltf, len(binary))
+        out.write(binary)
+    os.replace(tempPath, path)
+
+
+def accessorArray(gltf, binary, accessorIndex):
+    """Lee un accessor como array (count, componentes) con su tipo original.
+
+    Args:
+        gltf (dict): Documento glTF.
+        binary (bytes): Bloque binario del .glb.
+        accessorIndex (int): Índice del accessor.
+
+    Returns:
+        np.ndarray: Valores del accessor.
+    """
+    accessor = gltf["accessors"][accessorIndex]
+    dtype = np.dtype(componentTypes[accessor["componentType"]])
+    components = typeSizes[accessor["type"]]
+    count = accessor["count"]
+    if "bufferView" not in accessor:
+        return np.zeros((count, components), dtype = dtype)
+    view = gltf["bufferViews"][accessor["bufferView"]]
+    offset = view.get("byteOffset", 0) + accessor.get("byteOffset", 0)
+    stride = view.get("byteStride", dtype.itemsize * components)
+    if stride == dtype.itemsize * components:
+        return np.frombuffer(binary, dtype = dtype, count = count * components, offset = offset).reshape(count, components)
+    rows = np.frombuffer(binary, dtype = np.uint8, count = stride * (count - 1) + dtype.itemsize * components, offset = offset)
+    return np.lib.stride_tricks.as_strided(rows, shape = (count, dtype.itemsize * components), strides = (stride, 1)).copy().view(dtype)
+
+
+class _BufferBuilder:
+    """Construye un bloque binario nuevo con vistas alineadas a 4 bytes."""
+
+    def __init__(self):
+        self.data = bytearray()
+        self.views = []
+
+    def append(self, data, target = None, stride = None):
+        self.data += b"\0" * _padding(len(self.data))
+        view = {"buffer": 0, "byteOffset": len(self.data), "byteLength": len(data)}
+        if target is not None:
+            view["target"] = target
+        if stride is not None:
+            view["byteStride"] = stride
+        self.data += data
+        self.views.append(view)
+        return len(self.views) - 1
+
+
+def quantizeGlb(gltf, binary):
+    """Cuantiza las posiciones, normales y UV de las mallas con KHR_mesh_quantization.
+
+    Las posiciones pasan a enteros de 16 bits normalizados respecto a la caja de
+    cada malla, cuya escala y desplazamiento se aplican en un nodo hijo; las
+    normales pasan a 8 bits y las UV dentro de [0, 1] a 16 bits. El resto de datos
+    se copia sin cambios.
+
+    Args:
+        gltf (dict): Documento glTF (se modifica).
+        binary (bytes): Bloque binario.
+
+    Returns:
+        tuple: Documento y bloque binario cuantizados.
+    """
+    accessors = gltf.get("accessors", [])
+    builder = _BufferBuilder()
+    replaced = {}
+    meshTransforms = {}
+
+    for meshIndex, mesh in enumerate(gltf.get("meshes", [])):
+        positionAccessors = {primitive["attributes"]["POSITION"] for primitive in mesh["primitives"] if "POSITION" in primitive["attributes"]}
+        if not positionAccessors or any(accessors[index]["componentType"] != 5126 for index in positionAccessors):
+            continue
+        positions = {index: accessorArray(gltf, binary, index).astype(np.float64) for index in positionAccessors}
+        low = np.min([values.min(axis = 0) for values in positions.values()], axis = 0)
+        high = np.max([values.max(axis = 0) for values in positions.values()], axis = 0)
+        # Escala uniforme para que las normales no se deformen al descuantizar
+        scale = float((high - low).max()) or 1.0
+        meshTransforms[meshIndex] = (low, scale)
+        for index, values in positions.items():
+            if index in replaced:
+                continue
+            quantized = np.zeros((len(values), 4), dtype = np.uint16)
+            quantized[:, :3] = np.round((values - low) / scale * 65535.0)
+            replaced[index] = {
+                "bufferView": builder.append(quantized.tobytes(), 34962, 8),
+                "componentType": 5123,
+                "normalized": True,
+                "count": len(values),
+                "type": "VEC3",
+                "min": quantized[:, :3].min(axis = 0).tolist(),
+                "max": quantized[:, :3].max(axis = 0).tolist(),
+            }
+
+        for primitive in mesh["primitives"]:
+            normalIndex = primitive["attributes"].get("NORMAL")
+            if normalIndex is not None and normalIndex not in replaced and accessors[normalIndex]["componentType"] == 5126:
+                normals = accessorArray(gltf, binary, normalIndex)
+                quantized = np.zeros((len(normals), 4), dtype = np.int8)
+                quantized[:, :3] = np.round(np.clip(normals, -1.0, 1.0) * 127.0)
+                replaced[normalIndex] = {"bufferView": builder.append(quantized.tobytes(), 34962, 4), "componentType": 5120, "normalized": True, "count": len(normals), "type": "VEC3"}
+            uvIndex = primitive["attributes"].get("TEXCOORD_0")
+            if uvIndex is not None and uvIndex not in replaced and accessors[uvIndex]["componentType"] == 5126:
+                uvs = accessorArray(gltf, binary, uvIndex)
+                if len(uvs) and uvs.min() >= 0.0 and uvs.max() <= 1.0:
+                    quantized = np.round(uvs * 65535.0).astype(np.uint16)
+                    replaced[uvIndex] = {"bufferView": builder.append(quantized.tobytes(), 34962), "componentType": 5123, "normalized": True, "count": len(uvs), "type": "VEC2"}
+
+    if not meshTransforms:
+        return gltf, binary
+
+    # Las vistas que no se cuantizan (índices, imágenes embebidas, ...) se copian tal cual
+    views = gltf.get("bufferViews", [])
+    copiedViews = {}
+
+    def copyView(viewIndex):
+        if viewIndex not in copiedViews:
+            view = views[viewIndex]
+            start = view.get("byteOffset", 0)
+            copiedViews[viewIndex] = builder.append(bytes(binary[start : start + view["byteLength"]]), view.get("target"), view.get("byteStride"))
+        return copiedViews[viewIndex]
+
+    for index, accessor in enumerate(accessors):
+        if index in replaced:
+            accessors[index] = replaced[index]
+        elif "bufferView" in accessor:
+            accessor["bufferView"] = copyView(accessor["bufferView"])
+    for image in gltf.get("images", []):
+        if "bufferView" in image:
+            image["bufferView"] = copyView(image["bufferView"])
+    gltf["bufferViews"] = builder.views
+
+    # La descuantización de cada malla se aplica en un nodo hijo
+    nodes = gltf.setdefault("nodes", [])
+    for node in list(nodes):
+        meshIndex = node.get("mesh")
+        if meshIndex not in meshTransforms or "skin" in node:
+            continue
+        low, scale = meshTransforms[meshIndex]
+        nodes.append({"mesh": node.pop("mesh"), "translation": low.tolist(), "scale": [scale, scale, scale]})
+        node.setdefault("children", []).append(len(nodes) - 1)
+
+    for key in ("extensionsUsed", "extensionsRequired"):
+        extensions = gltf.setdefault(key, [])
+        if "KHR_mesh_quantization" not in extensions:
+            extensions.append("KHR_mesh_quantization")
+    return gltf, builder.data
+
+
+def quantizeGlbFile(path):
+    """Cuantiza un archivo .glb en el sitio.
+
+    Returns:
+        tuple: Tamaño en bytes antes y después.
+    """
+    before = os.path.getsize(path)
+    gltf, binary = readGlb(path)
+    gltf, binary = quantizeGlb(gltf, binary)
+    writeGlb(path, gltf, binary)
+    return before, os.path.getsize(path)
+
+
+def _offsetTextureInfos(material, textureOffset):
+    for container in (material, material.get("pbrMetallicRoughness", {})):
+        for key, value in container.items():
+            if key.endswith("Texture") and isinstance(value, dict) and "index" in value:
+                value["index"] += textureOffset
+
+
+def mergeGlbFiles(paths, outputPath):
+    """Combina varios .glb parciales en uno, como collada.mergeColladaFiles con los Collada.
+
+    Args:
+        paths (list[str]): Archivos parciales.
+        outputPath (str): Archivo combinado.
+    """
+    merged = {"asset": {"version": "2.0", "generator": "Scenario-Generation glb.py"}, "scene": 0, "scenes": [{"name": "Scene", "nodes": []}]}
+    binary = bytearray()
+    for path in paths:
+        gltf, data = readGlb(path)
+        offsets = {key: len(merged.get(key, [])) for key in arrayKeys}
+        binary += b"\0" * _padding(len(binary))
+        for view in gltf.get("bufferViews", []):
+            view["buffer"] = 0
+            view["byteOffset"] = view.get("byteOffset", 0) + len(binary)
+        for accessor in gltf.get("accessors", []):
+            if "bufferView" in accessor:
+                accessor["bufferView"] += offsets["bufferViews"]
+        for image in gltf.get("images", []):
+            if "bufferView" in image:
+                image["bufferView"] += offsets["bufferViews"]
+        for texture in gltf.get("textures", []):
+            if "source" in texture:
+                texture["source"] += offsets["images"]
+            if "sampler" in texture:
+                texture["sampler"] += offsets["samplers"]
+        for material in gltf.get("materials", []):
+            _offsetTextureInfos(material, offsets["textures"])
+        for mesh in gltf.get("meshes", []):
+            for primitive in mesh["primitives"]:
+                primitive["attributes"] = {name: index + offsets["accessors"] for name, index in primitive["attributes"].items()}
+                primitive["targets"] = [{name: index + offsets["accessors"] for name, index in target.items()} for target in primitive.get("targets", [])] or None
+                if primitive["targets"] is None:
+                    del primitive["targets"]
+                if "indices" in primitive:
+                    primitive["indices"] += offsets["accessors"]
+                if "material" in primitive:
+                    primitive["material"] += offsets["materials"]
+        for node in gltf.get("nodes", []):
+            if "mesh" in node:
+                node["mesh"] += offsets["meshes"]
+            if "camera" in node:
+                node["camera"] += offsets["cameras"]
+            if "children" in node:
+                node["children"] = [child + offsets["nodes"] for child in node["children"]]
+        scenes = gltf.get("scenes", [])
+        if scenes:
+            merged["scenes"][0]["nodes"].extend(index + offsets["nodes"] for index in scenes[gltf.get("scene", 0)].get("nodes", []))
+
+        for key in arrayKeys[1:]:
+            if gltf.get(key):
+                merged.setdefault(key, []).extend(gltf[key])
+        for key in ("extensionsUsed", "extensionsRequired"):
+            for extension in gltf.get(key, []):
+                if extension not in merged.setdefault(key, []):
+                    merged[key].append(extension)
+        binary += data
+    writeGlb(outputPath, merged, binary)
+
+
+def main():
+    """Cuantiza o combina archivos .glb ya exportados."""
+    parser = argparse.ArgumentParser(description = "Utilidades para archivos glb")
+    parser.add_argument("glbPaths", nargs = "+")
+    parser.add_argument("--merge", help = "Combinar los archivos en este .glb")
+    args = parser.parse_args()
+    if args.merge:
+        mergeGlbFiles(args.glbPaths, args.merge)
+        print(f"Combinados {len(args.glbPaths)} archivos en {args.merge}")
+        return
+    for path in args.glbPaths:
+        before, after = quantizeGlbFile(path)
+        print(f"{path}: {before / 1024:.1f} KB -> {after / 1024:.1f} KB")
+
+
+if __name__ == "__main__":
+    main()
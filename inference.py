@@ -0,0 +1,232 @@
+import copy
+import os
+import sys
+import torch
+from torch import nn
+
+parityTolerance = {None: 1e-3, "bf16": 5e-2, "int8": 5e-2}
+
+
+class OnnxModule(nn.Module):
+    """Envuelve una sesión de ONNX Runtime con la interfaz de un módulo de torch."""
+
+    def __init__(self, session):
+        super().__init__()
+        self.session = session
+        self.inputName = session.get_inputs()[0].name
+
+    def forward(self, x):
+        output = self.session.run(None, {self.inputName: x.detach().float().cpu().numpy()})[0]
+        return torch.from_numpy(output).to(device = x.device, dtype = x.dtype)
+
+
+class OptimizedModule(nn.Module):
+    """Ejecuta el modelo en inference_mode, con formato channels-last y bf16 opcional.
+
+    Trabaja sobre una copia del modelo, de modo que el modelo eager con el que se
+    compara la paridad no cambia.
+    """
+
+    def __init__(self, model, channelsLast = True, bf16 = False):
+        super().__init__()
+        self.channelsLast = channelsLast
+        self.bf16 = bf16
+        model = copy.deepcopy(model)
+        self.model = model.to(memory_format = torch.channels_last) if channelsLast else model
+
+    def forward(self, x):
+        with torch.inference_mode():
+            if self.channelsLast:
+                x = x.contiguous(memory_format = torch.channels_last)
+            if self.bf16:
+                with torch.autocast("cpu", dtype = torch.bfloat16):
+                    output = self.model(x)
+                output = output.to(x.dtype)
+            else:
+                output = self.model(x)
+        # Los tensores de inference_mode no admiten operaciones in-place fuera de él
+        return output.contiguous().clone()
+
+
+def onnxPath(modelPath, quantization = None):
+    """Obtiene la ruta del modelo ONNX exportado junto al archivo .pth.
+
+    Args:
+        modelPath (str): Ruta al archivo .pth del modelo.
+        quantization (str, optional): "int8" para el modelo cuantizado.
+
+    Returns:
+        str: Ruta del archivo .onnx.
+    """
+    base = os.path.splitext(modelPath)[0]
+    if quantization == "int8":
+        return f"{base}.int8.onnx"
+    return f"{base}.onnx"
+
+
+def _isFresh(exportPath, modelPath):
+    return os.path.exists(exportPath) and os.path.getmtime(exportPath) >= os.path.getmtime(modelPath)
+
+
+def needsExport(modelPath, backendOptions):
+    """Indica si el backend configurado necesita exportar el modelo a ONNX antes de usarse.
+
+    Args:
+        modelPath (str): Ruta al archivo .pth del modelo.
+        backendOptions (dict): Opciones "backend" y "quantization".
+
+    Returns:
+        bool: True si falta la exportación o está desactualizada.
+    """
+    if backendOptions.get("backend") not in ("onnx", "auto"):
+        return False
+    try:
+        import onnxruntime  # noqa: F401
+    except ImportError:
+        return False
+    exportPath = onnxPath(modelPath)
+    if not _isFresh(exportPath, modelPath):
+        return True
+    return backendOptions.get("quantization") == "int8" and not _isFresh(onnxPath(modelPath, "int8"), exportPath)
+
+
+def exportOnnx(model, modelPath, quantization = None):
+    """Exporta el modelo a ONNX una sola vez y reutiliza la exportación mientras el .pth no cambie.
+
+    Args:
+        model (nn.Module): Modelo RRDBNet con los pesos cargados.
+        modelPath (str): Ruta al archivo .pth del modelo.
+        quantization (str, optional): "int8" para cuantizar dinámicamente los pesos.
+
+    Returns:
+        str: Ruta del archivo .onnx listo para usar.
+    """
+    exportPath = onnxPath(modelPath)
+    if not _isFresh(exportPath, modelPath):
+        print(f"Exportando modelo a ONNX: {exportPath}")
+        tempPath = f"{exportPath}.{os.getpid()}.tmp"
+        # Copia para no cambiar el tipo, el dispositivo ni el modo del modelo de quien llama
+        model = copy.deepcopy(model).float().cpu().eval()
+        with torch.no_grad():
+            torch.onnx.export(
+                model,
+                torch.rand(1, 3, 64, 64),
+                tempPath,
+                input_names = ["input"],
+                output_names = ["output"],
+                dynamic_axes = {
+                    "input": {0: "batch", 2: "height", 3: "width"},
+                    "output": {0: "batch", 2: "height", 3: "width"},
+                },
+                opset_version = 13,
+            )
+        os.replace(tempPath, exportPath)
+
+    if quantization != "int8":
+        return exportPath
+
+    quantizedPath = onnxPath(modelPath, "int8")
+    if not _isFresh(quantizedPath, exportPath):
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        print(f"Cuantizando modelo ONNX a int8: {quantizedPath}")
+        tempPath = f"{quantizedPath}.{os.getpid()}.tmp"
+        quantize_dynamic(exportPath, tempPath, weight_type = QuantType.QUInt8)
+        os.replace(tempPath, quantizedPath)
+    return quantizedPath
+
+
+def maxDifference(reference, candidate, size = 32):
+    """Compara la salida de dos modelos sobre una entrada aleatoria.
+
+    Args:
+        reference (nn.Module): Modelo de referencia (torch en fp32).
+        candidate (nn.Module): Modelo optimizado.
+        size (int): Lado de la imagen de prueba en píxeles.
+
+    Returns:
+        float: Diferencia absoluta máxima entre ambas salidas.
+    """
+    generator = torch.Generator().manual_seed(0)
+    sample = torch.rand(1, 3, size, size, generator = generator)
+    with torch.no_grad():
+        expected = reference(sample).float()
+    actual = candidate(sample).float()
+    return (expected - actual).abs().max().item()
+
+
+def _buildCandidate(model, modelPath, backend, quantization, channelsLast):
+    """Construye el módulo del backend pedido, usando torch si ONNX Runtime no está instalado."""
+    if backend in ("onnx", "auto"):
+        try:
+            import onnxruntime
+        except ImportError:
+            if backend == "onnx":
+                print("ONNX Runtime no está instalado, utilizando torch")
+        else:
+            options = onnxruntime.SessionOptions()
+            options.intra_op_num_threads = torch.get_num_threads()
+            options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+            session = onnxruntime.InferenceSession(
+                exportOnnx(model, modelPath, quantization),
+                sess_options = options,
+                providers = ["CPUExecutionProvider"],
+            )
+            return OnnxModule(session), f"onnx{'-int8' if quantization == 'int8' else ''}"
+
+    if quantization == "int8":
+        print("La cuantización int8 solo está disponible con ONNX Runtime, se ignora")
+    bf16 = quantization == "bf16"
+    return OptimizedModule(model, channelsLast, bf16), f"torch{'-bf16' if bf16 else ''}"
+
+
+def optimizeModel(model, modelPath, device, backendOptions):
+    """Sustituye el modelo eager por el backend de inferencia configurado para CPU.
+
+    Antes de usarlo se comprueba que su salida coincide con la del modelo
+    original; si no, se mantiene el modelo eager.
+
+    Args:
+        model (nn.Module): Modelo RRDBNet con los pesos cargados.
+        modelPath (str): Ruta al archivo .pth del modelo.
+        device (str): Dispositivo de inferencia ("cuda" o "cpu").
+        backendOptions (dict): Opciones "backend", "quantization" y "channelsLast".
+
+    Returns:
+        nn.Module: Modelo a utilizar para la inferencia.
+    """
+    backend = backendOptions.get("backend", "torch")
+    if str(device) != "cpu" or backend == "eager":
+        return model
+
+    quantization = backendOptions.get("quantization")
+    try:
+        candidate, name = _buildCandidate(model, modelPath, backend, quantization, backendOptions.get("channelsLast", True))
+        difference = maxDifference(model, candidate)
+    except Exception as e:
+        print(f"Error preparando el backend de inferencia, utilizando torch: {str(e)}")
+        return model
+
+    tolerance = parityTolerance.get(quantization, parityTolerance[None])
+    if difference > tolerance:
+        print(f"Backend {name} descartado: diferencia {difference:.2e} supera {tolerance:.0e}")
+        return model
+    print(f"Backend de inferencia: {name} (diferencia máxima {difference:.2e})")
+    return candidate
+
+
+if __name__ == "__main__":
+    """Comprueba la paridad de todos los backends frente al modelo eager: python inference.py <modelo.pth> <factor>"""
+    from basicsr.archs.rrdbnet_arch import RRDBNet
+
+    modelPath, upscaleFactor = sys.argv[1], int(sys.argv[2])
+    model = RRDBNet(num_in_ch = 3, num_out_ch = 3, num_feat = 64, num_block = 23, num_grow_ch = 32, scale = upscaleFactor)
+    model.load_state_dict(torch.load(modelPath, map_location = "cpu")["params_ema"], strict = True)
+    model.eval()
+
+    for backend, quantization in (("torch", None), ("torch", "bf16"), ("onnx", None), ("onnx", "int8")):
+        candidate, name = _buildCandidate(model, modelPath, backend, quantization, True)
+        difference = maxDifference(model, candidate, size = 64)
+        tolerance = parityTolerance.get(quantization, parityTolerance[None])
+        status = "OK" if difference <= tolerance else "FALLO"
+        print(f"{name}: diferencia máxima {difference:.2e} (tolerancia {tolerance:.0e}) {status}")
@@ -0,0 +1,169 @@
+import json
+import os
+import threading
+from build import digestOf, fileStamp
+
+journalName = ".upscale_journal.jsonl"
+
+
+def journalPath(textureDir):
+    """Obtiene la ruta del diario de upscaling de un directorio de texturas."""
+    return os.path.join(textureDir, journalName)
+
+
+def settingsFingerprint(textureConfig, triageConfig):
+    """Huella de la configuración de upscaling que debe coincidir para reanudar un trabajo."""
+    return digestOf(
+        triageConfig,
+        textureConfig["upscaleFactor"],
+        textureConfig["modelFile"],
+        textureConfig["tileSize"],
+        textureConfig["halfPrecision"],
+        textureConfig["quantization"],
+    )
+
+
+def removeTempFiles(textureDir):
+    """Elimina las texturas temporales que dejó a medio escribir una ejecución interrumpida.
+
+    Returns:
+        int: Número de archivos eliminados.
+    """
+    removed = 0
+    for f in os.listdir(textureDir):
+        if f.lower().endswith(".png.tmp"):
+            try:
+                os.remove(os.path.join(textureDir, f))
+                removed += 1
+            except OSError:
+                pass
+    return removed
+
+
+class UpscaleJournal:
+    """Diario de escritura anticipada de las texturas escaladas en un directorio.
+
+    Al empezar se registra el tamaño y la fecha de cada textura original y, cada
+    vez que una textura escalada sustituye a la original (con un renombrado
+    atómico), se añade una línea con su nuevo sello. Si el proceso se interrumpe,
+    el diario permite distinguir las texturas ya escaladas de las originales y
+    continuar solo con las pendientes, en cualquier orden de finalización.
+    """
+
+    def __init__(self, textureDir):
+        self.textureDir = textureDir
+        self.path = journalPath(textureDir)
+        self.lock = threading.Lock()
+        self.file = None
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def _append(self, record):
+        line = json.dumps(record, ensure_ascii = False) + "\n"
+        with self.lock:
+            self.file.write(line)
+            self.file.flush()
+            os.fsync(self.file.fileno())
+
+    def _read(self):
+        """Lee los registros del diario descartando una última línea incompleta."""
+        records = []
+        with open(self.path, "r", encoding = "utf-8") as f:
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    break
+        return records
+
+    def begin(self, imageFiles, settings):
+        """Inicia un diario nuevo con el estado original de las texturas.
+
+        Args:
+            imageFiles (list[str]): Nombres de las texturas a escalar.
+            settings (str): Huella de la configuración (ver settingsFingerprint).
+        """
+        inputs = {fileName: fileStamp(os.path.join(self.textureDir, fileName)) for fileName in imageFiles}
+        tempPath = f"{self.path}.tmp"
+        with open(tempPath, "w", encoding = "utf-8") as f:
+            f.write(json.dumps({"event": "begin", "settings": settings, "inputs": inputs}, ensure_ascii = False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tempPath, self.path)
+        self.file = open(self.path, "a", encoding = "utf-8")
+
+    def resume(self, imageFiles, settings):
+        """Continúa un diario existente y devuelve las texturas que faltan por escalar.
+
+        Una textura cuenta como terminada si su sello coincide con el registrado al
+        completarla, o si ya no coincide con el original aunque no llegara a
+        registrarse (el renombrado se completó pero el proceso murió antes de
+        escribir en el diario).
+
+        Args:
+            imageFiles (list[str]): Texturas del directorio.
+            settings (str): Huella de la configuración actual.
+
+        Returns:
+            list[str]: Texturas pendientes.
+
+        Raises:
+            ValueError: Si el diario se creó con otra configuración de upscaling.
+        """
+        records = self._read()
+        if not records or records[0].get("event") != "begin":
+            raise ValueError(f"Diario de upscaling no válido: {self.path}")
+        header = records[0]
+        if header["settings"] != settings:
+            raise ValueError("El upscaling interrumpido usaba otra configuración; no se puede reanudar")
+
+        done = {}
+        for record in records[1:]:
+            if record.get("event") == "done":
+                done[record["file"]] = record["stamp"]
+
+        inputs = header["inputs"]
+        pending = []
+        recovered = 0
+        for fileName in imageFiles:
+            stamp = fileStamp(os.path.join(self.textureDir, fileName))
+            if fileName in done and done[fileName] == stamp:
+                continue
+            if fileName in inputs and fileName not in done and inputs[fileName] != stamp:
+                done[fileName] = stamp
+                recovered += 1
+                continue
+            pending.append(fileName)
+
+        # Se reescribe el diario compacto para que las texturas nuevas queden registradas como originales
+        for fileName in pending:
+            inputs[fileName] = fileStamp(os.path.join(self.textureDir, fileName))
+        tempPath = f"{self.path}.tmp"
+        with open(tempPath, "w", encoding = "utf-8") as f:
+            f.write(json.dumps({"event": "begin", "settings": settings, "inputs": inputs}, ensure_ascii = False) + "\n")
+            for fileName, stamp in done.items():
+                f.write(json.dumps({"event": "done", "file": fileName, "stamp": stamp}, ensure_ascii = False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tempPath, self.path)
+        self.file = open(self.path, "a", encoding = "utf-8")
+
+        print(f"Reanudando upscaling: {len(imageFiles) - len(pending)} texturas ya escaladas ({recovered} recuperadas sin registro), {len(pending)} pendientes")
+        return pending
+
+    def complete(self, fileName):
+        """Registra una textura cuya versión escalada ya sustituyó a la original."""
+        self._append({"event": "done", "file": fileName, "stamp": fileStamp(os.path.join(self.textureDir, fileName))})
+
+    def close(self, finished):
+        """Cierra el diario y lo elimina si todas las texturas se escalaron.
+
+        Args:
+            finished (bool): True si no queda ninguna textura pendiente.
+        """
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+        if finished and self.exists():
+            os.remove(self.path)
@@ -0,0 +1,240 @@
+import os
+import secrets
+import sys
+import tempfile
+import threading
+from multiprocessing.connection import Client, Listener
+from settings import getConfig, upscalingOptions
+
+keyFileName = "server.key"
+
+
+def _address(config):
+    return (config["server"]["host"], config["server"]["port"])
+
+
+def _authKey(config):
+    """Obtiene la clave compartida entre el servicio y sus clientes.
+
+    multiprocessing.connection deserializa lo que envía un cliente autenticado, así
+    que la clave no puede ser un valor conocido. Si no se configura, se genera una
+    aleatoria la primera vez y se guarda en la caché con permisos solo para el
+    usuario.
+    """
+    if config["server"]["authKey"]:
+        return config["server"]["authKey"].encode()
+
+    keyPath = os.path.join(config["paths"]["cacheDir"], keyFileName)
+    if not os.path.exists(keyPath):
+        os.makedirs(os.path.dirname(keyPath), exist_ok = True)
+        # La clave se escribe completa en un temporal (creado con permisos 0600) y se enlaza
+        # en su sitio, así que un proceso que arranque a la vez nunca lee un archivo vacío
+        handle, tempPath = tempfile.mkstemp(prefix = f"{keyFileName}.", suffix = ".tmp", dir = os.path.dirname(keyPath))
+        try:
+            with os.fdopen(handle, "w", encoding = "utf-8") as f:
+                f.write(secrets.token_hex(32))
+            os.link(tempPath, keyPath)
+        except FileExistsError:
+            pass
+        finally:
+            os.remove(tempPath)
+    with open(keyPath, "r", encoding = "utf-8") as f:
+        return f.read().strip().encode()
+
+
+def requestUpscale(config, modelPath, textureDir, imageFiles, progress = None, onComplete = None):
+    """Envía un trabajo de upscaling al servicio persistente si está en ejecución.
+
+    Args:
+        config (dict): Configuración completa.
+        modelPath (str): Ruta al archivo .pth del modelo.
+        textureDir (str): Directorio de las texturas.
+        imageFiles (list[str]): Nombres de archivo a procesar.
+        progress (tqdm, optional): Barra de progreso a actualizar.
+        onComplete (callable, optional): Función llamada con el nombre de cada textura guardada.
+
+    Returns:
+        list[str]: Texturas que el servicio no llegó a procesar y deben escalarse localmente.
+    """
+    try:
+        connection = Client(_address(config), authkey = _authKey(config))
+    except (ConnectionRefusedError, OSError):
+        print("Servicio de upscaling no disponible, procesando localmente")
+        return list(imageFiles)
+
+    print("Upscaling mediante el servicio persistente")
+    pending = set(imageFiles)
+    with connection:
+        connection.send({
+            "action": "upscale",
+            "modelPath": os.path.abspath(modelPath),
+            "textureDir": os.path.abspath(textureDir),
+            "files": list(imageFiles),
+            "texture": config["texture"],
+        })
+
+        while True:
+            try:
+                message = connection.recv()
+            except (EOFError, OSError):
+                print("Conexión con el servicio de upscaling perdida, procesando localmente")
+                break
+
+            event = message["event"]
+            if event == "done":
+                if onComplete is not None:
+                    onComplete(message["file"])
+            elif event == "error":
+                print(f"Error procesando {message['file']}: {message['message']}")
+            elif event == "failed":
+                print(f"Error en el servicio de upscaling: {message['message']}")
+                break
+            elif event == "finished":
+                break
+
+            if event in ("done", "error"):
+                pending.discard(message["file"])
+                if progress is not None:
+                    progress.update(1)
+
+    return [fileName for fileName in imageFiles if fileName in pending]
+
+
+def _loadModel(models, modelPath, textureConfig):
+    """Obtiene un upsampler de la caché de modelos cargados, cargándolo si es necesario."""
+    import torch
+    from upscaler import backendOptionsFrom, loadUpsampler
+
+    device = ("cuda" if torch.cuda.is_available() and textureConfig["useGpu"] else "cpu")
+    backendOptions = backendOptionsFrom(textureConfig)
+    key = (modelPath, textureConfig["upscaleFactor"], device, textureConfig["tileSize"], textureConfig["halfPrecision"], tuple(sorted(backendOptions.items())))
+    if key not in models:
+        print(f"Cargando modelo {os.path.basename(modelPath)} en {device}")
+        models[key] = loadUpsampler(
+            modelPath,
+            textureConfig["upscaleFactor"],
+            device,
+            textureConfig["tileSize"],
+            textureConfig["halfPrecision"],
+            backendOptions,
+        )
+    return models[key], device
+
+
+def _handleUpscale(connection, request, models, lock):
+    """Procesa un trabajo de upscaling y notifica al cliente cada textura terminada."""
+    from upscaler import memoryBudgetFor, upscaleTextures
+
+    textureConfig = request["texture"]
+    textureDir = request["textureDir"]
+    sendLock = threading.Lock()
+
+    def send(message):
+        with sendLock:
+            connection.send(message)
+
+    done = set()
+
+    def onComplete(fileName):
+        done.add(fileName)
+        send({"event": "done", "file": fileName})
+
+    with lock:
+        try:
+            upsampler, device = _loadModel(models, request["modelPath"], textureConfig)
+            memoryBudget = memoryBudgetFor(device, textureConfig)
+        except Exception as e:
+            send({"event": "failed", "message": str(e)})
+            return
+
+        upscaleTextures(upsampler, textureDir, request["files"], textureConfig, memoryBudget, None, onComplete)
+
+    for fileName in request["files"]:
+        if fileName not in done:
+            send({"event": "error", "file": fileName, "message": "no se pudo escalar la textura"})
+    send({"event": "finished"})
+
+
+def _serveConnection(connection, models, lock, stopEvent, config):
+    """Atiende las peticiones de un cliente hasta que cierra la conexión."""
+    with connection:
+        while True:
+            try:
+                request = connection.recv()
+            except (EOFError, OSError):
+                return
+
+            action = request.get("action")
+            if action == "ping":
+                connection.send({"event": "pong", "models": [os.path.basename(key[0]) for key in models]})
+            elif action == "upscale":
+                try:
+                    _handleUpscale(connection, request, models, lock)
+                except Exception as e:
+                    print(f"Error en el trabajo de upscaling: {str(e)}")
+                    connection.send({"event": "failed", "message": str(e)})
+            elif action == "shutdown":
+                stopEvent.set()
+                connection.send({"event": "finished"})
+                Client(_address(config), authkey = _authKey(config)).close()
+                return
+
+
+def preloadModels(models, config):
+    """Carga por adelantado los modelos x2 y x4 disponibles en la carpeta de modelos.
+
+    Args:
+        models (dict): Caché de upsamplers cargados.
+        config (dict): Configuración completa.
+    """
+    for option in upscalingOptions.values():
+        if not option["modelFile"]:
+            continue
+        modelPath = os.path.abspath(os.path.join(config["paths"]["modelsDir"], option["modelFile"]))
+        if not os.path.exists(modelPath):
+            continue
+        textureConfig = dict(config["texture"], upscaleFactor = option["upscaleFactor"])
+        _loadModel(models, modelPath, textureConfig)
+
+
+def serve():
+    """Inicia el servicio de upscaling persistente y mantiene los modelos en memoria."""
+    config = getConfig()
+    models = {}
+    lock = threading.Lock()
+    stopEvent = threading.Event()
+
+    preloadModels(models, config)
+
+    listener = Listener(_address(config), authkey = _authKey(config))
+    host, port = _address(config)
+    print(f"Servicio de upscaling escuchando en {host}:{port}")
+
+    with listener:
+        while not stopEvent.is_set():
+            try:
+                connection = listener.accept()
+            except OSError:
+                continue
+            thread = threading.Thread(target = _serveConnection, args = (connection, models, lock, stopEvent, config), daemon = True)
+            thread.start()
+
+    print("Servicio de upscaling detenido")
+
+
+def stop():
+    """Detiene el servicio de upscaling si está en ejecución."""
+    config = getConfig()
+    try:
+        with Client(_address(config), authkey = _authKey(config)) as connection:
+            connection.send({"action": "shutdown"})
+            connection.recv()
+    except (ConnectionRefusedError, OSError, EOFError):
+        print("Servicio de upscaling no disponible")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "stop":
+        stop()
+    else:
+        serve()
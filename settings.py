@@ -2,6 +2,8 @@ import os
 
 upscalingMethod = "0"
 mapName = "map"
+pathOverrides = {}
+region = {"bbox": None, "prefix": None}
 projectRoot = os.path.dirname(os.path.abspath(__file__))
 
 upscalingOptions = {
@@ -50,10 +52,94 @@ def getConfig():
             "upscaleFactor": upscaleConfig["upscaleFactor"],
             "modelFile": upscaleConfig["modelFile"],
             "useGpu": True,
-            "tileSize": 0,
+            "tileSize": "auto",
+            "memoryFraction": 0.6,
+            "fallbackMemoryMb": 4096,
             "halfPrecision": False,
+            "batchSize": 1,
+            "prefetchBatches": 2,
+            "encodeWorkers": 4,
+            "backend": "auto",
+            "quantization": None,
+            "channelsLast": True,
+            "cpuWorkers": 0,
+            "threadsPerWorker": 0,
+            "cache": True,
+            "cacheMaxSizeMb": 2048,
+            "cacheLinks": False,
+            "journal": True,
             "description": upscaleConfig["description"],
         },
+        "blender": {
+            "shards": 1,
+            "fusedPasses": True,
+            "verifyPasses": False,
+        },
+        "geometry": {
+            "engine": "blender",
+            "weldThreshold": 0.001,
+            "format": "dae",
+            "quantize": False,
+        },
+        "dedupe": {
+            "enabled": True,
+        },
+        "atlas": {
+            "enabled": False,
+            "size": 4096,
+            "padding": 8,
+        },
+        "compression": {
+            "enabled": False,
+            "mipmaps": True,
+            "workers": 0,
+            "keepPng": False,
+        },
+        "lod": {
+            "enabled": False,
+            "levels": [{"ratio": 0.5}, {"ratio": 0.15}],
+            "visualLevel": 0,
+            "collisionLevel": -1,
+            "layers": False,
+        },
+        "chunks": {
+            "enabled": False,
+            "depth": 16,
+        },
+        "region": dict(region),
+        "build": {
+            "incremental": True,
+        },
+        "cleanup": {
+            "workers": 0,
+        },
+        "triage": {
+            "enabled": False,
+            "uniformStd": 2.0,
+            "lowDetailEntropy": 2.5,
+            "minAlphaCoverage": 0.01,
+            "sampleSize": 256,
+        },
+        "saves": {
+            "deduplicate": True,
+        },
+        "batch": {
+            "cpuSlots": 0,
+            "gpuSlots": 1,
+            "memoryMb": 16384,
+            "outputDir": os.path.join(projectRoot, "jobs"),
+            "textureResources": {"cpu": 1, "gpu": 1, "memoryMb": 4096},
+            "geometryResources": {"cpu": 2, "gpu": 0, "memoryMb": 4096},
+        },
+        "telemetry": {
+            "enabled": True,
+        },
+        "server": {
+            "enabled": False,
+            "host": "127.0.0.1",
+            "port": 6006,
+            "authKey": None,
+        },
         "paths": {
             "blenderExe": getBlenderPath(),
             "outputDir": os.path.join(projectRoot, "output"),
@@ -62,8 +148,11 @@ def getConfig():
             "modelsDir": os.path.join(projectRoot, "models"),
             "templatesDir": os.path.join(projectRoot, "templates"),
             "savesDir": os.path.join(projectRoot, "saves"),
+            "cacheDir": os.path.join(projectRoot, "cache"),
+            "reportsDir": os.path.join(projectRoot, "reports"),
         },
     }
+    config["paths"].update(pathOverrides)
 
     return config
 
@@ -82,6 +171,41 @@ def getUpscalingConfig():
     return upscalingOptions[upscalingMethod]
 
 
+def setUpscalingMethod(newMethod):
+    """Establece la variable global del método de upscaling.
+
+    Args:
+        newMethod (str): Clave del método en upscalingOptions ("0", "2" o "4").
+
+    Raises:
+        ValueError: Si el método de upscaling no es válido.
+    """
+    global upscalingMethod
+    if newMethod not in upscalingOptions:
+        raise ValueError(f"Error: Metodo de upscaling '{newMethod}' no válido.")
+    upscalingMethod = newMethod
+
+
+def setPaths(**paths):
+    """Sustituye rutas de la configuración, por ejemplo el directorio de salida de un trabajo.
+
+    Args:
+        **paths: Claves de la sección "paths" y sus nuevas rutas.
+    """
+    pathOverrides.update(paths)
+
+
+def setRegion(bbox = None, prefix = None):
+    """Limita el procesamiento a los tiles de una región de interés.
+
+    Args:
+        bbox (list[float], optional): Sur, oeste, norte y este en grados.
+        prefix (str, optional): Prefijo de la clave de los tiles.
+    """
+    region["bbox"] = list(bbox) if bbox else None
+    region["prefix"] = prefix or None
+
+
 def setMapName(newMapName):
     """Establece la variable global del nombre del mapa.
 
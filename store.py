@@ -0,0 +1,207 @@
+import json
+import os
+import shutil
+import sys
+import tempfile
+from cache import fileDigest
+from settings import getConfig
+
+storeName = ".store"
+
+
+def _storeDir(savesDir):
+    return os.path.join(savesDir, storeName)
+
+
+def _objectPath(savesDir, digest):
+    return os.path.join(_storeDir(savesDir), "objects", digest[:2], digest)
+
+
+def _indexPath(savesDir):
+    return os.path.join(_storeDir(savesDir), "index.json")
+
+
+def loadIndex(savesDir):
+    """Carga el índice de copias permanentes del almacén.
+
+    Args:
+        savesDir (str): Directorio de copias permanentes.
+
+    Returns:
+        dict: Nombre de la copia -> {ruta relativa: hash del contenido}.
+    """
+    indexPath = _indexPath(savesDir)
+    if not os.path.exists(indexPath):
+        return {}
+    try:
+        with open(indexPath, "r", encoding = "utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _tempPath(path):
+    """Crea un archivo temporal con nombre único junto a la ruta de destino."""
+    handle, tempPath = tempfile.mkstemp(prefix = f"{os.path.basename(path)}.", suffix = ".tmp", dir = os.path.dirname(path))
+    os.close(handle)
+    return tempPath
+
+
+def saveIndex(savesDir, index):
+    """Guarda el índice de copias permanentes de forma atómica.
+
+    Args:
+        savesDir (str): Directorio de copias permanentes.
+        index (dict): Contenido del índice.
+    """
+    indexPath = _indexPath(savesDir)
+    os.makedirs(os.path.dirname(indexPath), exist_ok = True)
+    tempPath = _tempPath(indexPath)
+    with open(tempPath, "w", encoding = "utf-8") as f:
+        json.dump(index, f, indent = 2, sort_keys = True)
+    os.replace(tempPath, indexPath)
+
+
+def addBlob(savesDir, filePath):
+    """Añade un archivo al almacén si su contenido no está ya guardado.
+
+    Args:
+        savesDir (str): Directorio de copias permanentes.
+        filePath (str): Archivo a guardar.
+
+    Returns:
+        tuple: Hash del contenido y si se ha añadido al almacén.
+    """
+    digest = fileDigest(filePath)
+    objectPath = _objectPath(savesDir, digest)
+    if os.path.exists(objectPath):
+        return digest, False
+    os.makedirs(os.path.dirname(objectPath), exist_ok = True)
+    tempPath = _tempPath(objectPath)
+    shutil.copyfile(filePath, tempPath)
+    os.replace(tempPath, objectPath)
+    return digest, True
+
+
+def linkBlob(savesDir, digest, destPath):
+    """Enlaza un contenido del almacén en la ruta indicada, copiándolo si no se puede enlazar.
+
+    Args:
+        savesDir (str): Directorio de copias permanentes.
+        digest (str): Hash del contenido.
+        destPath (str): Ruta de destino.
+
+    Returns:
+        bool: True si se creó un enlace duro, False si se copió el archivo.
+    """
+    objectPath = _objectPath(savesDir, digest)
+    os.makedirs(os.path.dirname(destPath), exist_ok = True)
+    try:
+        os.link(objectPath, destPath)
+        return True
+    except OSError:
+        shutil.copyfile(objectPath, destPath)
+        return False
+
+
+def createSave(sourceDir, savesDir, saveName):
+    """Crea una copia permanente a partir del almacén de contenidos.
+
+    Cada archivo se guarda una sola vez en el almacén y se enlaza en la carpeta de
+    la copia, de modo que los archivos que no cambian entre copias no ocupan
+    espacio adicional.
+
+    Args:
+        sourceDir (str): Directorio a guardar.
+        savesDir (str): Directorio de copias permanentes.
+        saveName (str): Nombre de la carpeta de la copia.
+
+    Returns:
+        tuple: Número de archivos, archivos enlazados y bytes nuevos añadidos al almacén.
+    """
+    saveDir = os.path.join(savesDir, saveName)
+    index = loadIndex(savesDir)
+    entries = {}
+    linked = 0
+    newBytes = 0
+
+    for root, _, files in os.walk(sourceDir):
+        for f in files:
+            filePath = os.path.join(root, f)
+            relativePath = os.path.relpath(filePath, sourceDir)
+            digest, added = addBlob(savesDir, filePath)
+            if added:
+                newBytes += os.path.getsize(filePath)
+            if linkBlob(savesDir, digest, os.path.join(saveDir, relativePath)):
+                linked += 1
+            entries[relativePath.replace(os.sep, "/")] = digest
+
+    index[saveName] = entries
+    saveIndex(savesDir, index)
+    return len(entries), linked, newBytes
+
+
+def listSaves(savesDir):
+    """Obtiene las copias permanentes registradas en el almacén.
+
+    Args:
+        savesDir (str): Directorio de copias permanentes.
+
+    Returns:
+        list[tuple]: Nombre, número de archivos, tamaño total y si la carpeta sigue existiendo.
+    """
+    saves = []
+    for saveName, entries in sorted(loadIndex(savesDir).items()):
+        totalBytes = 0
+        for digest in entries.values():
+            objectPath = _objectPath(savesDir, digest)
+            if os.path.exists(objectPath):
+                totalBytes += os.path.getsize(objectPath)
+        saves.append((saveName, len(entries), totalBytes, os.path.isdir(os.path.join(savesDir, saveName))))
+    return saves
+
+
+def collectGarbage(savesDir):
+    """Elimina del almacén los contenidos que ya no usa ninguna copia permanente.
+
+    Las copias cuya carpeta se ha borrado se eliminan también del índice.
+
+    Args:
+        savesDir (str): Directorio de copias permanentes.
+
+    Returns:
+        tuple: Número de contenidos eliminados y bytes liberados.
+    """
+    index = loadIndex(savesDir)
+    index = {name: entries for name, entries in index.items() if os.path.isdir(os.path.join(savesDir, name))}
+    referenced = {digest for entries in index.values() for digest in entries.values()}
+
+    removed = 0
+    freedBytes = 0
+    objectsDir = os.path.join(_storeDir(savesDir), "objects")
+    if os.path.isdir(objectsDir):
+        for root, _, files in os.walk(objectsDir):
+            for f in files:
+                if f in referenced:
+                    continue
+                objectPath = os.path.join(root, f)
+                freedBytes += os.path.getsize(objectPath)
+                os.remove(objectPath)
+                removed += 1
+
+    saveIndex(savesDir, index)
+    return removed, freedBytes
+
+
+if __name__ == "__main__":
+    """Gestión del almacén de copias permanentes: python store.py list | gc"""
+    savesDir = getConfig()["paths"]["savesDir"]
+    action = sys.argv[1] if len(sys.argv) > 1 else "list"
+
+    if action == "gc":
+        removed, freedBytes = collectGarbage(savesDir)
+        print(f"Contenidos eliminados: {removed} ({freedBytes / (1024 * 1024):.1f} MB liberados)")
+    else:
+        for saveName, fileCount, totalBytes, exists in listSaves(savesDir):
+            status = "" if exists else " (carpeta eliminada)"
+            print(f"{saveName}: {fileCount} archivos, {totalBytes / (1024 * 1024):.1f} MB{status}")
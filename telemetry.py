@@ -0,0 +1,218 @@
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+environmentVariable = "SCENARIO_TELEMETRY_REPORT"
+relayPrefix = "@telemetry "
+
+_sink = {"path": None, "relay": False, "captured": None, "source": os.path.basename(sys.argv[0] or "python")}
+_lock = threading.Lock()
+
+
+def configure(reportPath = None, relay = False, capture = False, source = None):
+    """Configura el destino de los eventos de este proceso.
+
+    Args:
+        reportPath (str, optional): Archivo JSON lines al que se añaden los eventos.
+        relay (bool): Escribir los eventos en stdout para que los reenvíe el proceso padre.
+        capture (bool): Acumular los eventos en memoria para devolverlos con drain().
+        source (str, optional): Nombre del proceso que se incluye en cada evento.
+    """
+    _sink["path"] = reportPath
+    _sink["relay"] = relay
+    _sink["captured"] = [] if capture else None
+    if source is not None:
+        _sink["source"] = source
+
+
+def configureFromEnvironment(source = None):
+    """Usa el informe indicado por el proceso padre en la variable de entorno, si existe.
+
+    Returns:
+        str: Ruta del informe o None si no hay ninguno activo.
+    """
+    reportPath = os.environ.get(environmentVariable)
+    configure(reportPath, source = source)
+    return reportPath
+
+
+def startReport(reportsDir, source = None):
+    """Crea un informe nuevo y lo comparte con los subprocesos mediante la variable de entorno.
+
+    Args:
+        reportsDir (str): Directorio de los informes.
+        source (str, optional): Nombre del proceso que se incluye en cada evento.
+
+    Returns:
+        str: Ruta del informe.
+    """
+    os.makedirs(reportsDir, exist_ok = True)
+    reportPath = os.path.abspath(os.path.join(reportsDir, f"run-{time.strftime('%Y%m%d-%H%M%S')}.jsonl"))
+    os.environ[environmentVariable] = reportPath
+    configure(reportPath, source = source)
+    return reportPath
+
+
+def peakRssMb():
+    """Obtiene el pico de memoria residente del proceso en MB.
+
+    Returns:
+        float: Pico de memoria o None si no se puede medir en este sistema.
+    """
+    try:
+        import resource
+
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux devuelve KB y macOS bytes
+        return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+    except ImportError:
+        pass
+
+    try:
+        import ctypes
+        from ctypes import wintypes
+
+        class ProcessMemoryCounters(ctypes.Structure):
+            _fields_ = [
+                ("cb", wintypes.DWORD),
+                ("PageFaultCount", wintypes.DWORD),
+                ("PeakWorkingSetSize", ctypes.c_size_t),
+                ("WorkingSetSize", ctypes.c_size_t),
+                ("QuotaPeakPagedPoolUsage", ctypes.c_size_t),
+                ("QuotaPagedPoolUsage", ctypes.c_size_t),
+                ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t),
+                ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+                ("PagefileUsage", ctypes.c_size_t),
+                ("PeakPagefileUsage", ctypes.c_size_t),
+            ]
+
+        counters = ProcessMemoryCounters()
+        counters.cb = ctypes.sizeof(counters)
+        process = ctypes.windll.kernel32.GetCurrentProcess()
+        if ctypes.windll.psapi.GetProcessMemoryInfo(process, ctypes.byref(counters), counters.cb):
+            return counters.PeakWorkingSetSize / (1024 * 1024)
+    except (AttributeError, OSError):
+        pass
+    return None
+
+
+def emit(event):
+    """Envía un evento al destino configurado.
+
+    Args:
+        event (dict): Evento serializable a JSON.
+    """
+    event.setdefault("source", _sink["source"])
+    event.setdefault("pid", os.getpid())
+    event.setdefault("time", time.time())
+
+    if _sink["captured"] is not None:
+        _sink["captured"].append(event)
+    elif _sink["relay"]:
+        line = relayPrefix + json.dumps(event, ensure_ascii = False)
+        with _lock:
+            sys.stdout.write(line + "\n")
+            sys.stdout.flush()
+    elif _sink["path"] is not None:
+        line = json.dumps(event, ensure_ascii = False)
+        with _lock:
+            with open(_sink["path"], "a", encoding = "utf-8") as f:
+                f.write(line + "\n")
+
+
+def event(name, **fields):
+    """Registra un evento con los campos indicados, como los tiempos ya medidos de un paso.
+
+    Args:
+        name (str): Nombre de la etapa.
+        **fields: Campos adicionales (wall, items, ...).
+    """
+    emit(dict(fields, event = "stage", stage = name))
+
+
+@contextmanager
+def stage(name, **fields):
+    """Mide una etapa y registra su tiempo real, tiempo de CPU, pico de memoria y rendimiento.
+
+    El bloque puede rellenar el diccionario devuelto, por ejemplo con "items",
+    para que se calcule el rendimiento en elementos por segundo.
+
+    Args:
+        name (str): Nombre de la etapa.
+        **fields: Campos adicionales del evento.
+
+    Yields:
+        dict: Campos del evento, modificables dentro del bloque.
+    """
+    record = dict(fields)
+    wallStart = time.perf_counter()
+    cpuStart = time.process_time()
+    start = time.time()
+    status = "ok"
+    try:
+        yield record
+    except BaseException as e:
+        status = "error"
+        record["error"] = str(e)
+        raise
+    finally:
+        wall = time.perf_counter() - wallStart
+        record.update(
+            event = "stage",
+            stage = name,
+            status = status,
+            time = start,
+            wall = wall,
+            cpu = time.process_time() - cpuStart,
+            peakRssMb = peakRssMb(),
+        )
+        if "items" in record:
+            record["throughput"] = record["items"] / wall if wall > 0 else None
+        emit(record)
+
+
+def drain():
+    """Devuelve y vacía los eventos acumulados en modo captura.
+
+    Returns:
+        list[dict]: Eventos acumulados.
+    """
+    captured = _sink["captured"] or []
+    if _sink["captured"] is not None:
+        _sink["captured"] = []
+    return captured
+
+
+def relayLine(line):
+    """Reenvía al destino de este proceso un evento escrito por un subproceso en modo relay.
+
+    Args:
+        line (str): Línea de la salida estándar del subproceso.
+
+    Returns:
+        dict: Evento reenviado o None si la línea no era un evento.
+    """
+    if not line.startswith(relayPrefix):
+        return None
+    try:
+        event = json.loads(line[len(relayPrefix) :])
+    except ValueError:
+        return None
+    emit(event)
+    return event
+
+
+def relayOutput(stream, onEvent = None):
+    """Lee la salida de un subproceso hasta el final reenviando sus eventos y descartando el resto.
+
+    Args:
+        stream: Salida estándar del subproceso en modo texto.
+        onEvent (callable, optional): Función que recibe cada evento reenviado, por ejemplo para mostrarlo.
+    """
+    for line in stream:
+        event = relayLine(line.rstrip("\r\n"))
+        if event is not None and onEvent is not None:
+            onEvent(event)
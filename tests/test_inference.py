@@ -0,0 +1,153 @@
+"""Paridad de los backends de inferencia en CPU frente al upsampler eager.
+
+Las pruebas usan un RRDBNet reducido con pesos aleatorios, así que solo requieren
+torch, basicsr y realesrgan; los casos ONNX requieren además onnxruntime. Con el
+modelo RealESRGAN_x2plus.pth en models/ se ejecuta también la comparación con los
+pesos reales.
+"""
+import copy
+import os
+import sys
+import numpy as np
+import pytest
+
+projectRoot = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, projectRoot)
+
+torch = pytest.importorskip("torch")
+pytest.importorskip("basicsr")
+pytest.importorskip("realesrgan")
+
+from basicsr.archs.rrdbnet_arch import RRDBNet  # noqa: E402
+from realesrgan import RealESRGANer  # noqa: E402
+from inference import _buildCandidate, optimizeModel, parityTolerance  # noqa: E402
+from upscaler import decodeTexture, loadUpsampler, upscaleBatch  # noqa: E402
+
+realModelPath = os.path.join(projectRoot, "models", "RealESRGAN_x2plus.pth")
+texturePath = os.path.join(projectRoot, "output", "meshes", "21537360424076132006_LOD00.png")
+upscaleFactor = 2
+cropSize = 64
+
+backendCases = [("torch", None), ("torch", "bf16"), ("onnx", None), ("onnx", "int8")]
+
+
+@pytest.fixture(scope = "module")
+def images():
+    """Dos recortes de una textura real del mapa de ejemplo."""
+    texture = decodeTexture(texturePath)
+    return [np.ascontiguousarray(texture[:cropSize, :cropSize]), np.ascontiguousarray(texture[-cropSize:, -cropSize:])]
+
+
+@pytest.fixture(scope = "module")
+def smallModel(tmp_path_factory):
+    """RRDBNet reducido con pesos aleatorios, guardado como .pth en un directorio temporal.
+
+    La exportación ONNX se escribe junto al .pth, así que también queda en el directorio temporal.
+    """
+    torch.manual_seed(0)
+    model = RRDBNet(num_in_ch = 3, num_out_ch = 3, num_feat = 16, num_block = 2, num_grow_ch = 8, scale = upscaleFactor).eval()
+    modelPath = str(tmp_path_factory.mktemp("model") / "rrdbnet.pth")
+    torch.save({"params_ema": model.state_dict()}, modelPath)
+    return model, modelPath
+
+
+def _smallUpsampler(smallModel):
+    model, modelPath = smallModel
+    return RealESRGANer(
+        scale = upscaleFactor,
+        model_path = modelPath,
+        model = copy.deepcopy(model),
+        tile = 0,
+        tile_pad = 10,
+        pre_pad = 0,
+        half = False,
+        device = torch.device("cpu"),
+    )
+
+
+@pytest.fixture(scope = "module")
+def eager(images, smallModel):
+    """Salidas del camino actual: RealESRGANer.enhance y upscaleBatch con el modelo eager."""
+    upsampler = _smallUpsampler(smallModel)
+    enhanced = [upsampler.enhance(img, outscale = upscaleFactor)[0] for img in images]
+    return {"enhance": enhanced, "batch": upscaleBatch(upsampler, images)}
+
+
+def _withBackend(upsampler, modelPath, backend, quantization):
+    """Sustituye el modelo del upsampler por el backend, sin pasar por el descarte de optimizeModel."""
+    if backend == "onnx":
+        pytest.importorskip("onnxruntime")
+    upsampler.model, name = _buildCandidate(upsampler.model, modelPath, backend, quantization, True)
+    assert name.startswith(backend)
+    return upsampler
+
+
+def _maxDifference(expected, actual):
+    assert expected.shape == actual.shape
+    return np.abs(expected.astype(np.float32) - actual.astype(np.float32)).max() / 255.0
+
+
+def _allowed(quantization):
+    # La tolerancia se aplica a la salida en [0, 1]; el redondeo a uint8 añade como mucho un nivel
+    return parityTolerance.get(quantization, parityTolerance[None]) + 1 / 255.0
+
+
+def test_eagerBatchMatchesEnhance(eager):
+    for expected, actual in zip(eager["enhance"], eager["batch"]):
+        assert _maxDifference(expected, actual) <= _allowed(None)
+
+
+@pytest.mark.parametrize("backend, quantization", backendCases)
+def test_enhanceParity(images, eager, smallModel, backend, quantization):
+    upsampler = _withBackend(_smallUpsampler(smallModel), smallModel[1], backend, quantization)
+    for img, expected in zip(images, eager["enhance"]):
+        actual, _ = upsampler.enhance(img, outscale = upscaleFactor)
+        assert _maxDifference(expected, actual) <= _allowed(quantization)
+
+
+@pytest.mark.parametrize("backend, quantization", backendCases)
+def test_batchParity(images, eager, smallModel, backend, quantization):
+    upsampler = _withBackend(_smallUpsampler(smallModel), smallModel[1], backend, quantization)
+    for expected, actual in zip(eager["batch"], upscaleBatch(upsampler, images)):
+        assert _maxDifference(expected, actual) <= _allowed(quantization)
+
+
+@pytest.mark.parametrize("backend, quantization", backendCases)
+def test_buildCandidateKeepsReference(smallModel, backend, quantization):
+    """Construir un backend no debe cambiar el modelo eager con el que se mide la paridad."""
+    if backend == "onnx":
+        pytest.importorskip("onnxruntime")
+    model, modelPath = smallModel
+    reference = copy.deepcopy(model).train()
+    sample = torch.rand(1, 3, 32, 32, generator = torch.Generator().manual_seed(0))
+    with torch.no_grad():
+        before = reference(sample)
+
+    _buildCandidate(reference, modelPath, backend, quantization, True)
+
+    assert reference.training
+    assert all(p.dtype == torch.float32 and p.is_contiguous() for p in reference.parameters())
+    with torch.no_grad():
+        assert torch.equal(reference(sample), before)
+
+
+@pytest.mark.parametrize("backend, quantization", backendCases)
+def test_optimizeModelKeepsBackend(smallModel, backend, quantization):
+    """optimizeModel no debe descartar un backend que cumple su tolerancia."""
+    if backend == "onnx":
+        pytest.importorskip("onnxruntime")
+    model, modelPath = smallModel
+    options = {"backend": backend, "quantization": quantization, "channelsLast": True}
+    assert optimizeModel(model, modelPath, "cpu", options) is not model
+
+
+@pytest.mark.skipif(not os.path.exists(realModelPath), reason = "Falta models/RealESRGAN_x2plus.pth")
+@pytest.mark.parametrize("backend, quantization", backendCases)
+def test_realWeightsParity(images, backend, quantization):
+    """Misma comparación con los pesos reales; se ejecuta solo si el modelo está descargado."""
+    reference = loadUpsampler(realModelPath, upscaleFactor, "cpu", 0, False)
+    upsampler = _withBackend(loadUpsampler(realModelPath, upscaleFactor, "cpu", 0, False), realModelPath, backend, quantization)
+    for img in images:
+        expected, _ = reference.enhance(img, outscale = upscaleFactor)
+        actual, _ = upsampler.enhance(img, outscale = upscaleFactor)
+        assert _maxDifference(expected, actual) <= _allowed(quantization)
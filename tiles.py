@@ -0,0 +1,201 @@
+import argparse
+import json
+import os
+from build import digestOf
+from chunks import tileKey
+from settings import getConfig
+
+indexDirName = "tiles"
+
+
+def decodeKey(key):
+    """Obtiene los límites geográficos de un tile a partir de su clave octal.
+
+    Cada dígito divide en cuatro la celda del anterior: el bit 1 elige la mitad
+    norte o sur y el bit 0 la mitad este u oeste (el bit 2 divide en altura y no
+    cambia los límites). La latitud parte de [-180, 180] para que los dos primeros
+    niveles formen cuadrados, aunque solo [-90, 90] contenga tiles.
+
+    Args:
+        key (str): Clave del tile, por ejemplo "21537360424076132006".
+
+    Returns:
+        list[float]: Sur, oeste, norte y este en grados.
+    """
+    south, west, north, east = -180.0, -180.0, 180.0, 180.0
+    for digit in key:
+        octant = int(digit)
+        latitude = (south + north) / 2
+        longitude = (west + east) / 2
+        if octant & 2:
+            south = latitude
+        else:
+            north = latitude
+        if octant & 1:
+            west = longitude
+        else:
+            east = longitude
+    return [south, west, north, east]
+
+
+def _listFiles(directory, extension):
+    if not os.path.isdir(directory):
+        return []
+    return sorted(f for f in os.listdir(directory) if f.lower().endswith(extension))
+
+
+def _directoryStamp(directory):
+    try:
+        return os.stat(directory).st_mtime_ns
+    except OSError:
+        return None
+
+
+def _indexStamp(gltfDir, textureDir):
+    return digestOf(os.path.abspath(gltfDir), _directoryStamp(gltfDir), os.path.abspath(textureDir), _directoryStamp(textureDir))
+
+
+def buildIndex(gltfDir, textureDir):
+    """Construye el índice de tiles de una descarga: límites, glTF y texturas de cada clave.
+
+    Args:
+        gltfDir (str): Directorio de los glTF.
+        textureDir (str): Directorio de las texturas.
+
+    Returns:
+        dict: Índice con los tiles por clave y los archivos sin clave en "other".
+    """
+    tiles = {}
+    other = {"gltf": [], "textures": []}
+    for section, files in (("gltf", _listFiles(gltfDir, ".gltf")), ("textures", _listFiles(textureDir, ".png"))):
+        for fileName in files:
+            key = tileKey(fileName)
+            if key is None:
+                other[section].append(fileName)
+                continue
+            if key not in tiles:
+                tiles[key] = {"bounds": decodeKey(key), "gltf": [], "textures": []}
+            tiles[key][section].append(fileName)
+    return {
+        "stamp": _indexStamp(gltfDir, textureDir),
+        "tiles": dict(sorted(tiles.items())),
+        "other": other,
+    }
+
+
+def indexPath(cacheDir, gltfDir, textureDir):
+    """Ruta del índice de una descarga dentro de la caché.
+
+    El índice no se guarda junto a la descarga porque escribirlo cambiaría la fecha
+    del directorio y lo invalidaría.
+    """
+    name = digestOf(os.path.abspath(gltfDir), os.path.abspath(textureDir))[:16]
+    return os.path.join(cacheDir, indexDirName, f"{name}.json")
+
+
+def loadIndex(gltfDir, textureDir, cacheDir):
+    """Carga el índice de tiles de una descarga, reconstruyéndolo si cambió.
+
+    El índice se invalida cuando cambia la fecha de modificación de alguno de los
+    dos directorios, es decir, cuando se añaden, eliminan o sustituyen archivos.
+
+    Args:
+        gltfDir (str): Directorio de los glTF.
+        textureDir (str): Directorio de las texturas.
+        cacheDir (str): Directorio de la caché donde se guarda el índice.
+
+    Returns:
+        dict: Índice de tiles (ver buildIndex).
+    """
+    path = indexPath(cacheDir, gltfDir, textureDir)
+    stamp = _indexStamp(gltfDir, textureDir)
+    if os.path.exists(path):
+        try:
+            with open(path, "r", encoding = "utf-8") as f:
+                index = json.load(f)
+            if index.get("stamp") == stamp:
+                return index
+        except (OSError, ValueError):
+            pass
+
+    index = buildIndex(gltfDir, textureDir)
+    os.makedirs(os.path.dirname(path), exist_ok = True)
+    tempPath = f"{path}.tmp"
+    with open(tempPath, "w", encoding = "utf-8") as f:
+        json.dump(index, f)
+    os.replace(tempPath, path)
+    return index
+
+
+def isRegionSet(region):
+    """Comprueba si la configuración de región restringe los tiles a procesar."""
+    return bool(region and (region.get("bbox") or region.get("prefix")))
+
+
+def _intersects(bounds, bbox):
+    south, west, north, east = bounds
+    return south < bbox[2] and north > bbox[0] and west < bbox[3] and east > bbox[1]
+
+
+def selectTiles(index, region):
+    """Obtiene las claves de los tiles que caen dentro de la región de interés.
+
+    Args:
+        index (dict): Índice de tiles (ver loadIndex).
+        region (dict): Caja "bbox" [sur, oeste, norte, este] en grados y/o prefijo de clave "prefix".
+
+    Returns:
+        list[str]: Claves seleccionadas, ordenadas.
+    """
+    prefix = region.get("prefix") or ""
+    bbox = region.get("bbox")
+    return [
+        key
+        for key, tile in index["tiles"].items()
+        if key.startswith(prefix) and (bbox is None or _intersects(tile["bounds"], bbox))
+    ]
+
+
+def regionFiles(gltfDir, textureDir, region, cacheDir):
+    """Obtiene los glTF y las texturas de los tiles de la región de interés.
+
+    Args:
+        gltfDir (str): Directorio de los glTF.
+        textureDir (str): Directorio de las texturas.
+        region (dict): Sección "region" de la configuración.
+        cacheDir (str): Directorio de la caché donde se guarda el índice.
+
+    Returns:
+        tuple: Nombres de los glTF y de las texturas seleccionados, o (None, None)
+            si no hay región definida y se deben procesar todos.
+    """
+    if not isRegionSet(region):
+        return None, None
+    index = loadIndex(gltfDir, textureDir, cacheDir)
+    keys = selectTiles(index, region)
+    gltfFiles = sorted(f for key in keys for f in index["tiles"][key]["gltf"])
+    textureFiles = sorted(f for key in keys for f in index["tiles"][key]["textures"])
+    return gltfFiles, textureFiles
+
+
+def main():
+    """Muestra los tiles de una descarga que caen dentro de una región."""
+    parser = argparse.ArgumentParser(description = "Índice de tiles por clave")
+    parser.add_argument("gltfDir")
+    parser.add_argument("textureDir")
+    parser.add_argument("--bbox", type = float, nargs = 4, metavar = ("SUR", "OESTE", "NORTE", "ESTE"))
+    parser.add_argument("--prefix")
+    parser.add_argument("--cache-dir", default = getConfig()["paths"]["cacheDir"])
+    args = parser.parse_args()
+
+    index = loadIndex(args.gltfDir, args.textureDir, args.cache_dir)
+    keys = selectTiles(index, {"bbox": args.bbox, "prefix": args.prefix})
+    for key in keys:
+        tile = index["tiles"][key]
+        south, west, north, east = tile["bounds"]
+        print(f"{key}  {south:.6f} {west:.6f} {north:.6f} {east:.6f}  {len(tile['gltf'])} glTF, {len(tile['textures'])} texturas")
+    print(f"{len(keys)} de {len(index['tiles'])} tiles seleccionados")
+
+
+if __name__ == "__main__":
+    main()
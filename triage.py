@@ -0,0 +1,142 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from PIL import Image
+
+
+def textureStats(imagePath, sampleSize = 256):
+    """Calcula medidas baratas del contenido de una textura sobre una versión reducida.
+
+    Args:
+        imagePath (str): Ruta a la textura.
+        sampleSize (int): Lado máximo de la muestra analizada en píxeles.
+
+    Returns:
+        dict: Ancho y alto originales, desviación típica de la luminancia (0-255),
+            entropía de su histograma en bits y fracción de píxeles no transparentes.
+    """
+    with Image.open(imagePath) as img:
+        width, height = img.size
+        hasAlpha = "A" in img.getbands() or "transparency" in img.info
+        factor = max(1, max(width, height) // sampleSize)
+        sample = img.convert("LA") if hasAlpha else img.convert("L")
+        if factor > 1:
+            sample = sample.reduce(factor)
+
+    pixels = np.asarray(sample)
+    if hasAlpha:
+        luma = pixels[..., 0]
+        visible = pixels[..., 1] > 0
+        alphaCoverage = float(visible.mean())
+        luma = luma[visible] if visible.any() else luma.ravel()
+    else:
+        luma = pixels.ravel()
+        alphaCoverage = 1.0
+
+    histogram = np.bincount(luma.ravel(), minlength = 256).astype(np.float64)
+    probabilities = histogram[histogram > 0] / histogram.sum()
+    return {
+        "width": width,
+        "height": height,
+        "std": float(luma.std()),
+        "entropy": max(0.0, float(-(probabilities * np.log2(probabilities)).sum())),
+        "alphaCoverage": alphaCoverage,
+    }
+
+
+def classifyTexture(stats, triageConfig):
+    """Clasifica una textura según la información que contiene.
+
+    Args:
+        stats (dict): Medidas obtenidas con textureStats.
+        triageConfig (dict): Sección "triage" de la configuración.
+
+    Returns:
+        str: "empty" (casi transparente), "uniform" (color casi constante),
+            "lowDetail" (pocos tonos distintos) o "detail".
+    """
+    if stats["alphaCoverage"] < triageConfig["minAlphaCoverage"]:
+        return "empty"
+    if stats["std"] <= triageConfig["uniformStd"]:
+        return "uniform"
+    if stats["entropy"] <= triageConfig["lowDetailEntropy"]:
+        return "lowDetail"
+    return "detail"
+
+
+def triageTextures(textureDir, imageFiles, triageConfig):
+    """Separa las texturas que necesitan la red de las que basta con redimensionar.
+
+    Args:
+        textureDir (str): Directorio de las texturas.
+        imageFiles (list[str]): Nombres de archivo a clasificar.
+        triageConfig (dict): Sección "triage" de la configuración.
+
+    Returns:
+        tuple: Texturas para la red, texturas para el redimensionado rápido y
+            diccionario nombre -> medidas con su clase en "class".
+    """
+    networkFiles = []
+    fastFiles = []
+    stats = {}
+    for fileName in imageFiles:
+        try:
+            fileStats = textureStats(os.path.join(textureDir, fileName), triageConfig["sampleSize"])
+        except Exception as e:
+            print(f"Error analizando {fileName}: {str(e)}")
+            networkFiles.append(fileName)
+            continue
+        fileStats["class"] = classifyTexture(fileStats, triageConfig)
+        stats[fileName] = fileStats
+        if fileStats["class"] == "detail":
+            networkFiles.append(fileName)
+        else:
+            fastFiles.append(fileName)
+    return networkFiles, fastFiles, stats
+
+
+def resizeTexture(imagePath, upscaleFactor):
+    """Escala una textura con un filtro Lanczos y sobrescribe el archivo original.
+
+    El resultado se escribe en un archivo temporal que sustituye al original con
+    un renombrado atómico, igual que las texturas escaladas con la red.
+
+    Args:
+        imagePath (str): Ruta a la textura.
+        upscaleFactor (int): Factor de escalado.
+    """
+    with Image.open(imagePath) as img:
+        img = img.convert("RGBA") if "A" in img.getbands() or "transparency" in img.info else img.convert("RGB")
+        output = img.resize((img.width * upscaleFactor, img.height * upscaleFactor), Image.LANCZOS)
+
+    tempPath = f"{imagePath}.tmp"
+    with open(tempPath, "wb") as f:
+        output.save(f, format = "PNG")
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tempPath, imagePath)
+
+
+def resizeTextures(textureDir, imageFiles, upscaleFactor, workers = 4, progress = None, onComplete = None):
+    """Redimensiona en paralelo las texturas de poca información.
+
+    Args:
+        textureDir (str): Directorio de las texturas.
+        imageFiles (list[str]): Nombres de archivo a procesar.
+        upscaleFactor (int): Factor de escalado.
+        workers (int): Hilos de redimensionado.
+        progress (tqdm, optional): Barra de progreso a actualizar.
+        onComplete (callable, optional): Función llamada con el nombre de cada textura guardada.
+    """
+    def resize(fileName):
+        try:
+            resizeTexture(os.path.join(textureDir, fileName), upscaleFactor)
+            if onComplete is not None:
+                onComplete(fileName)
+        except Exception as e:
+            print(f"Error procesando {fileName}: {str(e)}")
+        if progress is not None:
+            progress.update(1)
+
+    with ThreadPoolExecutor(max_workers = max(1, workers)) as pool:
+        list(pool.map(resize, imageFiles))
@@ -0,0 +1,660 @@
+import ctypes
+import os
+import queue
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+import numpy as np
+import torch
+from basicsr.archs.rrdbnet_arch import RRDBNet
+from PIL import Image
+from realesrgan import RealESRGANer
+from torch.nn import functional as F
+import telemetry
+from inference import exportOnnx, needsExport, optimizeModel
+
+_workerUpsampler = None
+_workerMemoryBudget = None
+
+tileCandidates = (1024, 768, 512, 384, 256, 192, 128, 96, 64)
+minTileSize = 32
+
+
+def buildModel(modelPath, upscaleFactor):
+    """Construye la red RRDBNet y carga sus pesos.
+
+    Args:
+        modelPath (str): Ruta al archivo .pth del modelo.
+        upscaleFactor (int): Factor de escalado del modelo (2 o 4).
+
+    Returns:
+        RRDBNet: Modelo con los pesos cargados.
+    """
+    stateDict = torch.load(modelPath, map_location = "cpu")["params_ema"]
+
+    model = RRDBNet(
+        num_in_ch = 3,
+        num_out_ch = 3,
+        num_feat = 64,
+        num_block = 23,
+        num_grow_ch = 32,
+        scale = upscaleFactor,
+    )
+
+    model.load_state_dict(stateDict, strict=True)
+    return model
+
+
+def loadUpsampler(modelPath, upscaleFactor, device, tileSize, halfPrecision, backendOptions = None):
+    """Carga la red RRDBNet y construye el upsampler de Real-ESRGAN.
+
+    Args:
+        modelPath (str): Ruta al archivo .pth del modelo.
+        upscaleFactor (int): Factor de escalado del modelo (2 o 4).
+        device (str): Dispositivo de inferencia ("cuda" o "cpu").
+        tileSize (int | str): Tamaño de tile (0 = imagen completa, "auto" = elegido por imagen).
+        halfPrecision (bool): Usar precisión media durante la inferencia.
+        backendOptions (dict, optional): Backend de inferencia en CPU (ver inference.optimizeModel).
+
+    Returns:
+        RealESRGANer: Upsampler listo para procesar imágenes.
+    """
+    if tileSize == "auto":
+        tileSize = 0
+
+    model = buildModel(modelPath, upscaleFactor).to(device)
+
+    upsampler = RealESRGANer(
+        scale = upscaleFactor,
+        model_path = modelPath,
+        model = model,
+        tile = tileSize,
+        tile_pad = 10,
+        pre_pad = 0,
+        half = halfPrecision,
+    )
+    if backendOptions is not None:
+        upsampler.model = optimizeModel(upsampler.model, modelPath, device, backendOptions)
+    upsampler.tile_process = lambda: _tileProcess(upsampler)
+    return upsampler
+
+
+def backendOptionsFrom(textureConfig):
+    """Extrae las opciones del backend de inferencia de la configuración de texturas.
+
+    Args:
+        textureConfig (dict): Sección "texture" de la configuración.
+
+    Returns:
+        dict: Opciones "backend", "quantization" y "channelsLast".
+    """
+    return {
+        "backend": textureConfig["backend"],
+        "quantization": textureConfig["quantization"],
+        "channelsLast": textureConfig["channelsLast"],
+    }
+
+
+def isOutOfMemory(error):
+    """Indica si una excepción corresponde a falta de memoria en CPU o GPU.
+
+    Args:
+        error (Exception): Excepción capturada.
+
+    Returns:
+        bool: True si la excepción es un error de memoria.
+    """
+    if isinstance(error, MemoryError):
+        return True
+    message = str(error).lower()
+    return isinstance(error, RuntimeError) and ("out of memory" in message or "can't allocate memory" in message)
+
+
+def _releaseMemory():
+    if torch.cuda.is_available():
+        torch.cuda.empty_cache()
+
+
+def availableMemory(device):
+    """Obtiene la memoria libre del dispositivo de inferencia.
+
+    Args:
+        device (str): Dispositivo de inferencia ("cuda" o "cpu").
+
+    Returns:
+        int: Bytes disponibles o None si no se pueden determinar.
+    """
+    if str(device).startswith("cuda"):
+        free, _ = torch.cuda.mem_get_info()
+        return free
+
+    try:
+        import psutil
+
+        return psutil.virtual_memory().available
+    except ImportError:
+        pass
+
+    if os.name == "nt":
+        class MemoryStatus(ctypes.Structure):
+            _fields_ = [
+                ("dwLength", ctypes.c_ulong),
+                ("dwMemoryLoad", ctypes.c_ulong),
+                ("ullTotalPhys", ctypes.c_ulonglong),
+                ("ullAvailPhys", ctypes.c_ulonglong),
+                ("ullTotalPageFile", ctypes.c_ulonglong),
+                ("ullAvailPageFile", ctypes.c_ulonglong),
+                ("ullTotalVirtual", ctypes.c_ulonglong),
+                ("ullAvailVirtual", ctypes.c_ulonglong),
+                ("ullAvailExtendedVirtual", ctypes.c_ulonglong),
+            ]
+
+        status = MemoryStatus()
+        status.dwLength = ctypes.sizeof(MemoryStatus)
+        if ctypes.windll.kernel32.GlobalMemoryStatusEx(ctypes.byref(status)):
+            return status.ullAvailPhys
+        return None
+
+    try:
+        return os.sysconf("SC_AVPHYS_PAGES") * os.sysconf("SC_PAGE_SIZE")
+    except (ValueError, OSError, AttributeError):
+        return None
+
+
+def estimateMemory(height, width, upscaleFactor, halfPrecision, batch = 1):
+    """Estima el pico de memoria de activaciones de RRDBNet para una entrada.
+
+    El cuerpo de la red trabaja a la resolución de entrada (a la mitad en el
+    modelo x2, que aplica pixel unshuffle) con hasta 192 canales concatenados en
+    los bloques densos. El pico suele estar en la etapa final, donde conviven dos
+    mapas de 64 canales a la resolución de salida.
+
+    Args:
+        height (int): Alto de la entrada en píxeles.
+        width (int): Ancho de la entrada en píxeles.
+        upscaleFactor (int): Factor de escalado.
+        halfPrecision (bool): Uso de precisión media.
+        batch (int): Número de imágenes procesadas a la vez.
+
+    Returns:
+        int: Bytes estimados.
+    """
+    bytesPerValue = 2 if halfPrecision else 4
+    bodyPixels = height * width / {2: 4, 1: 16}.get(upscaleFactor, 1)
+    outputPixels = height * width * upscaleFactor * upscaleFactor
+    bodyValues = bodyPixels * (64 + 4 * 32 + 2 * 64)
+    headValues = outputPixels * 2 * 64
+    return int(batch * max(bodyValues, headValues) * bytesPerValue * 1.2)
+
+
+def selectTileSize(height, width, upscaleFactor, halfPrecision, memoryBudget, tilePad = 10):
+    """Elige el mayor tamaño de tile cuya memoria estimada cabe en el presupuesto.
+
+    Args:
+        height (int): Alto de la imagen en píxeles.
+        width (int): Ancho de la imagen en píxeles.
+        upscaleFactor (int): Factor de escalado.
+        halfPrecision (bool): Uso de precisión media.
+        memoryBudget (int): Bytes disponibles para la inferencia.
+        tilePad (int): Relleno de cada tile en píxeles.
+
+    Returns:
+        int: Tamaño de tile (0 = imagen completa).
+    """
+    if estimateMemory(height, width, upscaleFactor, halfPrecision) <= memoryBudget:
+        return 0
+
+    for tile in tileCandidates:
+        if tile >= max(height, width):
+            continue
+        tileHeight = min(tile, height) + 2 * tilePad
+        tileWidth = min(tile, width) + 2 * tilePad
+        if estimateMemory(tileHeight, tileWidth, upscaleFactor, halfPrecision) <= memoryBudget:
+            return tile
+    return tileCandidates[-1]
+
+
+def _tiledForward(model, img, tileSize, tilePad, scale):
+    """Inferencia por tiles que subdivide un tile a la mitad si se queda sin memoria.
+
+    Sigue el mismo recorte y relleno que RealESRGANer.tile_process.
+    """
+    batch, channel, height, width = img.shape
+    output = img.new_zeros((batch, channel, height * scale, width * scale))
+    tilesX = -(-width // tileSize)
+    tilesY = -(-height // tileSize)
+
+    for y in range(tilesY):
+        for x in range(tilesX):
+            startX = x * tileSize
+            endX = min(startX + tileSize, width)
+            startY = y * tileSize
+            endY = min(startY + tileSize, height)
+
+            startXPad = max(startX - tilePad, 0)
+            endXPad = min(endX + tilePad, width)
+            startYPad = max(startY - tilePad, 0)
+            endYPad = min(endY + tilePad, height)
+            inputTile = img[:, :, startYPad:endYPad, startXPad:endXPad]
+
+            try:
+                with torch.no_grad():
+                    outputTile = model(inputTile)
+            except Exception as e:
+                if not isOutOfMemory(e) or tileSize // 2 < minTileSize:
+                    raise
+                _releaseMemory()
+                outputTile = _tiledForward(model, inputTile, tileSize // 2, tilePad, scale)
+
+            offsetX = (startX - startXPad) * scale
+            offsetY = (startY - startYPad) * scale
+            output[:, :, startY * scale : endY * scale, startX * scale : endX * scale] = outputTile[
+                :, :, offsetY : offsetY + (endY - startY) * scale, offsetX : offsetX + (endX - startX) * scale
+            ]
+    return output
+
+
+def _tileProcess(upsampler):
+    """Sustituye a RealESRGANer.tile_process, que descarta los errores de memoria de cada tile."""
+    upsampler.output = _tiledForward(upsampler.model, upsampler.img, upsampler.tile_size, upsampler.tile_pad, upsampler.scale)
+
+
+def enhanceAuto(upsampler, imgArray, upscaleFactor, memoryBudget):
+    """Escala una imagen eligiendo el tamaño de tile según el presupuesto de memoria.
+
+    Si la inferencia de la imagen completa se queda sin memoria, se repite con tiles.
+
+    Args:
+        upsampler (RealESRGANer): Upsampler cargado.
+        imgArray (numpy.ndarray): Imagen RGB uint8.
+        upscaleFactor (int): Factor de escalado de salida.
+        memoryBudget (int): Bytes disponibles para la inferencia.
+
+    Returns:
+        numpy.ndarray: Imagen escalada.
+    """
+    height, width = imgArray.shape[:2]
+    upsampler.tile_size = selectTileSize(height, width, upsampler.scale, upsampler.half, memoryBudget, upsampler.tile_pad)
+    try:
+        output, _ = upsampler.enhance(imgArray, outscale = upscaleFactor)
+        return output
+    except Exception as e:
+        if not isOutOfMemory(e) or upsampler.tile_size != 0:
+            raise
+    _releaseMemory()
+    upsampler.tile_size = max([tile for tile in tileCandidates if tile < max(height, width)], default = tileCandidates[-1])
+    output, _ = upsampler.enhance(imgArray, outscale = upscaleFactor)
+    return output
+
+
+def decodeTexture(imagePath):
+    """Decodifica una textura PNG como array RGB.
+
+    Args:
+        imagePath (str): Ruta a la textura.
+
+    Returns:
+        numpy.ndarray: Array (alto, ancho, 3) de tipo uint8.
+    """
+    with Image.open(imagePath) as img:
+        return np.array(img.convert("RGB"))
+
+
+def encodeTexture(imagePath, outputArray):
+    """Codifica un array RGB y lo guarda como PNG.
+
+    La imagen se escribe en un archivo temporal que sustituye al original con un
+    renombrado atómico, de modo que una interrupción nunca deja una textura a medias.
+
+    Args:
+        imagePath (str): Ruta de destino de la textura.
+        outputArray (numpy.ndarray): Imagen escalada (alto, ancho, 3) de tipo uint8.
+    """
+    tempPath = f"{imagePath}.tmp"
+    with open(tempPath, "wb") as f:
+        Image.fromarray(outputArray).save(f, format = "PNG")
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tempPath, imagePath)
+
+
+def upscaleFile(upsampler, imagePath, upscaleFactor, memoryBudget = None):
+    """Escala una textura individual y sobrescribe el archivo original.
+
+    Args:
+        upsampler (RealESRGANer): Upsampler cargado.
+        imagePath (str): Ruta a la textura.
+        upscaleFactor (int): Factor de escalado de salida.
+        memoryBudget (int, optional): Bytes disponibles; si se indica, el tile se elige por imagen.
+    """
+    with telemetry.stage("upscale.texture", file = os.path.basename(imagePath), items = 1) as record:
+        imgArray = decodeTexture(imagePath)
+        record["pixels"] = imgArray.shape[0] * imgArray.shape[1]
+        if memoryBudget is not None:
+            output = enhanceAuto(upsampler, imgArray, upscaleFactor, memoryBudget)
+        else:
+            output, _ = upsampler.enhance(imgArray, outscale = upscaleFactor)
+        encodeTexture(imagePath, output)
+
+
+def upscaleBatch(upsampler, arrays):
+    """Escala un lote de imágenes del mismo tamaño en una sola inferencia.
+
+    Reproduce el preprocesado de RealESRGANer.enhance (orden de canales, relleno
+    por múltiplo de escala y redondeo) para que el resultado coincida con el modo
+    imagen a imagen.
+
+    Args:
+        upsampler (RealESRGANer): Upsampler cargado.
+        arrays (list[numpy.ndarray]): Imágenes RGB uint8 con las mismas dimensiones.
+
+    Returns:
+        list[numpy.ndarray]: Imágenes escaladas en el mismo orden de entrada.
+    """
+    scale = upsampler.scale
+    batch = np.stack(arrays)[:, :, :, ::-1].astype(np.float32) / 255.0
+    tensor = torch.from_numpy(np.ascontiguousarray(batch.transpose(0, 3, 1, 2))).to(upsampler.device)
+    if upsampler.half:
+        tensor = tensor.half()
+
+    _, _, height, width = tensor.shape
+    modScale = {2: 2, 1: 4}.get(scale)
+    if modScale is not None:
+        padH = (modScale - height % modScale) % modScale
+        padW = (modScale - width % modScale) % modScale
+        if padH or padW:
+            tensor = F.pad(tensor, (0, padW, 0, padH), "reflect")
+
+    with torch.no_grad():
+        output = upsampler.model(tensor)
+
+    output = output[:, :, : height * scale, : width * scale]
+    output = output.float().clamp_(0, 1).cpu().numpy()
+    output = (output.transpose(0, 2, 3, 1)[:, :, :, ::-1] * 255.0).round().astype(np.uint8)
+    return [np.ascontiguousarray(img) for img in output]
+
+
+def groupBySize(textureDir, imageFiles, batchSize):
+    """Agrupa las texturas por dimensiones en lotes de tamaño máximo batchSize.
+
+    Solo se lee la cabecera de cada PNG, sin decodificar los píxeles.
+
+    Args:
+        textureDir (str): Directorio de las texturas.
+        imageFiles (list[str]): Nombres de archivo a agrupar.
+        batchSize (int): Número máximo de texturas por lote.
+
+    Returns:
+        tuple: Lista de lotes (listas de nombres) y lista de archivos ilegibles.
+    """
+    groups = {}
+    unreadable = []
+    for fileName in imageFiles:
+        try:
+            with Image.open(os.path.join(textureDir, fileName)) as img:
+                size = img.size
+        except Exception as e:
+            print(f"Error procesando {fileName}: {str(e)}")
+            unreadable.append(fileName)
+            continue
+        groups.setdefault(size, []).append(fileName)
+
+    batches = []
+    for files in groups.values():
+        for i in range(0, len(files), batchSize):
+            batches.append(files[i : i + batchSize])
+    return batches, unreadable
+
+
+def _inferBatch(upsampler, fileNames, arrays, memoryBudget):
+    """Ejecuta la inferencia de un lote, dividiéndolo si no cabe en el presupuesto de memoria.
+
+    Si el lote falla, las texturas se procesan individualmente.
+
+    Returns:
+        list: Imágenes escaladas, con None en las texturas que fallaron.
+    """
+    chunkSize = len(arrays)
+    if memoryBudget is not None:
+        height, width = arrays[0].shape[:2]
+        perImage = estimateMemory(height, width, upsampler.scale, upsampler.half)
+        chunkSize = min(chunkSize, memoryBudget // max(1, perImage))
+
+    if chunkSize >= 1:
+        try:
+            outputs = []
+            for i in range(0, len(arrays), chunkSize):
+                outputs.extend(upscaleBatch(upsampler, arrays[i : i + chunkSize]))
+            return outputs
+        except Exception as e:
+            if isOutOfMemory(e):
+                _releaseMemory()
+            print(f"Error en lote de {len(fileNames)} texturas, procesando individualmente: {str(e)}")
+
+    outputs = []
+    for fileName, imgArray in zip(fileNames, arrays):
+        try:
+            if memoryBudget is not None:
+                output = enhanceAuto(upsampler, imgArray, upsampler.scale, memoryBudget)
+            else:
+                output, _ = upsampler.enhance(imgArray, outscale = upsampler.scale)
+            outputs.append(output)
+        except Exception as e:
+            print(f"Error procesando {fileName}: {str(e)}")
+            outputs.append(None)
+    return outputs
+
+
+def _decodeBatches(textureDir, batches, batchQueue):
+    """Hilo decodificador: carga los lotes por adelantado en la cola."""
+    for batch in batches:
+        fileNames = []
+        arrays = []
+        for fileName in batch:
+            try:
+                arrays.append(decodeTexture(os.path.join(textureDir, fileName)))
+                fileNames.append(fileName)
+            except Exception as e:
+                print(f"Error procesando {fileName}: {str(e)}")
+        batchQueue.put((batch, fileNames, arrays))
+    batchQueue.put(None)
+
+
+def upscaleBatched(upsampler, textureDir, imageFiles, batchSize, prefetchBatches = 2, encodeWorkers = 4, progress = None, onComplete = None, memoryBudget = None):
+    """Escala texturas por lotes solapando decodificación, inferencia y codificación.
+
+    Un hilo decodifica los siguientes lotes mientras se ejecuta la inferencia del
+    actual, y un pool de hilos guarda los resultados en paralelo.
+
+    Args:
+        upsampler (RealESRGANer): Upsampler cargado.
+        textureDir (str): Directorio de las texturas.
+        imageFiles (list[str]): Nombres de archivo a procesar.
+        batchSize (int): Número máximo de texturas por lote.
+        prefetchBatches (int): Lotes decodificados por adelantado.
+        encodeWorkers (int): Hilos dedicados a guardar las texturas.
+        progress (tqdm, optional): Barra de progreso a actualizar.
+        onComplete (callable, optional): Función llamada con el nombre de cada textura guardada.
+        memoryBudget (int, optional): Bytes disponibles; limita el tamaño de lote y activa el tile automático.
+    """
+    batches, unreadable = groupBySize(textureDir, imageFiles, batchSize)
+    if progress is not None and unreadable:
+        progress.update(len(unreadable))
+
+    batchQueue = queue.Queue(maxsize = max(1, prefetchBatches))
+    decoder = threading.Thread(target = _decodeBatches, args = (textureDir, batches, batchQueue), daemon = True)
+    decoder.start()
+
+    def encode(fileName, outputArray):
+        try:
+            with telemetry.stage("upscale.encode", file = fileName, items = 1):
+                encodeTexture(os.path.join(textureDir, fileName), outputArray)
+            if onComplete is not None:
+                onComplete(fileName)
+        except Exception as e:
+            print(f"Error procesando {fileName}: {str(e)}")
+        if progress is not None:
+            progress.update(1)
+
+    with ThreadPoolExecutor(max_workers = max(1, encodeWorkers)) as encoder:
+        while True:
+            item = batchQueue.get()
+            if item is None:
+                break
+            batch, fileNames, arrays = item
+            if progress is not None and len(fileNames) < len(batch):
+                progress.update(len(batch) - len(fileNames))
+            if not arrays:
+                continue
+
+            height, width = arrays[0].shape[:2]
+            with telemetry.stage("upscale.batch", items = len(arrays), pixels = height * width * len(arrays)):
+                outputs = _inferBatch(upsampler, fileNames, arrays, memoryBudget)
+
+            for fileName, outputArray in zip(fileNames, outputs):
+                if outputArray is None:
+                    if progress is not None:
+                        progress.update(1)
+                    continue
+                encoder.submit(encode, fileName, outputArray)
+
+    decoder.join()
+
+
+def memoryBudgetFor(device, textureConfig, workers = 1):
+    """Calcula el presupuesto de memoria para el modo de tile automático.
+
+    Args:
+        device (str): Dispositivo de inferencia ("cuda" o "cpu").
+        textureConfig (dict): Sección "texture" de la configuración.
+        workers (int): Procesos que comparten la memoria.
+
+    Returns:
+        int: Bytes disponibles por proceso o None si el tile no es automático.
+    """
+    if textureConfig["tileSize"] != "auto":
+        return None
+    freeMemory = availableMemory(device)
+    if freeMemory is None:
+        freeMemory = textureConfig["fallbackMemoryMb"] * 1024 * 1024
+    return int(freeMemory * textureConfig["memoryFraction"]) // max(1, workers)
+
+
+def upscaleTextures(upsampler, textureDir, imageFiles, textureConfig, memoryBudget = None, progress = None, onComplete = None):
+    """Escala texturas con un upsampler ya cargado, por lotes o imagen a imagen según la configuración.
+
+    Args:
+        upsampler (RealESRGANer): Upsampler cargado.
+        textureDir (str): Directorio de las texturas.
+        imageFiles (list[str]): Nombres de archivo a procesar.
+        textureConfig (dict): Sección "texture" de la configuración.
+        memoryBudget (int, optional): Bytes disponibles en modo de tile automático.
+        progress (tqdm, optional): Barra de progreso a actualizar.
+        onComplete (callable, optional): Función llamada con el nombre de cada textura guardada.
+    """
+    batchSize = textureConfig["batchSize"]
+    if batchSize > 1 and textureConfig["tileSize"] in (0, "auto"):
+        print(f"Upscaling por lotes de hasta {batchSize} texturas")
+        upscaleBatched(
+            upsampler,
+            textureDir,
+            imageFiles,
+            batchSize,
+            prefetchBatches = textureConfig["prefetchBatches"],
+            encodeWorkers = textureConfig["encodeWorkers"],
+            progress = progress,
+            onComplete = onComplete,
+            memoryBudget = memoryBudget,
+        )
+        return
+
+    for fileName in imageFiles:
+        imagePath = os.path.join(textureDir, fileName)
+        try:
+            upscaleFile(upsampler, imagePath, upsampler.scale, memoryBudget)
+            if onComplete is not None:
+                onComplete(fileName)
+        except Exception as e:
+            print(f"Error procesando {fileName}: {str(e)}")
+        if progress is not None:
+            progress.update(1)
+
+
+def _initWorker(modelPath, upscaleFactor, tileSize, threadsPerWorker, memoryBudget, backendOptions):
+    """Inicializa un proceso trabajador: fija su presupuesto de hilos y carga el modelo una vez."""
+    global _workerUpsampler, _workerMemoryBudget
+    _workerMemoryBudget = memoryBudget
+    # Los eventos se devuelven con cada resultado y los registra el proceso principal
+    telemetry.configure(capture = True, source = "upscaleWorker")
+    torch.set_num_threads(threadsPerWorker)
+    try:
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        pass
+    with telemetry.stage("model.load", device = "cpu", modelFile = os.path.basename(modelPath)):
+        _workerUpsampler = loadUpsampler(modelPath, upscaleFactor, "cpu", tileSize, False, backendOptions)
+
+
+def _upscaleInWorker(imagePath, upscaleFactor):
+    """Escala una textura dentro de un proceso trabajador.
+
+    Returns:
+        tuple: Mensaje de error (None si la textura se guardó correctamente) y eventos de telemetría.
+    """
+    try:
+        upscaleFile(_workerUpsampler, imagePath, upscaleFactor, _workerMemoryBudget)
+    except Exception as e:
+        return str(e), telemetry.drain()
+    return None, telemetry.drain()
+
+
+def upscaleProcessPool(modelPath, upscaleFactor, tileSize, textureDir, imageFiles, workers, threadsPerWorker = 0, progress = None, onComplete = None, memoryBudget = None, backendOptions = None):
+    """Escala texturas en CPU repartiéndolas entre varios procesos trabajadores.
+
+    Cada proceso carga el modelo una sola vez y limita torch a su propio número
+    de hilos, de forma que los procesos no compiten por los mismos núcleos.
+
+    Args:
+        modelPath (str): Ruta al archivo .pth del modelo.
+        upscaleFactor (int): Factor de escalado.
+        tileSize (int | str): Tamaño de tile (0 = imagen completa, "auto" = elegido por imagen).
+        textureDir (str): Directorio de las texturas.
+        imageFiles (list[str]): Nombres de archivo a procesar.
+        workers (int): Número de procesos trabajadores.
+        threadsPerWorker (int): Hilos de torch por proceso (0 = repartir los núcleos disponibles).
+        progress (tqdm, optional): Barra de progreso a actualizar.
+        onComplete (callable, optional): Función llamada con el nombre de cada textura guardada.
+        memoryBudget (int, optional): Bytes disponibles para cada proceso en modo de tile automático.
+        backendOptions (dict, optional): Backend de inferencia en CPU (ver inference.optimizeModel).
+    """
+    if threadsPerWorker <= 0:
+        threadsPerWorker = max(1, (os.cpu_count() or 1) // workers)
+
+    # Exportar una sola vez antes de arrancar los procesos, en lugar de en cada uno
+    if backendOptions is not None and needsExport(modelPath, backendOptions):
+        exportOnnx(buildModel(modelPath, upscaleFactor), modelPath, backendOptions["quantization"])
+
+    with ProcessPoolExecutor(
+        max_workers = workers,
+        initializer = _initWorker,
+        initargs = (modelPath, upscaleFactor, tileSize, threadsPerWorker, memoryBudget, backendOptions),
+    ) as pool:
+        futures = {}
+        for fileName in imageFiles:
+            future = pool.submit(_upscaleInWorker, os.path.join(textureDir, fileName), upscaleFactor)
+            futures[future] = fileName
+
+        for future in as_completed(futures):
+            fileName = futures[future]
+            try:
+                error, events = future.result()
+            except Exception as e:
+                error, events = str(e), []
+            for event in events:
+                telemetry.emit(event)
+
+            if error is not None:
+                print(f"Error procesando {fileName}: {error}")
+            elif onComplete is not None:
+                onComplete(fileName)
+            if progress is not None:
+                progress.update(1)